@@ -0,0 +1,148 @@
+"""
+Benchmark: concurrent /diarize/sync throughput, blocking vs async downloads
+
+Serves a WAV-sized payload from a local HTTP server throttled to a fixed
+bandwidth (standing in for Supabase Storage) and fires concurrent
+/diarize/sync requests at the app in-process. The legacy path downloads with
+a blocking read loop (8 KB chunks) inside the request handler, as the server
+used to; the async path uses download_audio. The pipeline is a no-op stub,
+so the numbers isolate the download path:
+
+    python -m benchmarks.bench_sync_throughput [--concurrency 1 4 16]
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import main as app_main
+from config import Settings, get_settings
+
+
+class ThrottledAudioHandler(BaseHTTPRequestHandler):
+    """Serves ``payload`` at ``bandwidth`` bytes/s, honouring byte ranges."""
+
+    payload = b""
+    bandwidth = 0
+
+    def do_GET(self):
+        start = 0
+        if self.headers.get("Range", "").startswith("bytes="):
+            start = int(self.headers["Range"][6:].split("-")[0])
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        body = self.payload[start:]
+        self.send_header("Content-Type", "audio/wav")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+        block = 64 * 1024
+        for offset in range(0, len(body), block):
+            self.wfile.write(body[offset:offset + block])
+            time.sleep(block / self.bandwidth)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubDiarization:
+    """Pipeline output with a single speaker turn."""
+
+    def itertracks(self, yield_label=False):
+        yield SimpleNamespace(start=0.0, end=1.0), None, "SPEAKER_00"
+
+
+def stub_pipeline(audio_path, **kwargs):
+    return StubDiarization()
+
+
+def blocking_download_audio(url: str, settings: Settings) -> str:
+    """The previous download path: a blocking read loop with 8 KB chunks."""
+    temp_dir = Path(settings.temp_dir)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    filepath = temp_dir / f"{uuid.uuid4()}.wav"
+
+    with urllib.request.urlopen(url, timeout=60) as response, open(filepath, "wb") as f:
+        while chunk := response.read(8192):
+            f.write(chunk)
+
+    return str(filepath)
+
+
+async def legacy_download_audio(url: str, settings: Settings) -> str:
+    # Called from the handler without leaving the event loop, like before
+    return blocking_download_audio(url, settings)
+
+
+async def measure(audio_url: str, concurrency: int, requests: int) -> float:
+    """Requests per second for ``requests`` calls, ``concurrency`` at a time."""
+    limit = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app_main.app)
+
+    async with app_main.lifespan(app_main.app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=300
+    ) as client:
+
+        async def call():
+            async with limit:
+                response = await client.post("/diarize/sync", json={"audio_url": audio_url})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(call() for _ in range(requests)))
+        return requests / (time.perf_counter() - start)
+
+
+def run(concurrency_levels, size_mb: float, bandwidth_mb: float, requests: int):
+    ThrottledAudioHandler.payload = os.urandom(int(size_mb * 1024 * 1024))
+    ThrottledAudioHandler.bandwidth = bandwidth_mb * 1024 * 1024
+    audio_server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottledAudioHandler)
+    threading.Thread(target=audio_server.serve_forever, daemon=True).start()
+    audio_url = f"http://127.0.0.1:{audio_server.server_port}/audio.wav"
+
+    async def get_stub_pipeline(settings):
+        return stub_pipeline
+
+    app_main.get_pipeline = get_stub_pipeline
+    async_download_audio = app_main.download_audio
+    settings = get_settings()
+
+    print(
+        f"Payload {size_mb} MB at {bandwidth_mb} MB/s per connection, {requests} requests, "
+        f"max_concurrent_downloads={settings.max_concurrent_downloads}"
+    )
+    print(f"{'concurrency':>11} {'blocking req/s':>15} {'async req/s':>12} {'speedup':>8}")
+
+    for concurrency in concurrency_levels:
+        app_main.download_audio = legacy_download_audio
+        before = asyncio.run(measure(audio_url, concurrency, requests))
+        app_main.download_audio = async_download_audio
+        after = asyncio.run(measure(audio_url, concurrency, requests))
+        print(f"{concurrency:>11} {before:>15.2f} {after:>12.2f} {after / before:>7.2f}x")
+
+    audio_server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--size-mb", type=float, default=2.0)
+    parser.add_argument("--bandwidth-mb", type=float, default=10.0)
+    parser.add_argument("--requests", type=int, default=16)
+    args = parser.parse_args()
+
+    run(args.concurrency, args.size_mb, args.bandwidth_mb, args.requests)
+
+
+if __name__ == "__main__":
+    main()
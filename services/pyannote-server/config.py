@@ -22,6 +22,14 @@ class Settings(BaseSettings):
     # Use "pyannote/speaker-diarization-3.1" for the latest model
     diarization_model: str = "pyannote/speaker-diarization-3.1"
 
+    # Load the pipeline at startup instead of on the first request
+    eager_load: bool = True
+
+    # Local pipeline snapshot (see snapshot.py). When set, the pipeline is
+    # loaded from this directory without the Hub; it is created on first
+    # start if missing. Mount it on a persistent volume for fast restarts.
+    model_snapshot_dir: str = ""
+
     # Number of speakers (if known in advance, otherwise None for auto-detection)
     min_speakers: int = 2
     max_speakers: int = 2  # In salon context, usually 2 (stylist + customer)
@@ -30,12 +38,24 @@ class Settings(BaseSettings):
     sample_rate: int = 16000
     temp_dir: str = "/tmp/pyannote"
 
+    # Download settings
+    # Audio is streamed in reads of about 1/64 of the file, clamped to
+    # [download_min_chunk_size, download_max_chunk_size] bytes. Interrupted
+    # downloads resume with Range requests up to download_max_resumes times.
+    max_concurrent_downloads: int = 8
+    download_timeout: int = 60  # seconds
+    download_min_chunk_size: int = 64 * 1024
+    download_max_chunk_size: int = 1024 * 1024
+    download_max_resumes: int = 3
+
     # API settings
     api_key: str = ""  # Optional API key for authentication
 
     # Callback settings
     callback_timeout: int = 30  # seconds
     max_retries: int = 3
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
 
     class Config:
         env_file = ".env"
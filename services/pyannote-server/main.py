@@ -9,23 +9,66 @@ import os
 import uuid
 import asyncio
 import tempfile
+import time
+import importlib.util
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Optional
 from pathlib import Path
 
 import httpx
-import requests
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, HttpUrl
 
 from config import get_settings, Settings
+from snapshot import create_snapshot, snapshot_config
+
+# Shared HTTP client for downloads and callbacks (created in the lifespan)
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Limits concurrent audio downloads (created in the lifespan)
+_download_semaphore: Optional[asyncio.Semaphore] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the pipeline and create the pooled HTTP client on startup"""
+    global _http_client, _download_semaphore
+
+    settings = get_settings()
+    # Keep-alive connections are reused across callbacks; HTTP/2 is used
+    # when the h2 package (httpx[http2]) is installed.
+    _http_client = httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        timeout=settings.callback_timeout,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+        ),
+    )
+    _download_semaphore = asyncio.Semaphore(settings.max_concurrent_downloads)
+
+    if settings.eager_load:
+        try:
+            await get_pipeline(settings)
+        except Exception as e:
+            # The server still starts; the next request (or /warmup) retries
+            print(f"Eager pipeline load failed: {e}")
+    _startup_metrics["startup_seconds"] = round(time.monotonic() - _process_started_at, 3)
+
+    yield
+
+    await _http_client.aclose()
+    _http_client = None
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Pyannote Speaker Diarization Server",
     description="Speaker diarization service for SalonTalk AI",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -37,10 +80,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global pipeline instance (lazy loaded)
+# Global pipeline instance (loaded at startup, or on first use)
 _pipeline = None
 _pipeline_lock = asyncio.Lock()
 
+# Cold start timings, reported by /metrics
+_process_started_at = time.monotonic()
+_startup_metrics: dict = {
+    "startup_seconds": None,
+    "model_load_seconds": None,
+    "model_source": None,
+}
+
 
 # ===========================================
 # Models
@@ -119,25 +170,62 @@ async def get_pipeline(settings: Settings = Depends(get_settings)):
     """Get or initialize the diarization pipeline"""
     global _pipeline
 
+    # Fast path: once loaded the pipeline never changes, no lock needed
+    if _pipeline is not None:
+        return _pipeline
+
     async with _pipeline_lock:
         if _pipeline is None:
-            print("Loading pyannote pipeline...")
-            from pyannote.audio import Pipeline
+            start = time.monotonic()
+            pipeline, source = await asyncio.to_thread(load_pipeline, settings)
+            _startup_metrics["model_load_seconds"] = round(time.monotonic() - start, 3)
+            _startup_metrics["model_source"] = source
+            _pipeline = pipeline
 
-            _pipeline = Pipeline.from_pretrained(
-                settings.diarization_model,
-                use_auth_token=settings.hf_token,
-            )
+        return _pipeline
 
-            # Move to GPU if available
-            import torch
-            if torch.cuda.is_available():
-                _pipeline = _pipeline.to(torch.device("cuda"))
-                print("Pipeline loaded on GPU")
-            else:
-                print("Pipeline loaded on CPU")
 
-        return _pipeline
+def load_pipeline(settings: Settings):
+    """
+    Load the diarization pipeline, preferring the local snapshot.
+
+    With settings.model_snapshot_dir set, the pipeline is loaded from the
+    snapshot there; if there is none yet, it is created from the Hub first,
+    so later restarts never need the Hub.
+
+    Returns:
+        Tuple of the pipeline and where it was loaded from ("snapshot" or "hub")
+    """
+    from pyannote.audio import Pipeline
+
+    config = snapshot_config(settings.model_snapshot_dir)
+    if config is None and settings.model_snapshot_dir:
+        print(f"Creating model snapshot in {settings.model_snapshot_dir}...")
+        config = create_snapshot(
+            settings.diarization_model, settings.model_snapshot_dir, settings.hf_token
+        )
+
+    if config is not None:
+        print(f"Loading pyannote pipeline from snapshot {config.parent}...")
+        pipeline = Pipeline.from_pretrained(str(config))
+        source = "snapshot"
+    else:
+        print("Loading pyannote pipeline...")
+        pipeline = Pipeline.from_pretrained(
+            settings.diarization_model,
+            use_auth_token=settings.hf_token,
+        )
+        source = "hub"
+
+    # Move to GPU if available
+    import torch
+    if torch.cuda.is_available():
+        pipeline = pipeline.to(torch.device("cuda"))
+        print("Pipeline loaded on GPU")
+    else:
+        print("Pipeline loaded on CPU")
+
+    return pipeline, source
 
 
 # ===========================================
@@ -145,8 +233,29 @@ async def get_pipeline(settings: Settings = Depends(get_settings)):
 # ===========================================
 
 
-def download_audio(url: str, settings: Settings) -> str:
-    """Download audio from URL to temporary file"""
+def download_chunk_size(content_length: Optional[int], settings: Settings) -> int:
+    """Pick a read size for a download: about 1/64 of the file, within bounds"""
+    if not content_length:
+        return settings.download_min_chunk_size
+    return max(
+        settings.download_min_chunk_size,
+        min(content_length // 64, settings.download_max_chunk_size),
+    )
+
+
+async def download_audio(url: str, settings: Settings) -> str:
+    """
+    Download audio from URL to temporary file without blocking the event loop.
+
+    The body is streamed over the shared connection pool. If the connection
+    drops part-way through a download from a server that accepts byte
+    ranges, the download resumes from the last byte written instead of
+    starting over. At most settings.max_concurrent_downloads downloads run
+    at once.
+    """
+    if _http_client is None or _download_semaphore is None:
+        raise RuntimeError("HTTP client not initialized")
+
     # Create temp directory if not exists
     temp_dir = Path(settings.temp_dir)
     temp_dir.mkdir(parents=True, exist_ok=True)
@@ -155,17 +264,54 @@ def download_audio(url: str, settings: Settings) -> str:
     filename = f"{uuid.uuid4()}.wav"
     filepath = temp_dir / filename
 
-    # Download file
-    response = requests.get(str(url), stream=True, timeout=60)
-    response.raise_for_status()
-
-    with open(filepath, "wb") as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
+    async with _download_semaphore:
+        try:
+            await _download_to_file(str(url), filepath, settings)
+        except BaseException:
+            cleanup_temp_file(str(filepath))
+            raise
 
     return str(filepath)
 
 
+async def _download_to_file(url: str, filepath: Path, settings: Settings):
+    """Stream url into filepath, resuming with Range requests after network errors"""
+    timeout = httpx.Timeout(settings.download_timeout, connect=10.0)
+    written = 0
+    resumable = False
+    f = await asyncio.to_thread(open, filepath, "wb")
+    try:
+        for attempt in range(settings.download_max_resumes + 1):
+            headers = {"Range": f"bytes={written}-"} if written and resumable else {}
+            try:
+                async with _http_client.stream(
+                    "GET", url, headers=headers, timeout=timeout
+                ) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206 and written:
+                        # Range ignored: the full body is sent again
+                        await asyncio.to_thread(f.seek, 0)
+                        await asyncio.to_thread(f.truncate)
+                        written = 0
+
+                    resumable = response.headers.get("accept-ranges", "").lower() == "bytes"
+                    length = response.headers.get("content-length")
+                    total = written + int(length) if length else None
+                    chunk_size = download_chunk_size(total, settings)
+
+                    async for chunk in response.aiter_bytes(chunk_size):
+                        await asyncio.to_thread(f.write, chunk)
+                        written += len(chunk)
+                return
+
+            except httpx.TransportError as e:
+                if not resumable or attempt == settings.download_max_resumes:
+                    raise
+                print(f"Download interrupted at {written} bytes, resuming: {e}")
+    finally:
+        await asyncio.to_thread(f.close)
+
+
 def cleanup_temp_file(filepath: str):
     """Remove temporary file"""
     try:
@@ -215,21 +361,23 @@ async def send_callback(
     settings: Settings,
 ):
     """Send result to callback URL"""
-    async with httpx.AsyncClient() as client:
-        for attempt in range(settings.max_retries):
-            try:
-                response = await client.post(
-                    str(callback_url),
-                    json=payload.model_dump(),
-                    timeout=settings.callback_timeout,
-                )
-                if response.status_code < 400:
-                    return
-            except Exception as e:
-                print(f"Callback attempt {attempt + 1} failed: {e}")
+    if _http_client is None:
+        raise RuntimeError("HTTP client not initialized")
+
+    for attempt in range(settings.max_retries):
+        try:
+            response = await _http_client.post(
+                str(callback_url),
+                json=payload.model_dump(),
+                timeout=settings.callback_timeout,
+            )
+            if response.status_code < 400:
+                return
+        except Exception as e:
+            print(f"Callback attempt {attempt + 1} failed: {e}")
 
-            if attempt < settings.max_retries - 1:
-                await asyncio.sleep(2 ** attempt)  # Exponential backoff
+        if attempt < settings.max_retries - 1:
+            await asyncio.sleep(2 ** attempt)  # Exponential backoff
 
 
 async def process_diarization_async(
@@ -243,7 +391,7 @@ async def process_diarization_async(
     audio_path = None
     try:
         # Download audio
-        audio_path = download_audio(audio_url, settings)
+        audio_path = await download_audio(audio_url, settings)
 
         # Get pipeline
         pipeline = await get_pipeline(settings)
@@ -304,6 +452,12 @@ async def health():
     return await health_check()
 
 
+@app.get("/metrics")
+async def startup_metrics():
+    """Cold start metrics: process startup and pipeline load time in seconds"""
+    return _startup_metrics
+
+
 @app.post("/diarize", response_model=AsyncDiarizationResponse)
 async def diarize_async(
     request: DiarizationRequest,
@@ -347,7 +501,7 @@ async def diarize_sync(
     audio_path = None
     try:
         # Download audio
-        audio_path = download_audio(str(request.audio_url), settings)
+        audio_path = await download_audio(str(request.audio_url), settings)
 
         # Get pipeline
         pipeline = await get_pipeline(settings)
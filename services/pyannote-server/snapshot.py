@@ -0,0 +1,98 @@
+"""
+Local model snapshot for the diarization pipeline
+
+A snapshot is a directory holding the pipeline's config.yaml with its
+segmentation and embedding models rewritten to checkpoint files stored next
+to it:
+
+    <snapshot>/config.yaml
+    <snapshot>/segmentation/pytorch_model.bin
+    <snapshot>/embedding/pytorch_model.bin
+
+Pipeline.from_pretrained() loads it from disk without contacting the
+Hugging Face Hub. Create one (e.g. in the Docker build or on a persistent
+volume) with:
+
+    python snapshot.py --output /models/speaker-diarization-3.1
+"""
+
+import argparse
+import shutil
+from pathlib import Path
+from typing import Optional
+
+import yaml
+
+CONFIG_FILENAME = "config.yaml"
+CHECKPOINT_FILENAME = "pytorch_model.bin"
+
+# Models referenced by the pipeline config that are stored in the snapshot
+SNAPSHOT_MODELS = ("segmentation", "embedding")
+
+
+def snapshot_config(snapshot_dir: str) -> Optional[Path]:
+    """Path of the snapshot's config.yaml, or None if there is no snapshot"""
+    if not snapshot_dir:
+        return None
+    config = Path(snapshot_dir) / CONFIG_FILENAME
+    return config if config.is_file() else None
+
+
+def create_snapshot(model: str, snapshot_dir: str, hf_token: str = "") -> Path:
+    """
+    Download a pipeline and its models from the Hub into a local snapshot.
+
+    Args:
+        model: Pipeline repository, e.g. "pyannote/speaker-diarization-3.1"
+        snapshot_dir: Directory to write the snapshot to
+        hf_token: HuggingFace token for gated models
+
+    Returns:
+        Path of the snapshot's config.yaml
+    """
+    from huggingface_hub import hf_hub_download
+
+    token = hf_token or None
+    output = Path(snapshot_dir).resolve()
+    output.mkdir(parents=True, exist_ok=True)
+
+    with open(hf_hub_download(model, CONFIG_FILENAME, token=token)) as f:
+        config = yaml.safe_load(f)
+
+    params = config["pipeline"]["params"]
+    for name in SNAPSHOT_MODELS:
+        source = params[name]
+        if Path(source).is_file():
+            checkpoint = source
+        else:
+            checkpoint = hf_hub_download(source, CHECKPOINT_FILENAME, token=token)
+
+        target = output / name / CHECKPOINT_FILENAME
+        target.parent.mkdir(exist_ok=True)
+        shutil.copyfile(checkpoint, target)
+        params[name] = str(target)
+
+    # Write the config last so a partial snapshot is never picked up
+    config_path = output / CONFIG_FILENAME
+    tmp_path = config_path.with_suffix(".yaml.tmp")
+    with open(tmp_path, "w") as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+    tmp_path.replace(config_path)
+
+    return config_path
+
+
+if __name__ == "__main__":
+    from config import get_settings
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Create a local pipeline snapshot")
+    parser.add_argument("--model", default=settings.diarization_model)
+    parser.add_argument("--output", default=settings.model_snapshot_dir)
+    args = parser.parse_args()
+
+    if not args.output:
+        parser.error("--output or PYANNOTE_MODEL_SNAPSHOT_DIR is required")
+
+    path = create_snapshot(args.model, args.output, settings.hf_token)
+    print(f"Snapshot written to {path.parent}")
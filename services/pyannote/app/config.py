@@ -0,0 +1,211 @@
+"""
+Configuration for the pyannote diarization server
+"""
+
+from functools import lru_cache
+from typing import Dict, Literal, Optional
+
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    """Application settings loaded from environment variables"""
+
+    # Inference pool settings
+    # Each replica is an independent pipeline/embedding model pair that can run
+    # one inference at a time on the executor.
+    inference_replicas: int = 1
+
+    # Inference backend settings
+    # "torch" runs the models in PyTorch eager mode. "torchscript" and "onnx"
+    # export the segmentation and embedding models at startup (cached in
+    # inference_export_dir, if set) and run them as frozen TorchScript or
+    # with ONNX Runtime on CPU; a model that cannot be exported, or whose
+    # export does not match eager outputs, stays eager. "onnx" needs the
+    # optional requirements-onnx.txt.
+    inference_backend: Literal["torch", "torchscript", "onnx"] = "torch"
+    inference_export_dir: Optional[str] = None
+
+    # Inference precision settings (torch backend on CPU only)
+    # "int8" dynamically quantizes the models' LSTM and Linear layers; "bf16"
+    # runs them under bfloat16 autocast. Check the accuracy cost with
+    # benchmarks/bench_precision.py before enabling either.
+    inference_precision: Literal["fp32", "int8", "bf16"] = "fp32"
+
+    # Embedding settings
+    # "model" loads pyannote/embedding (512-dim, matches stored voice prints).
+    # "pipeline" reuses the diarization pipeline's own speaker embedding model
+    # (256-dim WeSpeaker): speaker_embeddings become the pipeline's clustering
+    # centroids and no second model is loaded.
+    embedding_source: Literal["model", "pipeline"] = "model"
+    # Speaker turns are embedded in length buckets of up to embedding_batch_size
+    # turns whose longest member is at most embedding_bucket_ratio times the shortest.
+    embedding_batch_size: int = 32
+    embedding_bucket_ratio: float = 1.25
+
+    # Crops from concurrent requests are collected for up to this many
+    # milliseconds and embedded together (0 disables cross-request batching).
+    embedding_batch_window_ms: float = 5.0
+
+    # Voice print segment selection settings
+    # /extract-embedding with a speaker_label embeds the speaker's longest turns
+    # first: embedding_min_segments at once (confidence is full at five), then
+    # embedding_selection_step at a time until the running centroid moves by
+    # less than embedding_convergence_tolerance (1 - cosine similarity) or
+    # embedding_max_segments turns are embedded (0 = no budget).
+    embedding_min_segments: int = 5
+    embedding_max_segments: int = 10
+    embedding_selection_step: int = 2
+    embedding_convergence_tolerance: float = 0.005
+
+    # Session speaker tracking settings
+    # Per-session speaker centroids keep labels stable across chunks. Sessions
+    # idle for session_ttl_seconds are evicted, as are the least recently used
+    # ones beyond session_max_sessions.
+    session_max_sessions: int = 10000
+    session_ttl_seconds: float = 3600.0
+    session_match_threshold: float = 0.5
+
+    # Streaming diarization settings
+    # /api/v1/stream diarizes the latest stream_window_seconds every
+    # stream_step_seconds of new audio; turns older than
+    # stream_finalize_lag_seconds before the end of the window are final.
+    stream_window_seconds: float = 5.0
+    stream_step_seconds: float = 0.5
+    stream_finalize_lag_seconds: float = 0.5
+
+    # Result cache settings
+    # Results are cached by a hash of the uploaded audio and the request
+    # parameters. The in-memory tier holds up to result_cache_max_bytes of
+    # serialized results (0 disables the cache); setting result_cache_dir adds
+    # an on-disk tier bounded by result_cache_disk_max_bytes.
+    result_cache_max_bytes: int = 64 * 1024 * 1024
+    result_cache_dir: Optional[str] = None
+    result_cache_disk_max_bytes: int = 1024 * 1024 * 1024
+
+    # Callback delivery settings
+    # Callbacks are persisted in a SQLite outbox and delivered over one
+    # pooled HTTP client, retrying with exponential backoff (capped at
+    # callback_retry_max_seconds) for up to callback_max_attempts attempts.
+    callback_outbox_path: str = "/tmp/pyannote/callback_outbox.sqlite3"
+    callback_timeout_seconds: float = 30.0
+    callback_max_attempts: int = 8
+    callback_retry_base_seconds: float = 1.0
+    callback_retry_max_seconds: float = 300.0
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+
+    # Job worker settings
+    # URL jobs (POST /api/v1/jobs) are persisted in a SQLite job store; the
+    # job_store_max_recent most recently used records are cached in memory and
+    # finished jobs are deleted job_retention_seconds after completion.
+    worker_max_concurrent_jobs: int = 2
+    job_store_path: str = "/tmp/pyannote/jobs.sqlite3"
+    job_store_max_recent: int = 1000
+    job_retention_seconds: float = 7 * 24 * 3600
+    # Requeue jobs left pending/processing by a previous run at startup;
+    # only one process sharing a job store should do this
+    worker_recover_jobs: bool = True
+
+    # Job pipeline settings
+    # Jobs pass through fetch, decode, inference and callback stages joined by
+    # queues of worker_prefetch_jobs entries, so up to that many jobs are
+    # downloaded and decoded ahead of inference. Downloads are streamed in
+    # worker_download_chunk_bytes reads into memory, or into a temporary file
+    # beyond audio_spill_threshold_bytes.
+    worker_prefetch_jobs: int = 2
+    worker_fetch_concurrency: int = 2
+    worker_download_chunk_bytes: int = 256 * 1024
+
+    # Job scheduling settings
+    # Queued jobs are served by priority class (realtime, finalization,
+    # backfill); a job rises one class per worker_priority_aging_seconds of
+    # waiting. New jobs are rejected with 429 once worker_max_queue_depth jobs
+    # are queued or their estimated wait exceeds worker_max_wait_seconds.
+    worker_priority_aging_seconds: float = 30.0
+    worker_max_queue_depth: int = 100
+    worker_max_wait_seconds: float = 120.0
+    worker_initial_job_seconds: float = 10.0
+
+    # Tenant fairness settings
+    # Requests and jobs are queued fairly per salon (salon_id form field or
+    # job metadata) in proportion to tenant_weights (default weight 1). Each
+    # salon may run at most tenant_max_concurrency[salon] requests at once
+    # (tenant_default_max_concurrency for others; 0 = no cap). At most
+    # request_slots /diarize requests run at once (0 = 2 per inference replica);
+    # request_cost_seconds is the typical request duration used to space a
+    # salon's queued requests.
+    tenant_weights: Dict[str, float] = {}
+    tenant_max_concurrency: Dict[str, int] = {}
+    tenant_default_max_concurrency: int = 0
+    request_slots: int = 0
+    request_cost_seconds: float = 1.0
+
+    # Prefork settings (python -m app.prefork)
+    # Models are loaded once and shared copy-on-write by prefork_workers
+    # forked processes (0 = one per available core). Each worker runs
+    # prefork_threads_per_worker torch threads (0 = its share of the cores)
+    # and, with prefork_cpu_affinity, is pinned to those cores.
+    prefork_workers: int = 0
+    prefork_threads_per_worker: int = 0
+    prefork_cpu_affinity: bool = False
+
+    # Legacy API settings
+    # The URL-based /diarize and /diarize/sync routes of the retired
+    # pyannote-server. When legacy_api_key is set, they require it as
+    # "Authorization: Bearer <key>", like pyannote-server did.
+    legacy_api_key: str = ""
+
+    # Quality preset settings
+    # Requests without a quality form field run with this preset (see
+    # app/services/presets.py): "fast", "balanced" (pipeline defaults) or "accurate".
+    diarization_default_quality: Literal["fast", "balanced", "accurate"] = "balanced"
+    # Preset of the immediate coarse pass of two-phase requests (refine=true);
+    # the refined pass runs with the request's quality.
+    two_phase_coarse_quality: Literal["fast", "balanced", "accurate"] = "fast"
+
+    # Load-adaptive degradation settings
+    # Realtime requests run with the segmentation step and batch size of one
+    # quality preset lower per degradation level (up to degradation_max_level;
+    # speaker count and embeddings stay as requested) while the smoothed queue
+    # wait exceeds degradation_queue_wait_slo_seconds or queue wait plus
+    # inference time exceeds degradation_latency_slo_seconds. A level is restored once both
+    # are below degradation_recover_ratio of their SLO; the level changes at
+    # most once per degradation_min_dwell_seconds. Without new samples the
+    # smoothed signals halve every degradation_half_life_seconds.
+    degradation_enabled: bool = True
+    degradation_queue_wait_slo_seconds: float = 5.0
+    degradation_latency_slo_seconds: float = 20.0
+    degradation_recover_ratio: float = 0.5
+    degradation_min_dwell_seconds: float = 10.0
+    degradation_max_level: int = 2
+    degradation_half_life_seconds: float = 30.0
+
+    # Voice activity pre-filter settings
+    # Chunks whose detected speech covers less than vad_min_speech_ratio of
+    # the audio get an empty result without running the pipeline; non-speech
+    # spans of at least vad_min_trim_seconds are cut out before it runs. Speech
+    # frames need energy above vad_energy_threshold_db (dBFS) and spectral flux
+    # above vad_flux_threshold_db (stationary noise such as dryers stays below).
+    # Off by default: the thresholds are tuned on synthetic audio only, so
+    # compare DER on real salon recordings before enabling it.
+    vad_enabled: bool = False
+    vad_min_speech_ratio: float = 0.05
+    vad_min_trim_seconds: float = 3.0
+    vad_energy_threshold_db: float = -50.0
+    vad_flux_threshold_db: float = 1.8
+
+    # Audio loading settings
+    # Uploads up to this size are decoded in memory; larger ones are spilled
+    # to a temporary file and decoded by pyannote from disk.
+    audio_spill_threshold_bytes: int = 32 * 1024 * 1024
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "PYANNOTE_"
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    """Get cached settings instance"""
+    return Settings()
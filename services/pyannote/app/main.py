@@ -6,36 +6,95 @@ FastAPI application for speaker diarization processing
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
+import httpx
 import structlog
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routes import diarization, health
+from app.config import get_settings
+from app.routes import diarization, health, jobs, legacy, stream
+from app.services.callbacks import CallbackOutbox, create_http_client
 from app.services.pyannote_service import PyannoteService
+from app.workers import AdmissionController, DiarizationWorker, JobStore
 
 logger = structlog.get_logger()
 
-# Global service instance
+# Global service instances
 pyannote_service: PyannoteService | None = None
+http_client: httpx.AsyncClient | None = None
+callback_outbox: CallbackOutbox | None = None
+diarization_worker: DiarizationWorker | None = None
+
+# Service loaded before the app starts (set by the prefork server)
+preloaded_service: PyannoteService | None = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Application lifespan handler for startup and shutdown."""
-    global pyannote_service
+    global pyannote_service, http_client, callback_outbox, diarization_worker
+
+    settings = get_settings()
 
     # Startup
     logger.info("Starting pyannote server...")
-    pyannote_service = PyannoteService()
-    await pyannote_service.initialize()
-    logger.info("Pyannote model loaded successfully")
+    http_client = create_http_client(settings)
+    callback_outbox = CallbackOutbox(
+        settings.callback_outbox_path,
+        http_client,
+        max_attempts=settings.callback_max_attempts,
+        retry_base_seconds=settings.callback_retry_base_seconds,
+        retry_max_seconds=settings.callback_retry_max_seconds,
+    )
+    callback_outbox.start()
+
+    if preloaded_service is not None:
+        pyannote_service = preloaded_service
+        logger.info("Using preloaded pyannote model")
+    else:
+        pyannote_service = PyannoteService()
+        await pyannote_service.initialize()
+        logger.info("Pyannote model loaded successfully")
+
+    diarization_worker = DiarizationWorker(
+        pyannote_service,
+        max_concurrent_jobs=settings.worker_max_concurrent_jobs,
+        job_store=JobStore(
+            settings.job_store_path,
+            max_recent=settings.job_store_max_recent,
+            retention_seconds=settings.job_retention_seconds,
+        ),
+        http_client=http_client,
+        callback_outbox=callback_outbox,
+        admission=AdmissionController(
+            max_queue_depth=settings.worker_max_queue_depth,
+            max_wait_seconds=settings.worker_max_wait_seconds,
+            initial_job_seconds=settings.worker_initial_job_seconds,
+        ),
+        priority_aging_seconds=settings.worker_priority_aging_seconds,
+        tenant_policy=pyannote_service.tenant_policy,
+        degradation=pyannote_service.degradation,
+        prefetch_jobs=settings.worker_prefetch_jobs,
+        fetch_concurrency=settings.worker_fetch_concurrency,
+        spill_threshold_bytes=settings.audio_spill_threshold_bytes,
+        download_chunk_bytes=settings.worker_download_chunk_bytes,
+        recover_jobs=settings.worker_recover_jobs,
+    )
+    await diarization_worker.start()
 
     yield
 
     # Shutdown
     logger.info("Shutting down pyannote server...")
+    if diarization_worker:
+        await diarization_worker.stop()
+        diarization_worker.job_store.close()
     if pyannote_service:
         await pyannote_service.cleanup()
+    if callback_outbox:
+        await callback_outbox.close()
+    if http_client:
+        await http_client.aclose()
 
 
 app = FastAPI(
@@ -57,6 +116,9 @@ app.add_middleware(
 # Include routers
 app.include_router(health.router, tags=["Health"])
 app.include_router(diarization.router, prefix="/api/v1", tags=["Diarization"])
+app.include_router(stream.router, prefix="/api/v1", tags=["Streaming"])
+app.include_router(jobs.router, prefix="/api/v1", tags=["Jobs"])
+app.include_router(legacy.router, tags=["Legacy"])
 
 
 def get_pyannote_service() -> PyannoteService:
@@ -64,3 +126,24 @@ def get_pyannote_service() -> PyannoteService:
     if pyannote_service is None:
         raise RuntimeError("Pyannote service not initialized")
     return pyannote_service
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client."""
+    if http_client is None:
+        raise RuntimeError("HTTP client not initialized")
+    return http_client
+
+
+def get_callback_outbox() -> CallbackOutbox:
+    """Get the global callback outbox."""
+    if callback_outbox is None:
+        raise RuntimeError("Callback outbox not initialized")
+    return callback_outbox
+
+
+def get_diarization_worker() -> DiarizationWorker:
+    """Get the global diarization worker."""
+    if diarization_worker is None:
+        raise RuntimeError("Diarization worker not initialized")
+    return diarization_worker
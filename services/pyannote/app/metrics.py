@@ -0,0 +1,157 @@
+"""
+In-process metrics
+
+A small registry of counters, gauges and summaries, exposed as JSON on
+``GET /metrics``. Metrics are identified by a name and optional labels, e.g.
+``metrics.counter("vad_skipped_chunks").inc()`` or
+``metrics.summary("queue_wait_seconds", tenant="salon-1").observe(0.2)``.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    """Monotonically increasing value."""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """Value that can go up and down."""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> float:
+        return self._value
+
+
+class Summary:
+    """
+    Distribution of observed values.
+
+    Count, sum and max cover every observation; quantiles are computed over the
+    most recent ``window`` observations.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._recent: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+            self._recent.append(value)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self._count if self._count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Quantile of the recent observations."""
+        with self._lock:
+            values = sorted(self._recent)
+        if not values:
+            return 0.0
+        return values[min(int(q * len(values)), len(values) - 1)]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self._count,
+            "sum": self._sum,
+            "mean": self.mean,
+            "max": self._max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """Registry of named, optionally labelled metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[Tuple[str, LabelKey], Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind: type, name: str, labels: Dict[str, Any]):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = kind()
+                self._metrics[key] = metric
+        if not isinstance(metric, kind):
+            raise TypeError(f"Metric {name} is a {type(metric).__name__}, not a {kind.__name__}")
+        return metric
+
+    def counter(self, name: str, **labels: Any) -> Counter:
+        return self._get(Counter, name, labels)
+
+    def gauge(self, name: str, **labels: Any) -> Gauge:
+        return self._get(Gauge, name, labels)
+
+    def summary(self, name: str, **labels: Any) -> Summary:
+        return self._get(Summary, name, labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """All metrics as ``{"name{label=value}": value}``."""
+        with self._lock:
+            items = list(self._metrics.items())
+
+        result: Dict[str, Any] = {}
+        for (name, labels), metric in sorted(items, key=lambda item: item[0]):
+            if labels:
+                name = name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+            result[name] = metric.snapshot()
+        return result
+
+    def reset(self):
+        """Drop all metrics (used by tests)."""
+        with self._lock:
+            self._metrics.clear()
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
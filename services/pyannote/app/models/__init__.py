@@ -6,10 +6,24 @@ from app.models.diarization import (
     DiarizationResponse,
     DiarizationSegment,
 )
+from app.models.jobs import JobStatusResponse, JobSubmitRequest, JobSubmitResponse
+from app.models.legacy import (
+    LegacyAsyncResponse,
+    LegacyCallbackPayload,
+    LegacyDiarizationRequest,
+    LegacyDiarizationResponse,
+)
 
 __all__ = [
     "DiarizationRequest",
     "DiarizationResponse",
     "DiarizationSegment",
     "DiarizationCallbackPayload",
+    "JobSubmitRequest",
+    "JobSubmitResponse",
+    "JobStatusResponse",
+    "LegacyDiarizationRequest",
+    "LegacyDiarizationResponse",
+    "LegacyAsyncResponse",
+    "LegacyCallbackPayload",
 ]
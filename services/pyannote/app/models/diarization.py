@@ -27,7 +27,13 @@ class SpeakerEmbedding(BaseModel):
     """Speaker embedding with metadata."""
 
     label: str = Field(..., description="Speaker label (SPEAKER_00, SPEAKER_01, etc.)")
-    embedding: List[float] = Field(..., description="512-dimensional speaker embedding vector")
+    embedding: List[float] = Field(
+        ...,
+        description=(
+            "Speaker embedding vector (512-dimensional; 256-dimensional when the "
+            "server reuses the diarization pipeline's embeddings)"
+        ),
+    )
     duration_ms: int = Field(..., ge=0, description="Total speech duration in milliseconds")
 
 
@@ -42,6 +48,19 @@ class DiarizationResponse(BaseModel):
     speaker_embeddings: Optional[List[SpeakerEmbedding]] = Field(
         None, description="Speaker embeddings (only when extract_embeddings=true)"
     )
+    quality: Optional[Literal["fast", "balanced", "accurate"]] = Field(
+        None, description="Quality preset the result was computed with"
+    )
+    degradation_level: int = Field(
+        0,
+        ge=0,
+        description="Load degradation level in force (0 = none; each level is one preset lower)",
+    )
+    revision: int = Field(
+        0,
+        ge=0,
+        description="Result revision (0 = first result; 1 = refined result of a two-phase request)",
+    )
 
 
 class DiarizationCallbackPayload(BaseModel):
@@ -50,6 +69,9 @@ class DiarizationCallbackPayload(BaseModel):
     session_id: str
     chunk_index: int
     success: bool
+    revision: int = Field(
+        0, ge=0, description="Supersedes earlier results of the chunk with a lower revision"
+    )
     result: Optional[DiarizationResponse] = None
     error: Optional[str] = None
 
@@ -67,6 +89,17 @@ class EmbeddingResponse(BaseModel):
         ..., ge=0, le=1, description="Confidence score of the embedding quality"
     )
     processing_time_ms: int = Field(..., ge=0, description="Processing time in milliseconds")
+    segments_used: Optional[int] = Field(
+        None, ge=0, description="Speaker turns embedded (only with speaker_label)"
+    )
+    segments_total: Optional[int] = Field(
+        None, ge=0, description="Speaker turns available (only with speaker_label)"
+    )
+    time_saved_ms: Optional[int] = Field(
+        None,
+        ge=0,
+        description="Estimated embedding time saved by stopping early (only with speaker_label)",
+    )
 
 
 class EmbeddingRequest(BaseModel):
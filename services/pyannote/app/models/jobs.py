@@ -0,0 +1,41 @@
+"""
+Job models
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class JobSubmitRequest(BaseModel):
+    """Request model for submitting a diarization job."""
+
+    audio_url: str = Field(..., description="URL of the audio file to diarize")
+    callback_url: str = Field(..., description="Webhook URL that receives the result")
+    metadata: Dict[str, Any] = Field(default_factory=dict, description="Echoed in the callback")
+    priority: Literal["realtime", "finalization", "backfill"] = Field(
+        "realtime",
+        description="realtime for live chunks, finalization for session ends, backfill for reprocessing",
+    )
+
+
+class JobSubmitResponse(BaseModel):
+    """Response model for job submission."""
+
+    job_id: str
+    status: Literal["pending"] = "pending"
+
+
+class JobStatusResponse(BaseModel):
+    """Response model for the job status endpoint."""
+
+    job_id: str
+    status: Literal["pending", "processing", "completed", "failed"]
+    priority: Literal["realtime", "finalization", "backfill"] = "realtime"
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = Field(None, description="Diarization result once completed")
+    error: Optional[str] = None
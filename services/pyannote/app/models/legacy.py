@@ -0,0 +1,52 @@
+"""
+Legacy pyannote-server models
+
+Request and response shapes of the URL-based /diarize and /diarize/sync
+endpoints that services/pyannote-server used to serve.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, HttpUrl
+
+
+class LegacyDiarizationRequest(BaseModel):
+    """Request for URL-based diarization."""
+
+    audio_url: HttpUrl
+    callback_url: Optional[HttpUrl] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class LegacyDiarizationSegment(BaseModel):
+    """A segment with speaker label and timing in seconds."""
+
+    speaker: str
+    start: float
+    end: float
+
+
+class LegacyDiarizationResponse(BaseModel):
+    """Result of URL-based diarization."""
+
+    segments: List[LegacyDiarizationSegment]
+    speakers: List[str]
+    processing_time_ms: int = Field(..., ge=0)
+
+
+class LegacyAsyncResponse(BaseModel):
+    """Response to an asynchronous URL-based diarization request."""
+
+    job_id: str
+    status: str
+    message: str
+
+
+class LegacyCallbackPayload(BaseModel):
+    """Payload posted to the callback URL of a legacy request."""
+
+    job_id: str
+    success: bool
+    result: Optional[LegacyDiarizationResponse] = None
+    error: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
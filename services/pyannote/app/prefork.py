@@ -0,0 +1,248 @@
+"""
+Prefork server
+
+``uvicorn --workers N`` starts N independent processes that each load the
+models, so model memory grows with N, and every process sizes its torch
+thread pool for the whole machine. The prefork server instead loads the
+models once in the parent, freezes the loaded objects out of the garbage
+collector (``gc.freeze()``) so that collections in the workers do not write to
+their pages, and forks workers that share the weights copy-on-write. Each
+worker gets an explicit share of the cores for its torch threads and, if
+enabled, is pinned to those cores.
+
+    python -m app.prefork --workers 4
+
+Every worker serves the same listening socket. Per-process state stays per
+worker: the callback outbox gets one SQLite file per worker, the job store
+is shared and read without the in-memory record cache, and only the first
+worker requeues unfinished jobs at startup. Session-stable speaker labels
+live in the worker that served the session, so route a session's chunks to
+one worker (or use the WebSocket stream) when relying on them.
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+import structlog
+import torch
+
+from app.config import Settings, get_settings
+from app.services.backends import reset_onnx_sessions
+
+logger = structlog.get_logger()
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def worker_cpus(index: int, workers: int, cpus: List[int]) -> List[int]:
+    """
+    Cores assigned to worker ``index``: a contiguous, near-equal slice of ``cpus``.
+
+    With more workers than cores, workers share cores round-robin.
+    """
+    if workers >= len(cpus):
+        return [cpus[index % len(cpus)]]
+    start = index * len(cpus) // workers
+    end = (index + 1) * len(cpus) // workers
+    return cpus[start:end]
+
+
+def worker_threads(index: int, workers: int, cpus: List[int], configured: int = 0) -> int:
+    """Torch intra-op threads for a worker (``configured``, or its share of the cores)."""
+    if configured > 0:
+        return configured
+    return len(worker_cpus(index, workers, cpus))
+
+
+def worker_outbox_path(path: str, index: int) -> str:
+    """Callback outbox file of worker ``index``."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.worker{index}{ext}"
+
+
+def configure_worker(index: int, workers: int, settings: Settings, recover_jobs: bool):
+    """
+    Apply a worker's share of the machine and its per-process settings.
+
+    Called in the worker right after fork(), before the app starts.
+    """
+    cpus = available_cpus()
+    assigned = worker_cpus(index, workers, cpus)
+    threads = worker_threads(index, workers, cpus, settings.prefork_threads_per_worker)
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable before the first inter-op parallel work
+        pass
+    if settings.prefork_cpu_affinity and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, assigned)
+    # ONNX Runtime sessions created in the parent run on its single thread
+    reset_onnx_sessions()
+
+    settings.callback_outbox_path = worker_outbox_path(settings.callback_outbox_path, index)
+    # Other workers update the shared job store; always read it from SQLite
+    settings.job_store_max_recent = 0
+    settings.worker_recover_jobs = recover_jobs
+
+    logger.info(
+        "Prefork worker configured",
+        worker=index,
+        pid=os.getpid(),
+        torch_threads=threads,
+        cpus=assigned if settings.prefork_cpu_affinity else None,
+    )
+
+
+class PreforkServer:
+    """Loads the models once and serves the app from forked worker processes."""
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 0,
+        settings: Optional[Settings] = None,
+    ):
+        """
+        Args:
+            host: Address to listen on
+            port: Port to listen on
+            workers: Number of worker processes (0 = settings.prefork_workers,
+                     or one per available core)
+            settings: Settings (defaults to get_settings())
+        """
+        self.settings = settings or get_settings()
+        self.host = host
+        self.port = port
+        self.workers = workers or self.settings.prefork_workers or len(available_cpus())
+        self._children: Dict[int, int] = {}
+        self._stopping = False
+
+    def load(self):
+        """Load the models in the parent and freeze them for copy-on-write sharing."""
+        import app.main as main
+        from app.services.pyannote_service import PyannoteService
+
+        # The parent only loads; keep it from spinning up torch thread pools
+        # that forked children would inherit in an unusable state.
+        torch.set_num_threads(1)
+
+        start = time.monotonic()
+        service = PyannoteService(self.settings)
+        asyncio.run(service.initialize())
+        main.preloaded_service = service
+
+        gc.collect()
+        gc.freeze()
+        logger.info(
+            "Models loaded in prefork parent",
+            seconds=round(time.monotonic() - start, 1),
+            frozen_objects=gc.get_freeze_count(),
+        )
+
+    def bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def run(self):
+        """Load, fork the workers and supervise them until SIGTERM/SIGINT."""
+        self.load()
+        sock = self.bind()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for index in range(self.workers):
+            self._spawn(index, sock, recover_jobs=index == 0)
+        logger.info("Prefork server started", workers=self.workers, port=self.port)
+
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            index = next((i for i, p in self._children.items() if p == pid), None)
+            if index is None:
+                continue
+            del self._children[index]
+            if not self._stopping:
+                logger.error("Prefork worker exited, restarting", worker=index, status=status)
+                time.sleep(1.0)
+                # Its unfinished jobs are recovered on the next full restart
+                self._spawn(index, sock, recover_jobs=False)
+
+        sock.close()
+        logger.info("Prefork server stopped")
+
+    def _spawn(self, index: int, sock: socket.socket, recover_jobs: bool):
+        pid = os.fork()
+        if pid:
+            self._children[index] = pid
+            return
+
+        # Worker process
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            configure_worker(index, self.workers, self.settings, recover_jobs)
+            self._serve(sock)
+        except Exception as e:
+            logger.error("Prefork worker failed", worker=index, error=str(e))
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _serve(self, sock: socket.socket):
+        import uvicorn
+
+        from app.main import app
+
+        config = uvicorn.Config(app, log_config=None)
+        uvicorn.Server(config).run(sockets=[sock])
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+        for pid in self._children.values():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve the diarization API from forked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        sys.exit("Prefork mode requires os.fork()")
+
+    PreforkServer(args.host, args.port, args.workers).run()
+
+
+if __name__ == "__main__":
+    main()
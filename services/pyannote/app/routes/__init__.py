@@ -1,5 +1,5 @@
 """Routes package."""
 
-from app.routes import diarization, health
+from app.routes import diarization, health, jobs, legacy, stream
 
-__all__ = ["diarization", "health"]
+__all__ = ["diarization", "health", "jobs", "legacy", "stream"]
@@ -2,15 +2,16 @@
 Speaker diarization routes
 """
 
-import os
-import tempfile
+import asyncio
+import functools
+import time
 from typing import Optional
 
-import httpx
 import structlog
 from fastapi import APIRouter, BackgroundTasks, File, Form, HTTPException, UploadFile
 
-from app.main import get_pyannote_service
+from app.config import get_settings
+from app.metrics import metrics
 from app.models.diarization import (
     DiarizationRequest,
     DiarizationResponse,
@@ -18,11 +19,144 @@ from app.models.diarization import (
     EmbeddingResponse,
     SpeakerEmbedding,
 )
+from app.services.audio import UploadedAudio
+from app.services.callbacks import validate_callback_url
+from app.services.presets import Quality, get_preset
+from app.services.result_cache import make_cache_key
+from app.services.tenant_scheduler import DEFAULT_TENANT, tenant_label, tenant_of
+from app.workers.job_queue import JobPriority
 
 logger = structlog.get_logger()
 router = APIRouter()
 
 
+async def load_upload(file: UploadFile) -> UploadedAudio:
+    """
+    Load an uploaded audio file for inference.
+
+    Uploads are decoded in memory; only uploads above the spill threshold are
+    copied to a temporary file. Decoding runs off the event loop.
+    """
+    threshold = get_settings().audio_spill_threshold_bytes
+
+    if file.size is not None and file.size > threshold:
+        await file.seek(0)
+        return await asyncio.to_thread(UploadedAudio.spill, file.file, file.filename)
+
+    content = await file.read()
+    return await asyncio.to_thread(UploadedAudio.from_bytes, content, file.filename, threshold)
+
+
+async def run_diarization(
+    service,
+    uploaded: UploadedAudio,
+    session_id: str,
+    extract_embeddings: bool,
+    stable_speakers: bool,
+    tenant: str = DEFAULT_TENANT,
+    quality: Optional[str] = None,
+    priority: str = "realtime",
+    num_speakers: Optional[int] = None,
+):
+    """
+    Run the diarization variant a request asked for.
+
+    Results come from the result cache when possible; otherwise the request
+    waits for a slot in the salon-fair scheduler before running inference.
+    Realtime-priority requests may be degraded under load. ``num_speakers``
+    fixes the number of speakers regardless of the quality preset.
+    """
+    start_time = time.monotonic()
+    preset = get_preset(quality)
+    options = {"quality": preset.name, "priority": priority}
+    if num_speakers is not None:
+        options["num_speakers"] = num_speakers
+
+    # Presets that skip embeddings answer without them
+    extract_embeddings = extract_embeddings and not preset.skip_embeddings
+
+    # Stable labels are matched by speaker embedding, so they need embeddings too
+    if extract_embeddings or stable_speakers:
+        diarize = functools.partial(
+            service.diarize_with_embeddings,
+            uploaded.audio,
+            session_id=session_id if stable_speakers else None,
+            **options,
+        )
+    else:
+        diarize = functools.partial(service.diarize, uploaded.audio, **options)
+
+    async def compute():
+        scheduler = service.scheduler
+        if scheduler is None:
+            return await diarize()
+        async with scheduler.slot(tenant):
+            return await diarize()
+
+    try:
+        # Stable labels depend on the session's history, not just on the audio
+        cache = service.result_cache
+        if cache is None or stable_speakers or uploaded.content_hash is None:
+            return await compute()
+
+        key = make_cache_key(
+            uploaded.content_hash,
+            extract_embeddings=extract_embeddings,
+            model=service.model_id,
+            quality=preset.name,
+            num_speakers=num_speakers,
+        )
+        # Results computed with degraded settings are not what the key describes
+        return await cache.get_or_compute(
+            key, compute, cacheable=lambda result: not result.get("degradation_level")
+        )
+    finally:
+        policy = service.scheduler.policy if service.scheduler is not None else None
+        metrics.summary("tenant_latency_seconds", tenant=tenant_label(tenant, policy)).observe(
+            time.monotonic() - start_time
+        )
+
+
+def build_response(
+    session_id: str,
+    chunk_index: int,
+    result: dict,
+    extract_embeddings: bool,
+    status: str = "completed",
+) -> DiarizationResponse:
+    """Response model for a diarization result."""
+    segments = [
+        DiarizationSegment(
+            speaker=seg["speaker"],
+            start_time_ms=int(seg["start"] * 1000),
+            end_time_ms=int(seg["end"] * 1000),
+        )
+        for seg in result["segments"]
+    ]
+
+    speaker_embeddings = None
+    if extract_embeddings and "speaker_embeddings" in result:
+        speaker_embeddings = [
+            SpeakerEmbedding(
+                label=emb["label"],
+                embedding=emb["embedding"],
+                duration_ms=emb["duration_ms"],
+            )
+            for emb in result["speaker_embeddings"]
+        ]
+
+    return DiarizationResponse(
+        session_id=session_id,
+        chunk_index=chunk_index,
+        segments=segments,
+        processing_time_ms=result["processing_time_ms"],
+        status=status,
+        speaker_embeddings=speaker_embeddings,
+        quality=result.get("quality"),
+        degradation_level=result.get("degradation_level", 0),
+    )
+
+
 @router.post("/diarize", response_model=DiarizationResponse)
 async def diarize_audio(
     background_tasks: BackgroundTasks,
@@ -31,6 +165,11 @@ async def diarize_audio(
     chunk_index: int = Form(...),
     callback_url: Optional[str] = Form(None),
     extract_embeddings: bool = Form(False),
+    stable_speakers: bool = Form(False),
+    salon_id: Optional[str] = Form(None),
+    quality: Optional[Quality] = Form(None),
+    refine: bool = Form(False),
+    priority: Optional[JobPriority] = Form(None),
 ):
     """
     Process audio file for speaker diarization.
@@ -40,6 +179,16 @@ async def diarize_audio(
     - **chunk_index**: Chunk index within the session
     - **callback_url**: Optional webhook URL for async processing
     - **extract_embeddings**: If true, extract speaker embeddings for voice identification
+    - **stable_speakers**: If true, keep speaker labels consistent across the session's chunks
+    - **salon_id**: Salon the audio belongs to; requests are queued fairly per salon
+    - **quality**: "fast" (live chunks: fixed two speakers, no speaker embeddings),
+      "balanced" or "accurate" (end-of-session reprocessing); defaults to the server setting
+    - **refine**: If true (requires callback_url), answer at once with a coarse result
+      (status "processing", revision 0) and deliver the result at the requested quality
+      to callback_url as revision 1
+    - **priority**: "realtime" requests may run at a lower quality under load,
+      "finalization" and "backfill" requests never do; defaults to "realtime" unless
+      a quality is requested
     """
     logger.info(
         "Received diarization request",
@@ -47,7 +196,25 @@ async def diarize_audio(
         chunk_index=chunk_index,
         filename=file.filename,
         extract_embeddings=extract_embeddings,
+        stable_speakers=stable_speakers,
+        salon_id=salon_id,
+        quality=quality,
+        refine=refine,
+        priority=priority,
     )
+    tenant = tenant_of({"salon_id": salon_id})
+    if priority is None:
+        # An explicitly requested quality (e.g. end-of-session reprocessing)
+        # is kept under load unless the caller marks the request realtime
+        priority = "realtime" if quality is None else "finalization"
+
+    if refine and not callback_url:
+        raise HTTPException(status_code=400, detail="refine requires a callback_url")
+    if callback_url:
+        try:
+            validate_callback_url(callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
     # Validate file type
     allowed_types = ["audio/wav", "audio/mpeg", "audio/mp4", "audio/x-m4a", "audio/webm"]
@@ -57,90 +224,119 @@ async def diarize_audio(
             detail=f"Unsupported audio format: {file.content_type}",
         )
 
-    # Save uploaded file temporarily
-    suffix = os.path.splitext(file.filename or "audio.wav")[1]
-    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
-        content = await file.read()
-        tmp.write(content)
-        tmp_path = tmp.name
+    uploaded = await load_upload(file)
 
     try:
+        from app.main import get_pyannote_service
+
         service = get_pyannote_service()
 
         # If callback URL provided, process asynchronously
         if callback_url:
+            response = DiarizationResponse(
+                session_id=session_id,
+                chunk_index=chunk_index,
+                segments=[],
+                processing_time_ms=0,
+                status="processing",
+            )
+            if refine:
+                # Coarse pass for the live view. It leaves the session's
+                # speakers to the refined pass, so its labels are the chunk's own.
+                try:
+                    coarse = await run_diarization(
+                        service,
+                        uploaded,
+                        session_id,
+                        extract_embeddings=False,
+                        stable_speakers=False,
+                        tenant=tenant,
+                        quality=get_settings().two_phase_coarse_quality,
+                    )
+                except Exception:
+                    uploaded.close()
+                    raise
+                response = build_response(
+                    session_id, chunk_index, coarse, False, status="processing"
+                )
+
             background_tasks.add_task(
                 process_and_callback,
-                tmp_path,
+                uploaded,
                 session_id,
                 chunk_index,
                 callback_url,
                 extract_embeddings,
+                stable_speakers,
+                tenant,
+                quality,
+                revision=1 if refine else 0,
+                # The refined pass is not what the live view waits for
+                priority="finalization" if refine else priority,
             )
-            return DiarizationResponse(
-                session_id=session_id,
-                chunk_index=chunk_index,
-                segments=[],
-                processing_time_ms=0,
-                status="processing",
-            )
+            return response
 
         # Synchronous processing
-        if extract_embeddings:
-            result = await service.diarize_with_embeddings(tmp_path)
-        else:
-            result = await service.diarize(tmp_path)
+        result = await run_diarization(
+            service,
+            uploaded,
+            session_id,
+            extract_embeddings,
+            stable_speakers,
+            tenant,
+            quality,
+            priority,
+        )
+        return build_response(session_id, chunk_index, result, extract_embeddings)
 
-        segments = [
-            DiarizationSegment(
-                speaker=seg["speaker"],
-                start_time_ms=int(seg["start"] * 1000),
-                end_time_ms=int(seg["end"] * 1000),
-            )
-            for seg in result["segments"]
-        ]
+    finally:
+        # Release audio (if not async)
+        if not callback_url:
+            uploaded.close()
 
-        speaker_embeddings = None
-        if extract_embeddings and "speaker_embeddings" in result:
-            speaker_embeddings = [
-                SpeakerEmbedding(
-                    label=emb["label"],
-                    embedding=emb["embedding"],
-                    duration_ms=emb["duration_ms"],
-                )
-                for emb in result["speaker_embeddings"]
-            ]
 
-        return DiarizationResponse(
-            session_id=session_id,
-            chunk_index=chunk_index,
-            segments=segments,
-            processing_time_ms=result["processing_time_ms"],
-            status="completed",
-            speaker_embeddings=speaker_embeddings,
-        )
+async def enqueue_callback(callback_url: str, payload: dict):
+    """Hand a callback to the outbox, which delivers and retries it."""
+    from app.main import get_callback_outbox
 
-    finally:
-        # Clean up temp file (if not async)
-        if not callback_url and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+    await get_callback_outbox().enqueue(callback_url, payload)
 
 
 async def process_and_callback(
-    audio_path: str,
+    uploaded: UploadedAudio,
     session_id: str,
     chunk_index: int,
     callback_url: str,
     extract_embeddings: bool = False,
+    stable_speakers: bool = False,
+    tenant: str = DEFAULT_TENANT,
+    quality: Optional[str] = None,
+    revision: int = 0,
+    priority: str = "realtime",
 ):
-    """Process audio and send result to callback URL."""
+    """
+    Process audio and send result to callback URL.
+
+    Args:
+        revision: Revision of the result; refined results of two-phase
+                  requests are revision 1
+        priority: Priority class the diarization runs with
+    """
     try:
+        from app.main import get_pyannote_service
+
         service = get_pyannote_service()
 
-        if extract_embeddings:
-            result = await service.diarize_with_embeddings(audio_path)
-        else:
-            result = await service.diarize(audio_path)
+        result = await run_diarization(
+            service,
+            uploaded,
+            session_id,
+            extract_embeddings,
+            stable_speakers,
+            tenant,
+            quality,
+            priority,
+        )
 
         segments = [
             {
@@ -155,9 +351,12 @@ async def process_and_callback(
             "session_id": session_id,
             "chunk_index": chunk_index,
             "success": True,
+            "revision": revision,
             "result": {
                 "segments": segments,
                 "processing_time_ms": result["processing_time_ms"],
+                "quality": result.get("quality"),
+                "degradation_level": result.get("degradation_level", 0),
             },
         }
 
@@ -172,19 +371,13 @@ async def process_and_callback(
                 for emb in result["speaker_embeddings"]
             ]
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                callback_url,
-                json=callback_data,
-                headers={"Content-Type": "application/json"},
-                timeout=30.0,
-            )
-            response.raise_for_status()
+        await enqueue_callback(callback_url, callback_data)
 
         logger.info(
-            "Callback sent successfully",
+            "Callback queued",
             session_id=session_id,
             chunk_index=chunk_index,
+            revision=revision,
         )
 
     except Exception as e:
@@ -197,23 +390,21 @@ async def process_and_callback(
 
         # Send error callback
         try:
-            async with httpx.AsyncClient() as client:
-                await client.post(
-                    callback_url,
-                    json={
-                        "session_id": session_id,
-                        "chunk_index": chunk_index,
-                        "success": False,
-                        "error": str(e),
-                    },
-                    timeout=30.0,
-                )
+            await enqueue_callback(
+                callback_url,
+                {
+                    "session_id": session_id,
+                    "chunk_index": chunk_index,
+                    "success": False,
+                    "revision": revision,
+                    "error": str(e),
+                },
+            )
         except Exception:
-            logger.error("Failed to send error callback")
+            logger.error("Failed to queue error callback")
 
     finally:
-        if os.path.exists(audio_path):
-            os.unlink(audio_path)
+        uploaded.close()
 
 
 @router.post("/extract-embedding", response_model=EmbeddingResponse)
@@ -254,22 +445,22 @@ async def extract_embedding(
             detail="speaker_label must be 'customer' or 'stylist'",
         )
 
-    # Save uploaded file temporarily
-    suffix = os.path.splitext(file.filename or "audio.wav")[1]
-    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
-        content = await file.read()
-        tmp.write(content)
-        tmp_path = tmp.name
+    uploaded = await load_upload(file)
 
     try:
+        from app.main import get_pyannote_service
+
         service = get_pyannote_service()
-        result = await service.extract_embedding(tmp_path, speaker_label)
+        result = await service.extract_embedding(uploaded.audio, speaker_label)
 
         return EmbeddingResponse(
             embedding=result["embedding"],
             duration_seconds=result["duration_seconds"],
             confidence=result["confidence"],
             processing_time_ms=result["processing_time_ms"],
+            segments_used=result.get("segments_used"),
+            segments_total=result.get("segments_total"),
+            time_saved_ms=result.get("time_saved_ms"),
         )
 
     except Exception as e:
@@ -280,5 +471,20 @@ async def extract_embedding(
         )
 
     finally:
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+        uploaded.close()
+
+
+@router.delete("/sessions/{session_id}")
+async def close_session(session_id: str):
+    """
+    Close a diarization session.
+
+    Drops the session's speaker state used for stable labels. Call this when
+    the salon session ends; idle sessions are also evicted automatically.
+    """
+    from app.main import get_pyannote_service
+
+    service = get_pyannote_service()
+    closed = service.close_session(session_id)
+
+    return {"session_id": session_id, "closed": closed}
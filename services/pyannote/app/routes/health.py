@@ -4,6 +4,8 @@ Health check routes
 
 from fastapi import APIRouter
 
+from app.metrics import metrics
+
 router = APIRouter()
 
 
@@ -21,4 +23,20 @@ async def readiness_check():
     if pyannote_service is None or not pyannote_service.is_ready:
         return {"status": "not_ready", "reason": "Model not loaded"}
 
-    return {"status": "ready"}
+    pool = pyannote_service.pool
+    return {
+        "status": "ready",
+        "inference_pool": {
+            "replicas": pool.size,
+            "idle": pool.available,
+            "waiting": pool.waiting,
+        }
+        if pool is not None
+        else None,
+    }
+
+
+@router.get("/metrics")
+async def metrics_snapshot():
+    """In-process service metrics."""
+    return metrics.snapshot()
@@ -0,0 +1,76 @@
+"""
+Diarization job routes
+"""
+
+import asyncio
+
+import structlog
+from fastapi import APIRouter, HTTPException
+
+from app.models.jobs import JobStatusResponse, JobSubmitRequest, JobSubmitResponse
+from app.services.callbacks import validate_callback_url
+from app.workers.job_queue import QueueFullError
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+
+@router.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(request: JobSubmitRequest):
+    """
+    Submit a diarization job for audio at a URL.
+
+    The audio is downloaded and diarized in the background; the result is
+    sent to the callback URL and can be polled at /api/v1/jobs/{job_id}.
+    Responds 429 with Retry-After when the job queue is overloaded.
+    """
+    from app.main import get_diarization_worker
+
+    try:
+        validate_callback_url(request.callback_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    worker = get_diarization_worker()
+    try:
+        job_id = await worker.submit_job(
+            audio_url=request.audio_url,
+            callback_url=request.callback_url,
+            metadata=request.metadata,
+            priority=request.priority,
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    return JobSubmitResponse(job_id=job_id)
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """
+    Get the status of a diarization job.
+
+    Finished jobs are kept for the configured retention period.
+    """
+    from app.main import get_diarization_worker
+
+    worker = get_diarization_worker()
+    job = await asyncio.to_thread(worker.get_job_status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    return JobStatusResponse(
+        job_id=job.id,
+        status=job.status,
+        priority=job.priority,
+        metadata=job.metadata,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        completed_at=job.completed_at,
+        result=job.result,
+        error=job.error,
+    )
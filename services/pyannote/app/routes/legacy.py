@@ -0,0 +1,159 @@
+"""
+Legacy pyannote-server routes
+
+URL-based /diarize and /diarize/sync, served by this service so that callers
+of the retired services/pyannote-server keep working against the same
+process-wide model as /api/v1. Both routes only translate between the legacy
+request/response shapes and the regular diarization path (download, fair
+scheduling, result cache, callback outbox).
+"""
+
+import asyncio
+import uuid
+from typing import Optional
+
+import structlog
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException
+
+from app.config import get_settings
+from app.models.legacy import (
+    LegacyAsyncResponse,
+    LegacyCallbackPayload,
+    LegacyDiarizationRequest,
+    LegacyDiarizationResponse,
+    LegacyDiarizationSegment,
+)
+from app.routes.diarization import enqueue_callback, run_diarization
+from app.services.download import download_audio
+from app.services.tenant_scheduler import tenant_of
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+# pyannote-server ran the pipeline with min_speakers=max_speakers=2 (stylist
+# and customer); legacy callers rely on that
+LEGACY_NUM_SPEAKERS = 2
+
+
+def verify_api_key(authorization: Optional[str]):
+    """Check the legacy API key, if one is configured."""
+    api_key = get_settings().legacy_api_key
+    if not api_key:
+        return
+
+    if not authorization:
+        raise HTTPException(status_code=401, detail="API key required")
+
+    # Support both "Bearer <key>" and just "<key>"
+    if authorization.replace("Bearer ", "").strip() != api_key:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+
+async def diarize_url(audio_url: str, metadata: Optional[dict]) -> LegacyDiarizationResponse:
+    """Download audio from a URL and diarize it."""
+    from app.main import get_http_client, get_pyannote_service
+
+    settings = get_settings()
+    downloaded = await download_audio(
+        get_http_client(),
+        audio_url,
+        settings.audio_spill_threshold_bytes,
+        settings.worker_download_chunk_bytes,
+    )
+    try:
+        uploaded = await asyncio.to_thread(
+            downloaded.decode, settings.audio_spill_threshold_bytes
+        )
+    finally:
+        downloaded.discard()
+
+    try:
+        result = await run_diarization(
+            get_pyannote_service(),
+            uploaded,
+            session_id=None,
+            extract_embeddings=False,
+            stable_speakers=False,
+            tenant=tenant_of(metadata),
+            num_speakers=LEGACY_NUM_SPEAKERS,
+        )
+    finally:
+        uploaded.close()
+
+    segments = [
+        LegacyDiarizationSegment(speaker=seg["speaker"], start=seg["start"], end=seg["end"])
+        for seg in result["segments"]
+    ]
+    return LegacyDiarizationResponse(
+        segments=segments,
+        speakers=list(dict.fromkeys(seg.speaker for seg in segments)),
+        processing_time_ms=result["processing_time_ms"],
+    )
+
+
+async def diarize_url_and_callback(
+    job_id: str,
+    audio_url: str,
+    callback_url: Optional[str],
+    metadata: Optional[dict],
+):
+    """Diarize audio from a URL and queue the legacy callback."""
+    try:
+        result = await diarize_url(audio_url, metadata)
+        payload = LegacyCallbackPayload(
+            job_id=job_id, success=True, result=result, metadata=metadata
+        )
+    except Exception as e:
+        logger.error("Legacy diarization failed", job_id=job_id, error=str(e))
+        payload = LegacyCallbackPayload(
+            job_id=job_id, success=False, error=str(e), metadata=metadata
+        )
+
+    if callback_url:
+        try:
+            await enqueue_callback(callback_url, payload.model_dump())
+        except Exception:
+            logger.error("Failed to queue legacy callback", job_id=job_id)
+
+
+@router.post("/diarize", response_model=LegacyAsyncResponse)
+async def diarize_async(
+    request: LegacyDiarizationRequest,
+    background_tasks: BackgroundTasks,
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Submit audio at a URL for asynchronous diarization (pyannote-server API).
+
+    Results are sent to the callback URL when processing is complete.
+    """
+    verify_api_key(authorization)
+    job_id = str(uuid.uuid4())
+
+    background_tasks.add_task(
+        diarize_url_and_callback,
+        job_id,
+        str(request.audio_url),
+        str(request.callback_url) if request.callback_url else None,
+        request.metadata,
+    )
+
+    return LegacyAsyncResponse(
+        job_id=job_id,
+        status="processing",
+        message="Diarization job submitted. Results will be sent to callback URL.",
+    )
+
+
+@router.post("/diarize/sync", response_model=LegacyDiarizationResponse)
+async def diarize_sync(
+    request: LegacyDiarizationRequest,
+    authorization: Optional[str] = Header(None),
+):
+    """Diarize audio at a URL and return the result (pyannote-server API)."""
+    verify_api_key(authorization)
+
+    try:
+        return await diarize_url(str(request.audio_url), request.metadata)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
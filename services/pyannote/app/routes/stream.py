@@ -0,0 +1,144 @@
+"""
+Streaming diarization routes
+"""
+
+import asyncio
+import json
+from typing import Optional
+
+import structlog
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+
+from app.config import get_settings
+from app.metrics import metrics
+from app.services.audio import SAMPLE_RATE
+from app.services.streaming import SUPPORTED_SAMPLE_RATES, StreamingDiarizer, StreamUpdate
+from app.services.tenant_scheduler import tenant_of
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+
+async def send_update(websocket: WebSocket, update: StreamUpdate):
+    """Send finalized turns and the provisional rest of the window."""
+    for turn in update.turns:
+        await websocket.send_json({"type": "turn", **turn})
+    await websocket.send_json({
+        "type": "partial",
+        "segments": update.partial,
+        "finalized_until": update.finalized_until,
+    })
+
+
+@router.websocket("/stream")
+async def stream_diarization(
+    websocket: WebSocket,
+    session_id: str,
+    sample_rate: int = SAMPLE_RATE,
+    salon_id: Optional[str] = None,
+):
+    """
+    Diarize a live audio stream.
+
+    - **session_id**: Session identifier; labels match /diarize with stable_speakers
+    - **sample_rate**: Sample rate of the PCM frames (8000 to 48000 Hz; connections
+      with another rate are refused)
+    - **salon_id**: Salon the stream belongs to; its windows are queued fairly per
+      salon together with /diarize requests
+
+    The client sends binary frames of 16-bit little-endian mono PCM and a
+    ``{"type": "end"}`` text message when the recording stops. The server
+    sends ``{"type": "turn", "speaker", "start", "end"}`` for every finalized
+    speaker turn (seconds since the start of the stream), a ``partial``
+    message with the provisional turns after each window, and ``end`` once
+    the stream has been fully processed.
+    """
+    from app.main import get_pyannote_service
+
+    if sample_rate not in SUPPORTED_SAMPLE_RATES:
+        logger.warning("Stream refused", session_id=session_id, sample_rate=sample_rate)
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION, reason=f"Unsupported sample rate: {sample_rate}"
+        )
+        return
+
+    service = get_pyannote_service()
+    settings = get_settings()
+
+    await websocket.accept()
+    logger.info("Stream opened", session_id=session_id, sample_rate=sample_rate)
+    metrics.gauge("stream_connections").inc()
+
+    diarizer = StreamingDiarizer(
+        service,
+        session_id,
+        sample_rate=sample_rate,
+        window_seconds=settings.stream_window_seconds,
+        step_seconds=settings.stream_step_seconds,
+        finalize_lag_seconds=settings.stream_finalize_lag_seconds,
+        tenant=tenant_of({"salon_id": salon_id}),
+    )
+    audio_ready = asyncio.Event()
+    closing = False
+
+    async def process_loop():
+        # Windows are diarized one at a time; if inference falls behind,
+        # the next window covers all audio not finalized yet.
+        while not closing:
+            await audio_ready.wait()
+            audio_ready.clear()
+            if closing or not diarizer.ready:
+                continue
+            try:
+                update = await diarizer.process()
+            except Exception as e:
+                logger.error("Stream window failed", session_id=session_id, error=str(e))
+                await websocket.send_json({"type": "error", "message": str(e)})
+                continue
+            await send_update(websocket, update)
+
+    processor = asyncio.create_task(process_loop())
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes"):
+                diarizer.push(message["bytes"])
+                if diarizer.ready:
+                    audio_ready.set()
+                continue
+
+            control = json.loads(message.get("text") or "{}")
+            if control.get("type") == "end":
+                # Let the running window finish, then flush the rest
+                closing = True
+                audio_ready.set()
+                await processor
+                await send_update(websocket, await diarizer.process(final=True))
+                await websocket.send_json({
+                    "type": "end",
+                    "duration": diarizer.received_seconds,
+                })
+                await websocket.close()
+                break
+
+    except WebSocketDisconnect:
+        pass
+
+    except Exception as e:
+        logger.error("Stream failed", session_id=session_id, error=str(e))
+        await websocket.close(code=1011)
+
+    finally:
+        processor.cancel()
+        await asyncio.gather(processor, return_exceptions=True)
+        metrics.gauge("stream_connections").dec()
+        logger.info(
+            "Stream closed",
+            session_id=session_id,
+            duration=diarizer.received_seconds,
+            finalized_until=diarizer.finalized_until,
+        )
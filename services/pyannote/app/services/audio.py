@@ -0,0 +1,172 @@
+"""
+Audio loading helpers
+
+Uploaded audio is decoded in memory into a float32 ``(channel, time)`` tensor
+and handed to pyannote as a ``{"waveform": ..., "sample_rate": ...}`` mapping,
+so the pipeline never re-reads it from disk. Very large uploads, and formats
+that cannot be decoded in memory (e.g. M4A/WebM, which need ffmpeg), are
+spilled to a temporary file and passed to pyannote by path instead.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from typing import Any, BinaryIO, Dict, Optional, Tuple, Union
+
+import soundfile as sf
+import structlog
+import torch
+import torchaudio
+
+logger = structlog.get_logger()
+
+# Input accepted by the pyannote pipeline: a file path or an in-memory waveform
+AudioInput = Union[str, Dict[str, Any]]
+
+# Sample rate expected by the pyannote segmentation and embedding models
+SAMPLE_RATE = 16000
+
+
+def decode_audio_bytes(content: bytes) -> Dict[str, Any]:
+    """
+    Decode audio bytes in memory.
+
+    Returns:
+        Dict with a float32 (channel, time) "waveform" tensor and its "sample_rate"
+
+    Raises:
+        RuntimeError: If the format cannot be decoded in memory
+    """
+    data, sample_rate = sf.read(io.BytesIO(content), dtype="float32", always_2d=True)
+    waveform = torch.from_numpy(data.T.copy())
+    return {"waveform": waveform, "sample_rate": int(sample_rate)}
+
+
+def _load_path(path: str) -> Tuple[torch.Tensor, int]:
+    """Decode an audio file from disk into a (channel, time) tensor."""
+    try:
+        data, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+        return torch.from_numpy(data.T.copy()), int(sample_rate)
+    except Exception:
+        # Compressed formats (M4A/WebM) are decoded through torchaudio/ffmpeg
+        return torchaudio.load(path)
+
+
+class DecodedAudio:
+    """
+    Audio of one request, decoded once to 16 kHz mono.
+
+    Every stage of a request (duration, segmentation, per-segment embedding)
+    works on this object. ``crop`` returns views into the same tensor, so
+    slicing a segment never copies or re-decodes the audio.
+    """
+
+    def __init__(self, waveform: torch.Tensor):
+        self.waveform = waveform
+        self.sample_rate = SAMPLE_RATE
+
+    @classmethod
+    def load(cls, audio: Union[AudioInput, "DecodedAudio"]) -> "DecodedAudio":
+        """Decode a path or waveform mapping; already decoded audio is returned as is."""
+        if isinstance(audio, DecodedAudio):
+            return audio
+
+        if isinstance(audio, str):
+            waveform, sample_rate = _load_path(audio)
+        else:
+            waveform = torch.as_tensor(audio["waveform"], dtype=torch.float32)
+            sample_rate = int(audio["sample_rate"])
+
+        if waveform.shape[0] > 1:
+            waveform = waveform.mean(dim=0, keepdim=True)
+
+        if sample_rate != SAMPLE_RATE:
+            waveform = torchaudio.functional.resample(waveform, sample_rate, SAMPLE_RATE)
+
+        return cls(waveform)
+
+    @property
+    def num_samples(self) -> int:
+        """Number of samples."""
+        return self.waveform.shape[1]
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds."""
+        return self.num_samples / self.sample_rate
+
+    def crop(self, start: float, end: float) -> torch.Tensor:
+        """Return a (1, time) view of the waveform between start and end seconds."""
+        start_frame = max(int(round(start * self.sample_rate)), 0)
+        end_frame = min(int(round(end * self.sample_rate)), self.num_samples)
+        return self.waveform[:, start_frame:end_frame]
+
+    def as_pipeline_input(self) -> Dict[str, Any]:
+        """Return a mapping the pyannote pipeline accepts without re-decoding."""
+        return {"waveform": self.waveform, "sample_rate": self.sample_rate}
+
+
+class UploadedAudio:
+    """
+    Audio of a single request, either decoded in memory or spilled to disk.
+
+    Call ``close()`` once processing is finished to remove any spill-over file.
+    """
+
+    def __init__(
+        self,
+        audio: AudioInput,
+        spill_path: Optional[str] = None,
+        content_hash: Optional[str] = None,
+    ):
+        self.audio = audio
+        self.spill_path = spill_path
+        # SHA-256 of the uploaded bytes, used as the result cache key
+        self.content_hash = content_hash
+
+    @property
+    def in_memory(self) -> bool:
+        """Whether the audio was decoded in memory."""
+        return self.spill_path is None
+
+    @classmethod
+    def from_bytes(
+        cls,
+        content: bytes,
+        filename: Optional[str],
+        spill_threshold_bytes: int,
+    ) -> "UploadedAudio":
+        """Decode uploaded bytes, spilling to a temp file when too large or undecodable."""
+        if len(content) <= spill_threshold_bytes:
+            try:
+                return cls(
+                    decode_audio_bytes(content),
+                    content_hash=hashlib.sha256(content).hexdigest(),
+                )
+            except Exception as e:
+                logger.info(
+                    "In-memory decode unavailable, spilling to disk",
+                    filename=filename,
+                    error=str(e),
+                )
+
+        return cls.spill(io.BytesIO(content), filename)
+
+    @classmethod
+    def spill(cls, stream: BinaryIO, filename: Optional[str]) -> "UploadedAudio":
+        """Copy a stream to a temporary file and reference it by path."""
+        suffix = os.path.splitext(filename or "audio.wav")[1]
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+            while chunk := stream.read(1024 * 1024):
+                digest.update(chunk)
+                tmp.write(chunk)
+            path = tmp.name
+
+        return cls(path, spill_path=path, content_hash=digest.hexdigest())
+
+    def close(self):
+        """Release the audio, removing any spill-over file."""
+        if self.spill_path and os.path.exists(self.spill_path):
+            os.unlink(self.spill_path)
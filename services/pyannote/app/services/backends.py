@@ -0,0 +1,401 @@
+"""
+Inference backends
+
+Segmentation and embedding models run in PyTorch eager mode by default. The
+"torchscript" and "onnx" backends export each model once (traced with example
+inputs at its real shapes) and run the exported graph instead: a frozen
+TorchScript module, or an ONNX Runtime CPU session. The exported runner
+replaces the model's ``forward``, so pyannote's ``Inference`` wrappers, the
+pipeline and ``embed_chunks`` keep calling the model as before, and all
+inference replicas share one exported runner.
+
+Before a runner is installed, it is checked against the eager model on
+inputs of other batch sizes and durations than it was traced with; a model
+whose export fails or whose exported graph does not reproduce the eager
+outputs keeps running in eager mode, with a warning.
+"""
+
+import hashlib
+import importlib.util
+import inspect
+import os
+import tempfile
+import threading
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import structlog
+import torch
+
+logger = structlog.get_logger()
+
+BACKENDS = ("torch", "torchscript", "onnx")
+
+# Sample rate of the segmentation and embedding models
+SAMPLE_RATE = 16000
+
+# pyannote's clustering step embeds 10 s chunks with speaker masks at the
+# segmentation model's frame resolution (589 frames per chunk)
+MASK_CHUNK_SECONDS = 10.0
+MASK_FRAMES = 589
+
+# Largest difference between exported and eager outputs accepted at startup
+PARITY_RTOL = 1e-3
+PARITY_ATOL = 1e-4
+
+
+@dataclass
+class ModelSpec:
+    """How to trace a model: example inputs and which of their axes vary."""
+
+    name: str
+    example_inputs: Tuple[torch.Tensor, ...]
+    input_names: List[str]
+    dynamic_axes: Dict[str, Dict[int, str]] = field(default_factory=dict)
+    # Inputs at other shapes than the example, used to check the exported graph
+    check_inputs: List[Tuple[torch.Tensor, ...]] = field(default_factory=list)
+
+
+def accepts_weights(model: torch.nn.Module) -> bool:
+    """Whether the model's forward takes a frame weights mask (statistics pooling)."""
+    try:
+        return "weights" in inspect.signature(model.forward).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def segmentation_spec(model: torch.nn.Module, name: str = "segmentation") -> ModelSpec:
+    """Trace spec for a segmentation model: fixed-length chunks, variable batch."""
+    specifications = getattr(model, "specifications", None)
+    duration = getattr(specifications, "duration", None) or 10.0
+    samples = int(duration * SAMPLE_RATE)
+    return ModelSpec(
+        name=name,
+        example_inputs=(torch.randn(2, 1, samples) * 0.1,),
+        input_names=["waveforms"],
+        dynamic_axes={"waveforms": {0: "batch"}, "output": {0: "batch"}},
+        check_inputs=[(torch.randn(batch, 1, samples) * 0.1,) for batch in (1, 3)],
+    )
+
+
+def embedding_spec(model: torch.nn.Module, name: str = "embedding") -> ModelSpec:
+    """
+    Trace spec for an embedding model: variable batch and duration.
+
+    Models taking weights are checked with sample-level weights (turns with
+    overlapping speech) and with frame-level masks (the clustering step).
+    """
+    samples = 3 * SAMPLE_RATE
+    inputs: Tuple[torch.Tensor, ...] = (torch.randn(2, 1, samples) * 0.1,)
+    names = ["waveforms"]
+    axes = {"waveforms": {0: "batch", 2: "samples"}, "output": {0: "batch"}}
+    checks: List[Tuple[torch.Tensor, ...]] = [
+        (torch.randn(batch, 1, int(seconds * SAMPLE_RATE)) * 0.1,)
+        for batch, seconds in ((1, 1.0), (3, 5.0))
+    ]
+    if accepts_weights(model):
+        inputs += (torch.ones(2, samples),)
+        names.append("weights")
+        # Sample-level weights and frame-level masks have different lengths
+        axes["weights"] = {0: "batch", 1: "weight_frames"}
+        for index, (waveforms,) in enumerate(checks):
+            # Mask half of the first chunk, as for a turn with overlapping speech
+            weights = torch.ones(waveforms.shape[0], waveforms.shape[-1])
+            weights[0, weights.shape[1] // 2 :] = 0.0
+            checks[index] = (waveforms, weights)
+        masks = (torch.rand(3, MASK_FRAMES) > 0.3).float()
+        masks[0] = 1.0
+        checks.append(
+            (torch.randn(3, 1, int(MASK_CHUNK_SECONDS * SAMPLE_RATE)) * 0.1, masks)
+        )
+    return ModelSpec(name, inputs, names, axes, checks)
+
+
+def model_fingerprint(model: torch.nn.Module) -> str:
+    """Short hash of a model's weights, naming its exported files."""
+    digest = hashlib.sha256()
+    for name, tensor in model.state_dict().items():
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def export_torchscript(
+    model: torch.nn.Module,
+    example_inputs: Sequence[torch.Tensor],
+    path: Optional[str] = None,
+) -> torch.jit.ScriptModule:
+    """
+    Trace a model to a frozen TorchScript module.
+
+    Args:
+        model: Model in eval mode
+        example_inputs: Inputs to trace with
+        path: Where to save the module (optional)
+    """
+    with torch.no_grad():
+        traced = torch.jit.trace(model.eval(), tuple(example_inputs), check_trace=False)
+    frozen = torch.jit.freeze(traced.eval())
+    if path:
+        frozen.save(path)
+    return frozen
+
+
+def export_onnx(model: torch.nn.Module, spec: ModelSpec, path: str, opset: int = 17) -> str:
+    """
+    Export a model to ONNX.
+
+    Args:
+        model: Model in eval mode
+        spec: Example inputs, input names and dynamic axes
+        path: Output file
+        opset: ONNX opset version
+
+    Returns:
+        The output path
+    """
+    kwargs: Dict[str, Any] = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # The TorchScript-based exporter handles pyannote's LSTMs and SincNet
+        kwargs["dynamo"] = False
+
+    # Write to a temporary name so a failed export never leaves a usable file
+    tmp_path = f"{path}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            model.eval(),
+            spec.example_inputs,
+            tmp_path,
+            input_names=spec.input_names,
+            output_names=["output"],
+            dynamic_axes=spec.dynamic_axes,
+            opset_version=opset,
+            **kwargs,
+        )
+    os.replace(tmp_path, path)
+    return path
+
+
+class OnnxRunner:
+    """
+    Runs an exported ONNX model with ONNX Runtime on CPU.
+
+    The session is created on first use in each process, sized from the torch
+    thread count at that time: a prefork worker must not run on the session
+    its parent created with the parent's single thread. ``reset_onnx_sessions``
+    drops the sessions of every runner so they are rebuilt.
+    """
+
+    def __init__(self, path: str, input_names: Sequence[str], threads: int = 0):
+        """
+        Args:
+            path: ONNX model file
+            input_names: Names of the graph inputs, in call order
+            threads: Intra-op threads (0 = torch.get_num_threads() when the
+                     session is created)
+        """
+        self.path = path
+        self.input_names = list(input_names)
+        self.threads = threads
+        self._session: Any = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        _onnx_runners.add(self)
+
+    @property
+    def session(self) -> Any:
+        """ONNX Runtime session of the current process."""
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                self._session = self._create_session()
+                self._pid = os.getpid()
+            return self._session
+
+    def _create_session(self) -> Any:
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.threads or torch.get_num_threads()
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return onnxruntime.InferenceSession(
+            self.path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+    def reset(self):
+        """Drop the session; the next call creates one with the current thread count."""
+        with self._lock:
+            self._session = None
+            self._pid = None
+
+    def __call__(self, *inputs: torch.Tensor) -> torch.Tensor:
+        feeds = {
+            name: tensor.detach().cpu().float().numpy()
+            for name, tensor in zip(self.input_names, inputs)
+        }
+        (output,) = self.session.run(["output"], feeds)
+        return torch.from_numpy(output)
+
+
+_onnx_runners: "weakref.WeakSet[OnnxRunner]" = weakref.WeakSet()
+
+
+def reset_onnx_sessions():
+    """Rebuild every ONNX Runtime session on next use (e.g. after a thread count change)."""
+    for runner in list(_onnx_runners):
+        runner.reset()
+
+
+def compile_model(
+    model: torch.nn.Module,
+    spec: ModelSpec,
+    backend: str,
+    cache_dir: Optional[str] = None,
+) -> Callable[..., torch.Tensor]:
+    """
+    Export a model for a backend and return a runner taking the spec's inputs.
+
+    Exported files are kept in ``cache_dir`` (named by backend, model and
+    weights fingerprint) and reused by later starts.
+    """
+    if backend not in BACKENDS or backend == "torch":
+        raise ValueError(f"Not an export backend: {backend}")
+
+    directory = cache_dir or tempfile.mkdtemp(prefix="pyannote-backend-")
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"{spec.name}-{model_fingerprint(model)}")
+
+    if backend == "torchscript":
+        path = f"{stem}.pt"
+        if os.path.exists(path):
+            return torch.jit.load(path)
+        return export_torchscript(model, spec.example_inputs, path)
+
+    path = f"{stem}.onnx"
+    if not os.path.exists(path):
+        export_onnx(model, spec, path)
+    return OnnxRunner(path, spec.input_names)
+
+
+def check_parity(
+    model: torch.nn.Module,
+    runner: Callable[..., torch.Tensor],
+    spec: ModelSpec,
+    rtol: float = PARITY_RTOL,
+    atol: float = PARITY_ATOL,
+):
+    """
+    Check that an exported runner reproduces the eager model.
+
+    Args:
+        model: Model with its eager forward
+        runner: Exported runner for the model
+        spec: Spec whose ``check_inputs`` are compared
+
+    Raises:
+        RuntimeError: If an output's shape or values differ beyond the tolerances
+    """
+    with torch.inference_mode():
+        for inputs in spec.check_inputs:
+            expected = model(*inputs)
+            actual = runner(*inputs)
+            shape = tuple(inputs[0].shape)
+            if actual.shape != expected.shape:
+                raise RuntimeError(
+                    f"Output shape {tuple(actual.shape)} != {tuple(expected.shape)} "
+                    f"for input {shape}"
+                )
+            if not torch.allclose(actual.float(), expected.float(), rtol=rtol, atol=atol):
+                difference = (actual.float() - expected.float()).abs().max().item()
+                raise RuntimeError(f"Outputs differ by {difference:.3g} for input {shape}")
+
+
+def install_runner(model: torch.nn.Module, runner: Callable[..., torch.Tensor], spec: ModelSpec):
+    """Make ``model(...)`` call ``runner`` instead of the eager forward."""
+    if "weights" in spec.input_names:
+
+        def forward(waveforms: torch.Tensor, weights: Optional[torch.Tensor] = None):
+            if weights is None:
+                weights = torch.ones(waveforms.shape[0], waveforms.shape[-1])
+            return runner(waveforms, weights)
+
+    else:
+
+        def forward(waveforms: torch.Tensor):
+            return runner(waveforms)
+
+    model.forward = forward
+
+
+def apply_backend(
+    backend: str,
+    models: Dict[str, Sequence[torch.nn.Module]],
+    cache_dir: Optional[str] = None,
+) -> Dict[str, str]:
+    """
+    Switch models to an inference backend.
+
+    Each entry of ``models`` holds one model's copies (one per inference
+    replica); the first copy is exported and its runner is shared by all of
+    them. The "segmentation" entry is traced as a segmentation model, every
+    other entry as a speaker embedding model.
+
+    Args:
+        backend: "torch", "torchscript" or "onnx"
+        models: Model copies by name
+        cache_dir: Directory for exported models (default: a temporary directory)
+
+    Returns:
+        Backend each model actually runs on, e.g. {"segmentation": "onnx"}
+
+    Raises:
+        ValueError: If the backend is unknown
+        RuntimeError: If the onnx backend is selected without onnxruntime installed
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if backend == "onnx" and importlib.util.find_spec("onnxruntime") is None:
+        raise RuntimeError(
+            "The onnx inference backend requires onnxruntime "
+            "(pip install -r requirements-onnx.txt)"
+        )
+
+    applied: Dict[str, str] = {}
+    for name, copies in models.items():
+        if not copies:
+            continue
+        applied[name] = "torch"
+        if backend == "torch":
+            continue
+
+        make_spec = segmentation_spec if name == "segmentation" else embedding_spec
+        spec = make_spec(copies[0], name)
+        try:
+            runner = compile_model(copies[0], spec, backend, cache_dir)
+        except Exception as e:
+            logger.warning(
+                "Model export failed, keeping eager mode",
+                model=name,
+                backend=backend,
+                error=str(e),
+            )
+            continue
+
+        try:
+            check_parity(copies[0], runner, spec)
+        except Exception as e:
+            logger.warning(
+                "Exported model does not match eager mode, keeping eager mode",
+                model=name,
+                backend=backend,
+                error=str(e),
+            )
+            continue
+
+        for model in copies:
+            install_runner(model, runner, spec)
+        applied[name] = backend
+
+    logger.info("Inference backend applied", backend=backend, models=applied)
+    return applied
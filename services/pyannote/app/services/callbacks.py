@@ -0,0 +1,306 @@
+"""
+Callback delivery
+
+Diarization results for asynchronous requests are posted to the caller's
+callback URL (the Supabase ``diarization-callback`` function). Callbacks are
+first written to an outbox in a local SQLite file and then delivered by a
+background loop over one shared, pooled HTTP client, so bursts reuse warm
+connections and a callback that fails (or a process that restarts) is retried
+with exponential backoff instead of losing the result. Callbacks that cannot
+be delivered are moved to a dead-letter table.
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import httpx
+import structlog
+
+from app.config import Settings
+from app.metrics import metrics
+
+logger = structlog.get_logger()
+
+# Status codes worth retrying; any other 4xx response is dropped
+RETRYABLE_STATUS = {408, 425, 429}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS callback_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS callback_outbox_due ON callback_outbox (next_attempt_at);
+CREATE TABLE IF NOT EXISTS callback_dead_letter (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    failed_at REAL NOT NULL,
+    last_error TEXT
+);
+"""
+
+# Pause after an unexpected error in the delivery loop
+LOOP_ERROR_BACKOFF_SECONDS = 1.0
+
+
+def validate_callback_url(url: str) -> str:
+    """
+    Check that a callback URL is an absolute http(s) URL that can be posted to.
+
+    Raises:
+        ValueError: If the URL is malformed or not http(s)
+    """
+    try:
+        parsed = httpx.URL(url)
+    except Exception as e:
+        raise ValueError(f"Invalid callback_url: {e}") from None
+    if parsed.scheme not in ("http", "https") or not parsed.host:
+        raise ValueError("callback_url must be an absolute http(s) URL")
+    if parsed.port is not None and not 0 < parsed.port < 65536:
+        raise ValueError(f"Invalid callback_url port: {parsed.port}")
+    return url
+
+
+def create_http_client(settings: Settings) -> httpx.AsyncClient:
+    """
+    Create the process-wide HTTP client.
+
+    Keep-alive connections are pooled; HTTP/2 is used when the optional
+    ``h2`` package is installed (``httpx[http2]``).
+    """
+    http2 = importlib.util.find_spec("h2") is not None
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(settings.callback_timeout_seconds),
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+        ),
+    )
+
+
+@dataclass
+class OutboxEntry:
+    """A callback waiting to be delivered."""
+
+    id: int
+    url: str
+    payload: Dict[str, Any]
+    attempts: int
+    created_at: float
+
+
+class CallbackOutbox:
+    """Durable callback queue with backoff retries."""
+
+    def __init__(
+        self,
+        path: str,
+        client: httpx.AsyncClient,
+        max_attempts: int = 8,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 300.0,
+        batch_size: int = 32,
+    ):
+        self.path = path
+        self.client = client
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.batch_size = batch_size
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._db_lock = threading.Lock()
+
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def start(self):
+        """Start delivering, including callbacks left over from a previous run."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._deliver_loop())
+            logger.info("Callback outbox started", path=self.path, pending=self.pending())
+
+    async def close(self):
+        """Stop delivering. Undelivered callbacks stay in the outbox."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        with self._db_lock:
+            self._db.close()
+
+    def pending(self) -> int:
+        """Number of callbacks waiting for delivery."""
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM callback_outbox").fetchone()[0]
+
+    def dead_letters(self) -> int:
+        """Number of callbacks that could not be delivered."""
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM callback_dead_letter").fetchone()[0]
+
+    async def enqueue(self, url: str, payload: Dict[str, Any]):
+        """Persist a callback and schedule its delivery."""
+        await asyncio.to_thread(self._insert, url, json.dumps(payload), time.time())
+        metrics.counter("callbacks_enqueued").inc()
+        self._wakeup.set()
+
+    def _insert(self, url: str, payload: str, now: float):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT INTO callback_outbox (url, payload, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (url, payload, now, now),
+            )
+
+    def _due(self, now: float) -> List[OutboxEntry]:
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT id, url, payload, attempts, created_at FROM callback_outbox "
+                "WHERE next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (now, self.batch_size),
+            ).fetchall()
+        return [
+            OutboxEntry(id=row[0], url=row[1], payload=json.loads(row[2]),
+                        attempts=row[3], created_at=row[4])
+            for row in rows
+        ]
+
+    def _next_due_at(self) -> Optional[float]:
+        with self._db_lock:
+            row = self._db.execute("SELECT MIN(next_attempt_at) FROM callback_outbox").fetchone()
+        return row[0]
+
+    def _delete(self, entry_id: int):
+        with self._db_lock:
+            self._db.execute("DELETE FROM callback_outbox WHERE id = ?", (entry_id,))
+
+    def _dead_letter(self, entry_id: int, attempts: int, error: str):
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute(
+                    "INSERT INTO callback_dead_letter "
+                    "(id, url, payload, attempts, created_at, failed_at, last_error) "
+                    "SELECT id, url, payload, ?, created_at, ?, ? FROM callback_outbox "
+                    "WHERE id = ?",
+                    (attempts, time.time(), error, entry_id),
+                )
+                self._db.execute("DELETE FROM callback_outbox WHERE id = ?", (entry_id,))
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _reschedule(self, entry_id: int, attempts: int, next_attempt_at: float, error: str):
+        with self._db_lock:
+            self._db.execute(
+                "UPDATE callback_outbox SET attempts = ?, next_attempt_at = ?, last_error = ? "
+                "WHERE id = ?",
+                (attempts, next_attempt_at, error, entry_id),
+            )
+
+    def backoff(self, attempts: int) -> float:
+        """Delay before the next attempt, with full jitter."""
+        delay = min(self.retry_base_seconds * 2 ** (attempts - 1), self.retry_max_seconds)
+        return random.uniform(delay / 2, delay)
+
+    async def _deliver_loop(self):
+        while True:
+            try:
+                await self._deliver_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Never let one failure stop delivery of every later callback
+                metrics.counter("callback_loop_errors").inc()
+                logger.error("Callback delivery loop failed", error=f"{type(e).__name__}: {e}")
+                await asyncio.sleep(LOOP_ERROR_BACKOFF_SECONDS)
+
+    async def _deliver_due(self):
+        """Deliver the callbacks that are due, or wait until one is."""
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            due = await asyncio.to_thread(self._due, now)
+
+            if due:
+                results = await asyncio.gather(
+                    *(self._deliver(entry) for entry in due), return_exceptions=True
+                )
+                for entry, result in zip(due, results):
+                    if isinstance(result, Exception):
+                        await self._drop(entry, entry.attempts + 1, f"{type(result).__name__}: {result}")
+                continue
+
+            next_due_at = await asyncio.to_thread(self._next_due_at)
+            timeout = None if next_due_at is None else max(next_due_at - time.time(), 0.0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver(self, entry: OutboxEntry):
+        error: Optional[str] = None
+        retryable = True
+        try:
+            response = await self.client.post(entry.url, json=entry.payload)
+            if response.status_code >= 400:
+                error = f"HTTP {response.status_code}"
+                retryable = response.status_code >= 500 or response.status_code in RETRYABLE_STATUS
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {e}"
+        except Exception as e:
+            # Malformed URLs (httpx.InvalidURL) and the like never succeed
+            error = f"{type(e).__name__}: {e}"
+            retryable = False
+
+        if error is None:
+            await asyncio.to_thread(self._delete, entry.id)
+            metrics.counter("callbacks_delivered").inc()
+            metrics.summary("callback_delivery_lag_seconds").observe(time.time() - entry.created_at)
+            return
+
+        attempts = entry.attempts + 1
+        if not retryable or attempts >= self.max_attempts:
+            await self._drop(entry, attempts, error)
+            return
+
+        delay = self.backoff(attempts)
+        await asyncio.to_thread(self._reschedule, entry.id, attempts, time.time() + delay, error)
+        metrics.counter("callback_retries").inc()
+        logger.warning("Callback failed, will retry", url=entry.url, attempts=attempts,
+                       retry_in=round(delay, 1), error=error)
+
+    async def _drop(self, entry: OutboxEntry, attempts: int, error: str):
+        """Move a callback that cannot be delivered to the dead-letter table."""
+        await asyncio.to_thread(self._dead_letter, entry.id, attempts, error)
+        metrics.counter("callbacks_dropped").inc()
+        logger.error(
+            "Callback dropped",
+            url=entry.url,
+            attempts=attempts,
+            error=error,
+            session_id=entry.payload.get("session_id"),
+        )
@@ -0,0 +1,145 @@
+"""
+Load-adaptive quality degradation
+
+Under load, a live chunk diarized late is worth less than one diarized a
+little less accurately on time. The controller tracks smoothed queue wait
+(scheduler slots and realtime jobs) and inference time, and while either
+breaches its latency SLO it raises a degradation level: realtime requests
+then run with the segmentation step and batch size of a preset one level
+lower per level (their speaker count and embeddings stay as requested).
+Levels drop back one at a time once both signals are well below their SLOs
+(hysteresis), and never change more often than once per dwell period, so
+the level does not flap between fast and slow settings. The moving averages
+also decay with time, and the level is re-evaluated whenever a request
+resolves its settings, so it falls back after a burst even if no new
+samples arrive.
+"""
+
+import time
+from typing import Callable, Optional, Tuple
+
+import structlog
+
+from app.metrics import metrics
+
+logger = structlog.get_logger()
+
+# Quality presets from most to least accurate
+QUALITY_ORDER = ("accurate", "balanced", "fast")
+
+# Priority class whose requests are degraded
+DEGRADED_PRIORITY = "realtime"
+
+
+class DegradationController:
+    """Raises and restores a degradation level from queue wait and inference time."""
+
+    def __init__(
+        self,
+        queue_wait_slo_seconds: float = 5.0,
+        latency_slo_seconds: float = 20.0,
+        recover_ratio: float = 0.5,
+        min_dwell_seconds: float = 10.0,
+        max_level: int = 2,
+        smoothing: float = 0.3,
+        half_life_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            queue_wait_slo_seconds: Smoothed queue wait that raises the level
+            latency_slo_seconds: Smoothed queue wait plus inference time that
+                                 raises the level
+            recover_ratio: Fraction of both SLOs the signals must fall below
+                           before the level is lowered again
+            min_dwell_seconds: Minimum time between level changes
+            max_level: Highest level
+            smoothing: Weight of a new sample in the moving averages
+            half_life_seconds: Time over which the moving averages halve
+                               without new samples (0 = no decay)
+            clock: Monotonic time source
+        """
+        self.queue_wait_slo_seconds = queue_wait_slo_seconds
+        self.latency_slo_seconds = latency_slo_seconds
+        self.recover_ratio = recover_ratio
+        self.min_dwell_seconds = min_dwell_seconds
+        self.max_level = max_level
+        self.smoothing = smoothing
+        self.half_life_seconds = half_life_seconds
+        self._clock = clock
+
+        self.level = 0
+        self.queue_wait = 0.0
+        self.inference = 0.0
+        self._changed_at = float("-inf")
+        self._decayed_at = clock()
+
+    def observe_wait(self, seconds: float):
+        """Record how long a request or realtime job waited in a queue."""
+        self._decay()
+        self.queue_wait += self.smoothing * (seconds - self.queue_wait)
+        self._update()
+
+    def observe_inference(self, seconds: float):
+        """Record how long an inference took (including waiting for a replica)."""
+        self._decay()
+        self.inference += self.smoothing * (seconds - self.inference)
+        self._update()
+
+    def resolve(
+        self, quality: str, priority: Optional[str] = DEGRADED_PRIORITY
+    ) -> Tuple[str, int]:
+        """
+        Quality whose settings a request runs with, and the level in force for it.
+
+        Both come from one evaluation of the level, so the level reported with
+        a result is the one that chose its settings.
+        """
+        self._refresh()
+        if priority != DEGRADED_PRIORITY or quality not in QUALITY_ORDER:
+            return quality, 0
+        index = min(QUALITY_ORDER.index(quality) + self.level, len(QUALITY_ORDER) - 1)
+        return QUALITY_ORDER[index], self.level
+
+    def _refresh(self):
+        self._decay()
+        self._update()
+
+    def _decay(self):
+        now = self._clock()
+        elapsed = now - self._decayed_at
+        self._decayed_at = now
+        if self.half_life_seconds > 0 and elapsed > 0:
+            factor = 0.5 ** (elapsed / self.half_life_seconds)
+            self.queue_wait *= factor
+            self.inference *= factor
+
+    def _update(self):
+        now = self._clock()
+        if now - self._changed_at < self.min_dwell_seconds:
+            return
+
+        latency = self.queue_wait + self.inference
+        if self.queue_wait > self.queue_wait_slo_seconds or latency > self.latency_slo_seconds:
+            if self.level < self.max_level:
+                self._set_level(self.level + 1, now)
+        elif (
+            self.queue_wait < self.queue_wait_slo_seconds * self.recover_ratio
+            and latency < self.latency_slo_seconds * self.recover_ratio
+        ):
+            # After an idle period, step down once per dwell period it spanned
+            while self.level > 0 and now - self._changed_at >= self.min_dwell_seconds:
+                self._set_level(self.level - 1, self._changed_at + self.min_dwell_seconds)
+
+    def _set_level(self, level: int, now: float):
+        direction = "raised" if level > self.level else "lowered"
+        self.level = level
+        self._changed_at = now
+        metrics.gauge("degradation_level").set(level)
+        metrics.counter("degradation_changes", direction=direction).inc()
+        logger.warning(
+            f"Degradation level {direction}",
+            level=level,
+            queue_wait_seconds=round(self.queue_wait, 2),
+            inference_seconds=round(self.inference, 2),
+        )
@@ -0,0 +1,108 @@
+"""
+Audio downloads
+
+Audio referenced by URL (job submissions and the legacy URL-based routes) is
+streamed over the shared HTTP client into memory, or into a temporary file
+once it exceeds the spill threshold, so a large recording is never buffered
+whole in a response object.
+"""
+
+import asyncio
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+import httpx
+
+from app.metrics import metrics
+from app.services.audio import UploadedAudio
+
+
+@dataclass
+class DownloadedAudio:
+    """Downloaded audio bytes, either in memory or in a temporary file."""
+
+    filename: str
+    content: Optional[bytes] = None
+    path: Optional[str] = None
+
+    def decode(self, spill_threshold_bytes: int) -> UploadedAudio:
+        """
+        Decode the download (blocking). The returned UploadedAudio owns any
+        temporary file from then on.
+        """
+        if self.content is not None:
+            uploaded = UploadedAudio.from_bytes(self.content, self.filename, spill_threshold_bytes)
+            self.content = None
+            return uploaded
+
+        uploaded = UploadedAudio(self.path, spill_path=self.path)
+        self.path = None
+        return uploaded
+
+    def discard(self):
+        """Drop the downloaded bytes and remove the temporary file, if any."""
+        self.content = None
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+def _open_spill_file(suffix: str) -> BinaryIO:
+    return tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+
+
+async def download_audio(
+    client: httpx.AsyncClient,
+    url: str,
+    spill_threshold_bytes: int,
+    chunk_bytes: int = 256 * 1024,
+) -> DownloadedAudio:
+    """
+    Stream audio from a URL into memory, or into a temporary file once it
+    exceeds ``spill_threshold_bytes``.
+
+    Raises:
+        httpx.HTTPError: If the download fails
+    """
+    suffix = ".wav" if ".wav" in url.lower() else ".m4a"
+    downloaded = DownloadedAudio(filename=f"audio{suffix}")
+
+    buffer = bytearray()
+    spill: Optional[BinaryIO] = None
+    try:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            length = int(response.headers.get("content-length") or 0)
+            if length > spill_threshold_bytes:
+                spill = await asyncio.to_thread(_open_spill_file, suffix)
+
+            async for chunk in response.aiter_bytes(chunk_bytes):
+                if spill is None and len(buffer) + len(chunk) > spill_threshold_bytes:
+                    spill = await asyncio.to_thread(_open_spill_file, suffix)
+                    await asyncio.to_thread(spill.write, bytes(buffer))
+                    buffer = bytearray()
+                if spill is not None:
+                    await asyncio.to_thread(spill.write, chunk)
+                else:
+                    buffer += chunk
+
+        if spill is not None:
+            downloaded.path = spill.name
+            metrics.summary("download_bytes").observe(spill.tell())
+        else:
+            downloaded.content = bytes(buffer)
+            metrics.summary("download_bytes").observe(len(buffer))
+        return downloaded
+
+    except BaseException:
+        if spill is not None:
+            spill.close()
+            downloaded.path = spill.name
+        downloaded.discard()
+        raise
+
+    finally:
+        if spill is not None:
+            spill.close()
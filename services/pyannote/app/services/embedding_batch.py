@@ -0,0 +1,146 @@
+"""
+Batched speaker embedding
+
+Embedding one speaker turn at a time costs one forward pass per turn. Here
+turns are sorted by length and grouped into buckets whose longest and
+shortest member differ by at most ``bucket_ratio``; each bucket is zero-padded
+to its longest member and embedded in a single forward pass. Padded samples
+are masked out of the model's statistics pooling through its ``weights``
+argument, so every turn's embedding matches the unbatched result within
+numerical tolerance.
+"""
+
+import inspect
+import warnings
+from typing import Any, List, Sequence
+
+import numpy as np
+import torch
+
+
+class PipelineEmbedding:
+    """
+    Inference-like adapter around a diarization pipeline's own embedding model.
+
+    Lets ``embed_chunks`` (and the rest of the service) use the speaker
+    embedding model that pyannote/speaker-diarization-3.1 already loads for
+    clustering, instead of a separate embedding model.
+    """
+
+    def __init__(self, pipeline: Any):
+        self._embedding = pipeline._embedding
+        self.model = self._embedding.model_
+
+    @property
+    def device(self) -> torch.device:
+        return self._embedding.device
+
+    def infer(self, chunks: torch.Tensor) -> np.ndarray:
+        """Embed a (batch, channel, time) batch of equal-length chunks."""
+        return self._embedding(chunks)
+
+
+def _supports_weights(model: Any) -> bool:
+    """Whether the model's forward accepts a frame weights mask."""
+    forward = getattr(model, "forward", None)
+    if forward is None:
+        return False
+    try:
+        return "weights" in inspect.signature(forward).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def make_buckets(
+    lengths: Sequence[int],
+    max_batch_size: int,
+    bucket_ratio: float,
+) -> List[List[int]]:
+    """
+    Group chunk indices into length buckets.
+
+    Returns:
+        Lists of indices into ``lengths``, each sorted by increasing length
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    buckets: List[List[int]] = []
+    current: List[int] = []
+
+    for index in order:
+        if current and (
+            len(current) >= max_batch_size
+            or lengths[index] > lengths[current[0]] * bucket_ratio
+        ):
+            buckets.append(current)
+            current = []
+        current.append(index)
+
+    if current:
+        buckets.append(current)
+
+    return buckets
+
+
+def _forward(embedding_inference: Any, batch: torch.Tensor, weights: torch.Tensor) -> np.ndarray:
+    """Masked forward pass through the embedding model."""
+    model = embedding_inference.model
+    device = getattr(embedding_inference, "device", torch.device("cpu"))
+    with torch.inference_mode(), warnings.catch_warnings():
+        # StatsPool warns when interpolating sample-level weights to frames
+        warnings.filterwarnings("ignore", message="Mismatch between frames")
+        outputs = model(batch.to(device), weights=weights.to(device))
+    return outputs.cpu().numpy()
+
+
+def embed_chunks(
+    embedding_inference: Any,
+    chunks: Sequence[torch.Tensor],
+    max_batch_size: int = 32,
+    bucket_ratio: float = 1.25,
+) -> List[np.ndarray]:
+    """
+    Embed (1, time) waveform chunks in as few forward passes as possible.
+
+    Args:
+        embedding_inference: pyannote ``Inference`` wrapping the embedding model
+        chunks: Waveform chunks, e.g. ``DecodedAudio.crop`` views
+        max_batch_size: Maximum number of chunks per forward pass
+        bucket_ratio: Maximum ratio between the longest and shortest chunk of a batch
+
+    Returns:
+        One embedding per chunk, in input order
+    """
+    if not chunks:
+        return []
+
+    lengths = [chunk.shape[-1] for chunk in chunks]
+    masked = _supports_weights(getattr(embedding_inference, "model", None))
+    results: List[np.ndarray] = [None] * len(chunks)  # type: ignore[list-item]
+
+    for bucket in make_buckets(lengths, max(max_batch_size, 1), bucket_ratio):
+        max_length = lengths[bucket[-1]]
+        padded = lengths[bucket[0]] != max_length
+
+        if padded and not masked:
+            # Without a weights mask, padding would change the embedding:
+            # fall back to one forward pass per chunk for this bucket.
+            for index in bucket:
+                results[index] = embedding_inference.infer(chunks[index][None])[0]
+            continue
+
+        batch = torch.zeros(len(bucket), 1, max_length)
+        for row, index in enumerate(bucket):
+            batch[row, :, : lengths[index]] = chunks[index]
+
+        if padded:
+            weights = torch.zeros(len(bucket), max_length)
+            for row, index in enumerate(bucket):
+                weights[row, : lengths[index]] = 1.0
+            outputs = _forward(embedding_inference, batch, weights)
+        else:
+            outputs = embedding_inference.infer(batch)
+
+        for row, index in enumerate(bucket):
+            results[index] = outputs[row]
+
+    return results
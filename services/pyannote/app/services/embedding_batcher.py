@@ -0,0 +1,171 @@
+"""
+Cross-request dynamic micro-batching for speaker embedding
+
+Concurrent requests each produce a handful of speaker-turn crops. Instead of
+running one forward pass sequence per request, callers submit their crops to
+the batcher, which collects crops from every caller for up to
+``max_wait_ms`` (or until ``max_batch_size`` crops are queued), embeds them
+together on a checked-out inference replica, and fans the embeddings back
+out to the awaiting coroutines. If a shared batch fails, its crops are
+retried one by one, so a single bad crop only fails its own caller.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import List, Optional, Set, Union
+
+import numpy as np
+import structlog
+import torch
+
+from app.metrics import metrics
+from app.services.embedding_batch import embed_chunks
+from app.services.inference_pool import InferencePool, InferenceReplica
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class _PendingCrop:
+    """One crop waiting to be embedded."""
+
+    chunk: torch.Tensor
+    future: "asyncio.Future[np.ndarray]"
+
+
+class EmbeddingBatcher:
+    """Collects embedding crops across requests and runs them in shared batches."""
+
+    def __init__(
+        self,
+        pool: InferencePool,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        bucket_ratio: float = 1.25,
+    ):
+        self.pool = pool
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait_ms = max_wait_ms
+        self.bucket_ratio = bucket_ratio
+        self._queue: Optional[asyncio.Queue[_PendingCrop]] = None
+        self._collector: Optional[asyncio.Task[None]] = None
+        self._batches: Set[asyncio.Task[None]] = set()
+
+    def _ensure_started(self):
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue()
+            self._collector = asyncio.create_task(self._collect_loop())
+
+    async def embed(
+        self, chunks: List[torch.Tensor], return_exceptions: bool = False
+    ) -> List[Union[np.ndarray, BaseException]]:
+        """
+        Embed (1, time) waveform chunks, sharing forward passes with other callers.
+
+        Args:
+            chunks: Waveform chunks
+            return_exceptions: Return the error of a crop that fails in its
+                               place instead of raising it
+        """
+        if not chunks:
+            return []
+
+        self._ensure_started()
+        assert self._queue is not None
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for chunk in chunks:
+            future: asyncio.Future[np.ndarray] = loop.create_future()
+            self._queue.put_nowait(_PendingCrop(chunk, future))
+            futures.append(future)
+
+        return list(await asyncio.gather(*futures, return_exceptions=return_exceptions))
+
+    async def _collect_loop(self):
+        """Form batches from the queue and dispatch them to the inference pool."""
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Crops keep arriving while every replica is busy; top the batch
+            # up with them once a replica is free.
+            replica = await self.pool.acquire()
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Dispatch without waiting so the next batch can be collected
+            # while this one runs.
+            task = asyncio.create_task(self._run_batch(replica, batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    def _embed_sync(self, replica: InferenceReplica, chunks: List[torch.Tensor]):
+        return embed_chunks(
+            replica.embedding_inference,
+            chunks,
+            max_batch_size=self.max_batch_size,
+            bucket_ratio=self.bucket_ratio,
+        )
+
+    async def _run_batch(self, replica: InferenceReplica, batch: List[_PendingCrop]):
+        pending = [item for item in batch if not item.future.done()]
+        if not pending:
+            self.pool.release(replica)
+            return
+
+        metrics.summary("embedding_batch_size").observe(len(pending))
+        metrics.counter("embedding_batched_crops").inc(len(pending))
+
+        try:
+            embeddings = await self.pool.run_acquired(
+                replica, self._embed_sync, [item.chunk for item in pending]
+            )
+        except Exception as e:
+            logger.warning("Embedding batch failed", batch_size=len(pending), error=str(e))
+            if len(pending) == 1:
+                if not pending[0].future.done():
+                    pending[0].future.set_exception(e)
+                return
+            # Crops of unrelated requests share the batch; retry each on its
+            # own so only the crops that actually fail are failed.
+            metrics.counter("embedding_batch_retries").inc()
+            await asyncio.gather(*(self._run_single(item) for item in pending))
+            return
+
+        for item, embedding in zip(pending, embeddings):
+            if not item.future.done():
+                item.future.set_result(embedding)
+
+    async def _run_single(self, item: _PendingCrop):
+        if item.future.done():
+            return
+        try:
+            (embedding,) = await self.pool.run(self._embed_sync, [item.chunk])
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+            return
+        if not item.future.done():
+            item.future.set_result(embedding)
+
+    async def close(self):
+        """Stop collecting and wait for dispatched batches."""
+        if self._collector is not None:
+            self._collector.cancel()
+            await asyncio.gather(self._collector, return_exceptions=True)
+            self._collector = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
@@ -0,0 +1,143 @@
+"""
+Inference replica pool
+
+Pyannote inference is blocking (PyTorch forward passes, audio decoding), so it
+must not run on the event loop. The pool owns a fixed set of model replicas and
+an executor with one thread per replica. Callers check out an idle replica, run
+a blocking function with it on the executor, and the replica is returned once
+the function has finished.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, TypeVar
+
+import structlog
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+
+@dataclass
+class InferenceReplica:
+    """One independent copy of the diarization pipeline and embedding model."""
+
+    index: int
+    pipeline: Any
+    embedding_inference: Any
+
+
+class InferencePool:
+    """
+    Pool of inference replicas with checkout/return semantics.
+
+    At most ``size`` blocking inferences run in parallel; further callers wait
+    (without blocking the event loop) until a replica is returned.
+    """
+
+    def __init__(self, replicas: List[InferenceReplica]):
+        if not replicas:
+            raise ValueError("InferencePool requires at least one replica")
+
+        self._replicas = list(replicas)
+        self._idle: asyncio.Queue[InferenceReplica] = asyncio.Queue()
+        for replica in self._replicas:
+            self._idle.put_nowait(replica)
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._waiting = 0
+
+    @property
+    def size(self) -> int:
+        """Total number of replicas."""
+        return len(self._replicas)
+
+    @property
+    def available(self) -> int:
+        """Number of idle replicas."""
+        return self._idle.qsize()
+
+    @property
+    def waiting(self) -> int:
+        """Number of callers waiting for a replica."""
+        return self._waiting
+
+    @property
+    def replicas(self) -> List[InferenceReplica]:
+        """All replicas owned by the pool."""
+        return list(self._replicas)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Created lazily so that a pool built before fork() gets its threads
+        # in the process that actually runs inference.
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.size,
+                thread_name_prefix="pyannote-inference",
+            )
+        return self._executor
+
+    async def acquire(self) -> InferenceReplica:
+        """Check out an idle replica, waiting if all replicas are busy."""
+        self._waiting += 1
+        try:
+            return await self._idle.get()
+        finally:
+            self._waiting -= 1
+
+    def release(self, replica: InferenceReplica) -> None:
+        """Return a replica to the pool."""
+        self._idle.put_nowait(replica)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run ``fn(replica, *args, **kwargs)`` on the executor with a checked-out replica.
+
+        If the caller is cancelled while the function is running, the replica is
+        only returned to the pool once the function has actually finished.
+        """
+        replica = await self.acquire()
+        return await self.run_acquired(replica, fn, *args, **kwargs)
+
+    async def run_acquired(
+        self, replica: InferenceReplica, fn: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """
+        Run ``fn(replica, *args, **kwargs)`` with a replica obtained from ``acquire``.
+
+        The replica is released once the function has finished.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(
+                self._get_executor(),
+                functools.partial(fn, replica, *args, **kwargs),
+            )
+        except BaseException:
+            self.release(replica)
+            raise
+
+        try:
+            result = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future.done():
+                self.release(replica)
+            else:
+                future.add_done_callback(lambda _: self.release(replica))
+            raise
+        except BaseException:
+            self.release(replica)
+            raise
+
+        self.release(replica)
+        return result
+
+    def shutdown(self) -> None:
+        """Shut down the executor, waiting for running inferences to finish."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        logger.info("Inference pool shut down", replicas=self.size)
@@ -0,0 +1,116 @@
+"""
+Reduced-precision CPU inference
+
+Opt-in precision modes for the segmentation and embedding models:
+
+- "int8": dynamic quantization. Weights of the LSTM and Linear layers are
+  stored as int8 and activations are quantized on the fly; convolutions
+  (SincNet, TDNN and ResNet blocks) stay fp32, so the gain is largest for the
+  LSTM-heavy segmentation model.
+- "bf16": the forward pass runs under CPU bfloat16 autocast, which pays off
+  on CPUs with native bf16 support (AVX512-BF16 / AMX). Outputs are returned
+  as float32.
+
+Both trade accuracy for speed; benchmarks/bench_precision.py measures the
+effect against fp32 before a mode is enabled.
+"""
+
+import functools
+import warnings
+from typing import Dict, Optional, Sequence
+
+import structlog
+import torch
+
+logger = structlog.get_logger()
+
+PRECISIONS = ("fp32", "int8", "bf16")
+
+# Layers replaced by dynamically quantized equivalents in "int8" mode
+QUANTIZED_LAYERS = {torch.nn.LSTM, torch.nn.GRU, torch.nn.Linear}
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Dynamically quantize a model's LSTM and Linear layers in place.
+
+    The model object itself is kept (pyannote's Inference wrappers hold a
+    reference to it), only its submodules are swapped.
+    """
+    from torch.ao.quantization import quantize_dynamic
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        warnings.simplefilter("ignore", UserWarning)
+        quantize_dynamic(model.eval(), QUANTIZED_LAYERS, dtype=torch.qint8, inplace=True)
+    return model
+
+
+def autocast_bf16(model: torch.nn.Module) -> torch.nn.Module:
+    """Run a model's forward under bfloat16 autocast, returning float32 outputs."""
+    forward = model.forward
+
+    # wraps() keeps the forward signature visible (embed_chunks checks it for "weights")
+    @functools.wraps(forward)
+    def bf16_forward(*args, **kwargs):
+        with torch.autocast("cpu", dtype=torch.bfloat16):
+            outputs = forward(*args, **kwargs)
+        return outputs.float()
+
+    model.forward = bf16_forward
+    return model
+
+
+def apply_precision(
+    precision: str,
+    models: Dict[str, Sequence[torch.nn.Module]],
+    device: Optional[str] = "cpu",
+) -> Dict[str, str]:
+    """
+    Switch models to a precision mode.
+
+    Args:
+        precision: "fp32", "int8" or "bf16"
+        models: Model copies by name (one copy per inference replica)
+        device: Device the models run on; reduced precision is CPU-only
+
+    Returns:
+        Precision each model actually runs in, e.g. {"segmentation": "int8"}
+
+    Raises:
+        ValueError: If the precision mode is unknown
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown inference precision: {precision}")
+    if precision != "fp32" and device != "cpu":
+        logger.warning("Reduced precision modes are CPU-only; using fp32", precision=precision)
+        precision = "fp32"
+
+    applied: Dict[str, str] = {}
+    for name, copies in models.items():
+        if not copies:
+            continue
+        applied[name] = "fp32"
+        if precision == "fp32":
+            continue
+
+        try:
+            for model in copies:
+                if precision == "int8":
+                    quantize_int8(model)
+                else:
+                    autocast_bf16(model)
+        except Exception as e:
+            # Conversion failures are deterministic, so they surface on the
+            # first copy
+            logger.warning(
+                "Precision mode failed, keeping fp32",
+                model=name,
+                precision=precision,
+                error=str(e),
+            )
+            continue
+        applied[name] = precision
+
+    logger.info("Inference precision applied", precision=precision, models=applied)
+    return applied
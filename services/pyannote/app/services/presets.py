@@ -0,0 +1,110 @@
+"""
+Diarization quality presets
+
+A request's ``quality`` picks how much work the pipeline does:
+
+- "fast": for the live path. Segmentation windows advance by half a window
+  (instead of a tenth), so segmentation and the pipeline's clustering
+  embeddings run on about 5x fewer windows; clustering is fixed to two
+  speakers (stylist and customer) and no per-speaker embeddings are
+  returned. A chunk where only one person speaks is still split in two.
+- "balanced": the pipeline's own defaults, and the default quality.
+- "accurate": for end-of-session reprocessing. Windows advance by 1/20 of a
+  window, doubling the segmentation and embedding work of "balanced" for
+  finer speaker-change boundaries; the number of speakers is left to
+  clustering.
+
+benchmarks/bench_quality_presets.py measures the latency of each preset and,
+with the real pipeline, its diarization error rate. Replaying the pipeline's
+inference work with synthetic models of similar size on one CPU thread,
+"fast" took 0.16x and "accurate" 1.93x the time of "balanced"; error rates
+have to be measured with the real models.
+"""
+
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Literal, Optional
+
+from app.config import get_settings
+
+Quality = Literal["fast", "balanced", "accurate"]
+
+
+@dataclass(frozen=True)
+class QualityPreset:
+    """Pipeline parameters of one quality level."""
+
+    name: str
+    # Segmentation window step, as a fraction of the window duration
+    segmentation_step: float
+    # Batch size of the pipeline's clustering embeddings
+    embedding_batch_size: int
+    # Fixed number of speakers for clustering (None = estimated)
+    num_speakers: Optional[int] = None
+    # Return no per-speaker embeddings (stable speaker labels still get them)
+    skip_embeddings: bool = False
+
+    def pipeline_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments for the pipeline call."""
+        if self.num_speakers is None:
+            return {}
+        return {"num_speakers": self.num_speakers}
+
+
+PRESETS: Dict[str, QualityPreset] = {
+    "fast": QualityPreset(
+        "fast",
+        segmentation_step=0.5,
+        embedding_batch_size=64,
+        num_speakers=2,
+        skip_embeddings=True,
+    ),
+    "balanced": QualityPreset("balanced", segmentation_step=0.1, embedding_batch_size=32),
+    "accurate": QualityPreset("accurate", segmentation_step=0.05, embedding_batch_size=32),
+}
+
+
+def get_preset(quality: Optional[str]) -> QualityPreset:
+    """
+    Preset for a quality level (None = the configured default).
+
+    Raises:
+        ValueError: If the quality level is unknown
+    """
+    if quality is None:
+        quality = get_settings().diarization_default_quality
+    try:
+        return PRESETS[quality]
+    except KeyError:
+        raise ValueError(f"Unknown quality: {quality}") from None
+
+
+def degrade_preset(preset: QualityPreset, quality: str) -> QualityPreset:
+    """
+    ``preset`` run with the segmentation step and batch size of ``quality``.
+
+    Load shedding only makes the pipeline do less work: the speaker count and
+    whether embeddings are returned stay as requested, so a degraded request
+    answers in the same shape as an undegraded one.
+    """
+    lower = get_preset(quality)
+    if lower.name == preset.name:
+        return preset
+    return replace(
+        preset,
+        segmentation_step=lower.segmentation_step,
+        embedding_batch_size=lower.embedding_batch_size,
+    )
+
+
+def configure_pipeline(pipeline: Any, preset: QualityPreset):
+    """
+    Set a pipeline's per-run parameters for a preset.
+
+    Only called on a replica's own pipeline while it runs exclusively on the
+    inference pool, so the change never affects a concurrent request.
+    """
+    segmentation = getattr(pipeline, "_segmentation", None)
+    if segmentation is not None and hasattr(segmentation, "duration"):
+        segmentation.step = preset.segmentation_step * segmentation.duration
+    if hasattr(pipeline, "embedding_batch_size"):
+        pipeline.embedding_batch_size = preset.embedding_batch_size
@@ -2,23 +2,96 @@
 Pyannote speaker diarization service
 """
 
+import asyncio
+import copy
 import os
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
 
 import structlog
 import torch
 import numpy as np
 
+from app.config import Settings, get_settings
+from app.metrics import metrics
+from app.services.audio import AudioInput, DecodedAudio
+from app.services.backends import apply_backend
+from app.services.degradation import DegradationController
+from app.services.embedding_batch import PipelineEmbedding, embed_chunks
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.inference_pool import InferencePool, InferenceReplica
+from app.services.presets import QualityPreset, configure_pipeline, degrade_preset, get_preset
+from app.services.precision import apply_precision
+from app.services.result_cache import ResultCache
+from app.services.segment_selection import embed_until_converged, rank_segments
+from app.services.session_store import SessionSpeakerStore
+from app.services.tenant_scheduler import FairScheduler, TenantPolicy
+from app.services.vad import TrimMap, VoiceActivityDetector
+
 logger = structlog.get_logger()
 
+# Pretrained models
+DIARIZATION_MODEL = "pyannote/speaker-diarization-3.1"
+EMBEDDING_MODEL = "pyannote/embedding"
+
+# Label for speakers that cannot be matched to a session speaker
+UNKNOWN_SPEAKER = "SPEAKER_UNKNOWN"
+
+T = TypeVar("T")
+
 
 class PyannoteService:
     """Service for speaker diarization using pyannote.audio."""
 
-    def __init__(self):
+    def __init__(self, settings: Optional[Settings] = None):
+        self.settings = settings or get_settings()
         self.pipeline = None
         self.embedding_model = None
+        self.embedding_inference = None
+        self.backends: Dict[str, str] = {}
+        self.precisions: Dict[str, str] = {}
+        self.pool: Optional[InferencePool] = None
+        self.embedding_batcher: Optional[EmbeddingBatcher] = None
+        self.session_store = SessionSpeakerStore(
+            max_sessions=self.settings.session_max_sessions,
+            ttl_seconds=self.settings.session_ttl_seconds,
+            match_threshold=self.settings.session_match_threshold,
+        )
+        self.result_cache: Optional[ResultCache] = None
+        if self.settings.result_cache_max_bytes > 0:
+            self.result_cache = ResultCache(
+                max_bytes=self.settings.result_cache_max_bytes,
+                disk_dir=self.settings.result_cache_dir,
+                disk_max_bytes=self.settings.result_cache_disk_max_bytes,
+            )
+        self.tenant_policy = TenantPolicy(
+            weights=self.settings.tenant_weights,
+            max_concurrency=self.settings.tenant_max_concurrency,
+            default_max_concurrency=self.settings.tenant_default_max_concurrency,
+        )
+        self.degradation: Optional[DegradationController] = None
+        if self.settings.degradation_enabled:
+            self.degradation = DegradationController(
+                queue_wait_slo_seconds=self.settings.degradation_queue_wait_slo_seconds,
+                latency_slo_seconds=self.settings.degradation_latency_slo_seconds,
+                recover_ratio=self.settings.degradation_recover_ratio,
+                min_dwell_seconds=self.settings.degradation_min_dwell_seconds,
+                max_level=self.settings.degradation_max_level,
+                half_life_seconds=self.settings.degradation_half_life_seconds,
+            )
+        self.scheduler = FairScheduler(
+            self.settings.request_slots or 2 * max(self.settings.inference_replicas, 1),
+            policy=self.tenant_policy,
+            request_cost_seconds=self.settings.request_cost_seconds,
+            on_wait=self.degradation.observe_wait if self.degradation else None,
+        )
+        self.vad: Optional[VoiceActivityDetector] = None
+        if self.settings.vad_enabled:
+            self.vad = VoiceActivityDetector(
+                energy_threshold_db=self.settings.vad_energy_threshold_db,
+                flux_threshold_db=self.settings.vad_flux_threshold_db,
+            )
         self.is_ready = False
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
 
@@ -36,89 +109,358 @@ class PyannoteService:
 
             # Load the speaker diarization pipeline
             self.pipeline = Pipeline.from_pretrained(
-                "pyannote/speaker-diarization-3.1",
+                DIARIZATION_MODEL,
                 use_auth_token=hf_token,
             )
 
-            # Load the speaker embedding model
-            logger.info("Loading speaker embedding model...")
-            embedding_model = Model.from_pretrained(
-                "pyannote/embedding",
-                use_auth_token=hf_token,
-            )
-            self.embedding_inference = Inference(
-                embedding_model,
-                window="whole",
-            )
+            if self.settings.embedding_source == "pipeline":
+                # Reuse the embedding model the pipeline already uses for clustering
+                self.embedding_inference = PipelineEmbedding(self.pipeline)
+            else:
+                # Load the speaker embedding model
+                logger.info("Loading speaker embedding model...")
+                embedding_model = Model.from_pretrained(
+                    EMBEDDING_MODEL,
+                    use_auth_token=hf_token,
+                )
+                self.embedding_inference = Inference(
+                    embedding_model,
+                    window="whole",
+                )
 
             # Move to GPU if available
             if self.device == "cuda":
                 self.pipeline.to(torch.device("cuda"))
                 self.embedding_inference.model.to(torch.device("cuda"))
 
+            replicas = self._build_replicas()
+            self.backends = self._apply_backend(replicas)
+            self.pool = InferencePool(replicas)
+            if self.settings.embedding_batch_window_ms > 0:
+                self.embedding_batcher = EmbeddingBatcher(
+                    self.pool,
+                    max_batch_size=self.settings.embedding_batch_size,
+                    max_wait_ms=self.settings.embedding_batch_window_ms,
+                    bucket_ratio=self.settings.embedding_bucket_ratio,
+                )
+
             self.is_ready = True
-            logger.info("Pyannote pipeline and embedding model loaded successfully")
+            logger.info(
+                "Pyannote pipeline and embedding model loaded successfully",
+                replicas=self.pool.size,
+            )
 
         except Exception as e:
             logger.error(f"Failed to initialize pyannote: {e}")
             raise
 
+    def _build_replicas(self) -> List[InferenceReplica]:
+        """Create the inference replicas from the loaded pipeline and embedding model."""
+        replicas = [InferenceReplica(0, self.pipeline, self.embedding_inference)]
+
+        # Additional replicas are deep copies so they never share mutable
+        # model state with a concurrently running inference.
+        for index in range(1, max(self.settings.inference_replicas, 1)):
+            pipeline = copy.deepcopy(self.pipeline)
+            if self.settings.embedding_source == "pipeline":
+                embedding_inference = PipelineEmbedding(pipeline)
+            else:
+                embedding_inference = copy.deepcopy(self.embedding_inference)
+            replicas.append(InferenceReplica(index, pipeline, embedding_inference))
+
+        return replicas
+
+    def _apply_backend(self, replicas: List[InferenceReplica]) -> Dict[str, str]:
+        """Run the replicas' models on the configured inference backend and precision."""
+        backend = self.settings.inference_backend
+        if backend != "torch" and self.device == "cuda":
+            logger.warning("Exported inference backends run on CPU; using torch", backend=backend)
+            backend = "torch"
+
+        models = {
+            "segmentation": [r.pipeline._segmentation.model for r in replicas],
+            "embedding": [r.embedding_inference.model for r in replicas],
+        }
+        if self.settings.embedding_source == "model":
+            # The pipeline clusters with its own embedding model
+            models["clustering_embedding"] = [r.pipeline._embedding.model_ for r in replicas]
+
+        precision = self.settings.inference_precision
+        if precision != "fp32":
+            if backend == "torch":
+                self.precisions = apply_precision(precision, models, self.device)
+            else:
+                logger.warning(
+                    "Precision modes apply to the torch backend only; using fp32",
+                    backend=backend,
+                    precision=precision,
+                )
+
+        return apply_backend(backend, models, self.settings.inference_export_dir)
+
+    @property
+    def model_id(self) -> str:
+        """Identifier of the models that produce results, for cache keys."""
+        if self.settings.embedding_source == "pipeline":
+            model_id = DIARIZATION_MODEL
+        else:
+            model_id = f"{DIARIZATION_MODEL}+{EMBEDDING_MODEL}"
+        # What each model actually runs on: exports and precision modes fall
+        # back per model
+        variants = [
+            f"{name}={backend}" for name, backend in sorted(self.backends.items())
+            if backend != "torch"
+        ] + [
+            f"{name}={precision}" for name, precision in sorted(self.precisions.items())
+            if precision != "fp32"
+        ]
+        if variants:
+            model_id += "@" + ",".join(variants)
+        if self.vad is not None:
+            model_id += "+vad"
+        return model_id
+
     async def cleanup(self):
         """Cleanup resources."""
+        if self.embedding_batcher is not None:
+            await self.embedding_batcher.close()
+            self.embedding_batcher = None
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
         self.pipeline = None
         self.embedding_inference = None
         self.is_ready = False
         if self.device == "cuda":
             torch.cuda.empty_cache()
 
+    def _resolve_preset(
+        self, quality: Optional[str], priority: Optional[str], num_speakers: Optional[int] = None
+    ) -> Tuple[QualityPreset, int]:
+        """Preset to run a request with, lowered by the degradation level in force."""
+        preset = get_preset(quality)
+        if num_speakers is not None:
+            preset = replace(preset, num_speakers=num_speakers)
+        if self.degradation is None:
+            return preset, 0
+        lower, level = self.degradation.resolve(preset.name, priority)
+        return degrade_preset(preset, lower), level
+
+    async def _infer(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run a pipeline call on the pool, reporting its latency to the degradation controller."""
+        start = time.monotonic()
+        try:
+            return await self.pool.run(fn, *args)
+        finally:
+            if self.degradation is not None:
+                self.degradation.observe_inference(time.monotonic() - start)
+
+    def _speech_audio(
+        self, decoded: DecodedAudio
+    ) -> Tuple[Optional[DecodedAudio], Optional[TrimMap]]:
+        """
+        Run the voice activity pre-filter (blocking).
+
+        Returns:
+            (None, None) for a chunk with too little speech to diarize, else
+            the audio to run the pipeline on and, if non-speech was cut out of
+            it, the map back to the original timeline
+        """
+        if self.vad is None:
+            return decoded, None
+
+        result = self.vad.detect(decoded.waveform)
+        metrics.summary("vad_speech_ratio").observe(result.speech_ratio)
+
+        if result.speech_ratio < self.settings.vad_min_speech_ratio:
+            metrics.counter("vad_skipped_chunks").inc()
+            metrics.counter("vad_seconds_saved").inc(decoded.duration)
+            logger.info(
+                "Chunk skipped by voice activity filter",
+                duration_seconds=decoded.duration,
+                speech_ratio=round(result.speech_ratio, 3),
+            )
+            return None, None
+
+        waveform, trim_map = self.vad.trim(
+            decoded.waveform, result, self.settings.vad_min_trim_seconds
+        )
+        if len(trim_map.spans) == 1 and waveform.shape[1] == decoded.num_samples:
+            return decoded, None
+
+        trimmed = DecodedAudio(waveform)
+        metrics.counter("vad_trimmed_chunks").inc()
+        metrics.counter("vad_seconds_saved").inc(decoded.duration - trimmed.duration)
+        return trimmed, trim_map
+
+    def _run_pipeline(
+        self, replica: InferenceReplica, decoded: DecodedAudio, preset: QualityPreset
+    ) -> List[Dict[str, Any]]:
+        """Run the diarization pipeline on decoded audio (blocking, on the inference pool)."""
+        configure_pipeline(replica.pipeline, preset)
+        diarization = replica.pipeline(decoded.as_pipeline_input(), **preset.pipeline_kwargs())
+        return self._to_segments(diarization)
+
+    def _run_pipeline_with_centroids(
+        self, replica: InferenceReplica, decoded: DecodedAudio, preset: QualityPreset
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, np.ndarray]]:
+        """
+        Run the diarization pipeline and keep its per-speaker centroid embeddings.
+
+        Speakers whose centroid is all zeros (the pipeline pads centroids for
+        speakers it could not cluster) get no embedding.
+        """
+        configure_pipeline(replica.pipeline, preset)
+        diarization, centroids = replica.pipeline(
+            decoded.as_pipeline_input(), return_embeddings=True, **preset.pipeline_kwargs()
+        )
+
+        speaker_centroids: Dict[str, np.ndarray] = {}
+        if centroids is not None:
+            for speaker, centroid in zip(diarization.labels(), centroids):
+                if np.any(centroid):
+                    speaker_centroids[speaker] = centroid
+
+        return self._to_segments(diarization), speaker_centroids
+
+    @staticmethod
+    def _to_segments(diarization: Any) -> List[Dict[str, Any]]:
+        """Convert a pyannote annotation to segment dicts."""
+        return [
+            {
+                "speaker": speaker,
+                "start": turn.start,
+                "end": turn.end,
+            }
+            for turn, _, speaker in diarization.itertracks(yield_label=True)
+        ]
+
+    def _embed_chunks_sync(
+        self, replica: InferenceReplica, chunks: List[torch.Tensor]
+    ) -> List[np.ndarray]:
+        """Embed waveform chunks in batched forward passes (blocking, on the inference pool)."""
+        return embed_chunks(
+            replica.embedding_inference,
+            chunks,
+            max_batch_size=self.settings.embedding_batch_size,
+            bucket_ratio=self.settings.embedding_bucket_ratio,
+        )
+
+    async def _embed_chunks(self, chunks: List[torch.Tensor]) -> List[np.ndarray]:
+        """Embed waveform chunks, batched with concurrent requests when the batcher is enabled."""
+        if not chunks:
+            return []
+        if self.embedding_batcher is not None:
+            return await self.embedding_batcher.embed(chunks)
+        return await self.pool.run(self._embed_chunks_sync, chunks)
+
+    async def _embed_segments(self, chunks: List[torch.Tensor]) -> List[Optional[np.ndarray]]:
+        """Embed speaker-turn chunks (None in place of a chunk that fails to embed)."""
+        if not chunks:
+            return []
+        if self.embedding_batcher is not None:
+            results = await self.embedding_batcher.embed(chunks, return_exceptions=True)
+        else:
+            try:
+                return list(await self._embed_chunks(chunks))
+            except Exception:
+                # Retry each chunk on its own so one bad chunk only loses itself
+                results = await asyncio.gather(
+                    *(self.pool.run(self._embed_chunks_sync, [chunk]) for chunk in chunks),
+                    return_exceptions=True,
+                )
+                results = [r if isinstance(r, BaseException) else r[0] for r in results]
+
+        failed = [r for r in results if isinstance(r, BaseException)]
+        if failed:
+            logger.warning(
+                "Segment embedding failed",
+                num_chunks=len(chunks),
+                num_failed=len(failed),
+                error=str(failed[0]),
+            )
+        return [None if isinstance(r, BaseException) else r for r in results]
+
+    async def _embed_speaker_turns(
+        self, decoded: DecodedAudio, segments: List[Dict[str, Any]], speaker: str
+    ) -> Tuple[List[np.ndarray], Dict[str, Any]]:
+        """
+        Embed a speaker's turns, longest first, stopping once their centroid converges.
+
+        Returns:
+            The embeddings, and the turns used and the estimated embedding time
+            saved by not embedding the rest (pro rata to audio duration)
+        """
+        turns = rank_segments(segments, speaker, min_duration=0.5)
+        start = time.monotonic()
+        selection = await embed_until_converged(
+            [decoded.crop(turn["start"], turn["end"]) for turn in turns],
+            self._embed_segments,
+            min_segments=self.settings.embedding_min_segments,
+            max_segments=self.settings.embedding_max_segments,
+            step=self.settings.embedding_selection_step,
+            tolerance=self.settings.embedding_convergence_tolerance,
+        )
+        elapsed = time.monotonic() - start
+
+        durations = [turn["end"] - turn["start"] for turn in turns]
+        embedded_seconds = sum(durations[: selection.used])
+        skipped_seconds = sum(durations[selection.used :])
+        time_saved = elapsed * skipped_seconds / embedded_seconds if embedded_seconds else 0.0
+
+        metrics.summary("embedding_segments_used").observe(selection.used)
+        metrics.counter("embedding_segments_skipped").inc(selection.total - selection.used)
+        metrics.counter("embedding_selection_stops", reason=selection.stopped).inc()
+        metrics.summary("embedding_time_saved_seconds").observe(time_saved)
+
+        return selection.embeddings, {
+            "segments_used": selection.used,
+            "segments_total": selection.total,
+            "time_saved_ms": int(time_saved * 1000),
+        }
+
     async def extract_embedding(
         self,
-        audio_path: str,
+        audio: AudioInput,
         speaker_label: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
-        Extract speaker embedding from an audio file.
+        Extract speaker embedding from audio.
 
         Args:
-            audio_path: Path to the audio file
+            audio: Audio file path or in-memory waveform mapping
             speaker_label: Optional speaker label to extract embedding for
                            If provided, will first diarize and extract only that speaker's audio
 
         Returns:
-            Dict containing embedding, duration, confidence, and processing time
+            Dict containing embedding, duration, confidence, processing time and,
+            when a speaker's turns were embedded, the turns used and the
+            estimated embedding time saved by stopping early
         """
-        if not self.is_ready or self.embedding_inference is None:
+        if not self.is_ready or self.embedding_inference is None or self.pool is None:
             raise RuntimeError("Pyannote embedding model not initialized")
 
         start_time = time.time()
+        selection_stats: Dict[str, Any] = {}
 
         try:
-            from pyannote.audio import Audio
-            from pyannote.core import Segment
-
-            audio = Audio()
-
-            # Get audio duration
-            waveform, sample_rate = audio(audio_path)
-            duration_seconds = waveform.shape[1] / sample_rate
+            # Decode once; every stage below slices this waveform
+            decoded = await asyncio.to_thread(DecodedAudio.load, audio)
+            duration_seconds = decoded.duration
 
             # If speaker_label is specified, we need to diarize first and extract that speaker
             if speaker_label and self.pipeline is not None:
-                diarization = self.pipeline(audio_path)
+                speaker_segments = await self.pool.run(
+                    self._run_pipeline, decoded, get_preset(None)
+                )
 
                 # Find segments for the specified speaker or estimate which is customer
-                speaker_segments = []
                 speaker_durations: Dict[str, float] = {}
 
-                for turn, _, speaker in diarization.itertracks(yield_label=True):
-                    speaker_durations[speaker] = (
-                        speaker_durations.get(speaker, 0) + (turn.end - turn.start)
+                for seg in speaker_segments:
+                    speaker_durations[seg["speaker"]] = (
+                        speaker_durations.get(seg["speaker"], 0) + (seg["end"] - seg["start"])
                     )
-                    speaker_segments.append({
-                        "speaker": speaker,
-                        "start": turn.start,
-                        "end": turn.end,
-                    })
 
                 # Identify which speaker is the customer (less talking time)
                 if speaker_label == "customer" and len(speaker_durations) >= 2:
@@ -136,19 +478,10 @@ class PyannoteService:
                     target_speaker = list(speaker_durations.keys())[0] if speaker_durations else None
 
                 if target_speaker:
-                    # Extract embeddings for each segment and average them
-                    embeddings = []
-                    for seg in speaker_segments:
-                        if seg["speaker"] == target_speaker:
-                            segment = Segment(seg["start"], seg["end"])
-                            if seg["end"] - seg["start"] >= 0.5:  # Minimum 0.5s segment
-                                try:
-                                    emb = self.embedding_inference.crop(
-                                        audio_path, segment
-                                    )
-                                    embeddings.append(emb)
-                                except Exception:
-                                    continue
+                    # Embed the speaker's longest turns until their centroid converges
+                    embeddings, selection_stats = await self._embed_speaker_turns(
+                        decoded, speaker_segments, target_speaker
+                    )
 
                     if embeddings:
                         # Average all embeddings
@@ -159,15 +492,15 @@ class PyannoteService:
                         confidence = min(len(embeddings) / 5.0, 1.0)
                     else:
                         # Fall back to whole audio
-                        embedding_array = self.embedding_inference(audio_path)
+                        embedding_array = (await self._embed_chunks([decoded.waveform]))[0]
                         confidence = 0.5
                 else:
                     # Fall back to whole audio
-                    embedding_array = self.embedding_inference(audio_path)
+                    embedding_array = (await self._embed_chunks([decoded.waveform]))[0]
                     confidence = 0.5
             else:
                 # Extract embedding from whole audio
-                embedding_array = self.embedding_inference(audio_path)
+                embedding_array = (await self._embed_chunks([decoded.waveform]))[0]
                 confidence = 0.8 if duration_seconds >= 5 else 0.5
 
             # Convert to list
@@ -181,6 +514,7 @@ class PyannoteService:
                 duration_seconds=duration_seconds,
                 confidence=confidence,
                 processing_time_ms=processing_time_ms,
+                **selection_stats,
             )
 
             return {
@@ -188,51 +522,64 @@ class PyannoteService:
                 "duration_seconds": duration_seconds,
                 "confidence": confidence,
                 "processing_time_ms": processing_time_ms,
+                **selection_stats,
             }
 
         except Exception as e:
             logger.error(f"Embedding extraction failed: {e}")
             raise
 
-    async def diarize(self, audio_path: str) -> Dict[str, Any]:
+    async def diarize(
+        self,
+        audio: AudioInput,
+        quality: Optional[str] = None,
+        priority: Optional[str] = "realtime",
+        num_speakers: Optional[int] = None,
+    ) -> Dict[str, Any]:
         """
-        Perform speaker diarization on an audio file.
+        Perform speaker diarization on audio.
 
         Args:
-            audio_path: Path to the audio file
+            audio: Audio file path or in-memory waveform mapping
+            quality: Quality preset ("fast", "balanced", "accurate"; None = default)
+            priority: Priority class; realtime requests are degraded under load
+            num_speakers: Fixed number of speakers, overriding the preset's
 
         Returns:
-            Dict containing segments and processing time
+            Dict containing segments, processing time, the quality used and
+            the degradation level in force
         """
-        if not self.is_ready or self.pipeline is None:
+        if not self.is_ready or self.pipeline is None or self.pool is None:
             raise RuntimeError("Pyannote pipeline not initialized")
 
+        preset, level = self._resolve_preset(quality, priority, num_speakers)
         start_time = time.time()
 
         try:
-            # Run diarization
-            diarization = self.pipeline(audio_path)
-
-            # Convert to segments
-            segments: List[Dict[str, Any]] = []
-            for turn, _, speaker in diarization.itertracks(yield_label=True):
-                segments.append({
-                    "speaker": speaker,
-                    "start": turn.start,
-                    "end": turn.end,
-                })
+            # Run diarization on the speech parts only
+            decoded = await asyncio.to_thread(DecodedAudio.load, audio)
+            speech, trim_map = await asyncio.to_thread(self._speech_audio, decoded)
+            segments = []
+            if speech is not None:
+                segments = await self._infer(self._run_pipeline, speech, preset)
+            if trim_map is not None:
+                segments = trim_map.remap_segments(segments)
 
             processing_time_ms = int((time.time() - start_time) * 1000)
 
             logger.info(
                 "Diarization completed",
                 num_segments=len(segments),
+                quality=preset.name,
+                degradation_level=level,
                 processing_time_ms=processing_time_ms,
             )
 
             return {
                 "segments": segments,
                 "processing_time_ms": processing_time_ms,
+                "quality": preset.name,
+                "degradation_level": level,
             }
 
         except Exception as e:
@@ -266,65 +613,114 @@ class PyannoteService:
             sorted_speakers[1][0]: "customer",
         }
 
-    async def diarize_with_embeddings(self, audio_path: str) -> Dict[str, Any]:
+    async def _speaker_means(
+        self,
+        decoded: DecodedAudio,
+        speaker_segments: Dict[str, List[Tuple[float, float]]],
+    ) -> Dict[str, np.ndarray]:
+        """Embed every eligible turn and average the embeddings per speaker."""
+        # Embed every eligible turn of every speaker in batched forward passes
+        owners: List[str] = []
+        chunks: List[torch.Tensor] = []
+        for speaker, segs in speaker_segments.items():
+            for start, end in segs:
+                if end - start >= 0.5:  # Minimum 0.5s segment
+                    owners.append(speaker)
+                    chunks.append(decoded.crop(start, end))
+
+        chunk_embeddings = await self._embed_segments(chunks)
+
+        means: Dict[str, np.ndarray] = {}
+        for speaker in speaker_segments:
+            embeddings = [
+                emb
+                for owner, emb in zip(owners, chunk_embeddings)
+                if owner == speaker and emb is not None
+            ]
+            if embeddings:
+                # Average all embeddings for this speaker
+                means[speaker] = np.mean(np.stack(embeddings), axis=0)
+
+        return means
+
+    async def diarize_with_embeddings(
+        self,
+        audio: AudioInput,
+        session_id: Optional[str] = None,
+        quality: Optional[str] = None,
+        priority: Optional[str] = "realtime",
+        seen_seconds: float = 0.0,
+        num_speakers: Optional[int] = None,
+    ) -> Dict[str, Any]:
         """
         Perform speaker diarization and extract embeddings for each speaker.
 
         Args:
-            audio_path: Path to the audio file
+            audio: Audio file path or in-memory waveform mapping
+            session_id: If provided, speaker labels are made stable across the
+                        session's chunks by matching against its running centroids
+            quality: Quality preset ("fast", "balanced", "accurate"; None = default)
+            priority: Priority class; realtime requests are degraded under load
+            seen_seconds: Leading seconds of the audio that an earlier call for
+                          the session already covered (overlapping streaming
+                          windows); they do not update its speakers again
+            num_speakers: Fixed number of speakers, overriding the preset's
 
         Returns:
-            Dict containing segments, speaker_embeddings, and processing time
+            Dict containing segments, speaker_embeddings, processing time, the
+            quality used and the degradation level in force
         """
-        if not self.is_ready or self.pipeline is None or self.embedding_inference is None:
+        if (
+            not self.is_ready
+            or self.pipeline is None
+            or self.embedding_inference is None
+            or self.pool is None
+        ):
             raise RuntimeError("Pyannote pipeline not initialized")
 
+        preset, level = self._resolve_preset(quality, priority, num_speakers)
         start_time = time.time()
 
         try:
-            from pyannote.core import Segment
-
-            # Run diarization
-            diarization = self.pipeline(audio_path)
+            # Decode once; segmentation and every segment crop share this waveform
+            decoded = await asyncio.to_thread(DecodedAudio.load, audio)
+            speech, trim_map = await asyncio.to_thread(self._speech_audio, decoded)
+
+            if speech is None:
+                segments, speaker_vectors = [], {}
+            elif self.settings.embedding_source == "pipeline":
+                # Use the pipeline's own clustering centroids; no turn is re-embedded
+                segments, speaker_vectors = await self._infer(
+                    self._run_pipeline_with_centroids, speech, preset
+                )
+            else:
+                segments = await self._infer(self._run_pipeline, speech, preset)
+                speaker_vectors = None
+            if trim_map is not None:
+                segments = trim_map.remap_segments(segments)
 
-            # Convert to segments and track speaker durations
-            segments: List[Dict[str, Any]] = []
+            # Track speaker segments and durations
             speaker_segments: Dict[str, List[Tuple[float, float]]] = {}
             speaker_durations: Dict[str, float] = {}
 
-            for turn, _, speaker in diarization.itertracks(yield_label=True):
-                segments.append({
-                    "speaker": speaker,
-                    "start": turn.start,
-                    "end": turn.end,
-                })
-
+            for seg in segments:
+                speaker = seg["speaker"]
                 if speaker not in speaker_segments:
                     speaker_segments[speaker] = []
-                speaker_segments[speaker].append((turn.start, turn.end))
+                speaker_segments[speaker].append((seg["start"], seg["end"]))
 
-                duration = turn.end - turn.start
+                duration = seg["end"] - seg["start"]
                 speaker_durations[speaker] = speaker_durations.get(speaker, 0) + duration
 
+            if speaker_vectors is None:
+                speaker_vectors = await self._speaker_means(decoded, speaker_segments)
+
             # Extract embedding for each speaker
             speaker_embeddings = []
 
-            for speaker, segs in speaker_segments.items():
-                embeddings = []
-
-                for start, end in segs:
-                    if end - start >= 0.5:  # Minimum 0.5s segment
-                        try:
-                            segment = Segment(start, end)
-                            emb = self.embedding_inference.crop(audio_path, segment)
-                            embeddings.append(emb)
-                        except Exception:
-                            continue
-
-                if embeddings:
-                    # Average all embeddings for this speaker
-                    embedding_array = np.mean(np.stack(embeddings), axis=0)
-                    embedding = embedding_array.flatten().tolist()
+            for speaker in speaker_segments:
+                if speaker in speaker_vectors:
+                    embedding = speaker_vectors[speaker].flatten().tolist()
 
                     speaker_embeddings.append({
                         "label": speaker,
@@ -332,12 +728,29 @@ class PyannoteService:
                         "duration_ms": int(speaker_durations[speaker] * 1000),
                     })
 
+            if session_id is not None:
+                # Only speech not seen in an earlier call updates the centroids
+                new_durations: Dict[str, float] = {}
+                for seg in segments:
+                    new = max(seg["end"] - max(seg["start"], seen_seconds), 0.0)
+                    new_durations[seg["speaker"]] = new_durations.get(seg["speaker"], 0.0) + new
+                self._apply_session_labels(
+                    session_id,
+                    segments,
+                    speaker_embeddings,
+                    speaker_vectors,
+                    speaker_durations,
+                    new_durations,
+                )
+
             processing_time_ms = int((time.time() - start_time) * 1000)
 
             logger.info(
                 "Diarization with embeddings completed",
                 num_segments=len(segments),
                 num_speakers=len(speaker_embeddings),
+                quality=preset.name,
+                degradation_level=level,
                 processing_time_ms=processing_time_ms,
             )
 
@@ -345,8 +758,36 @@ class PyannoteService:
                 "segments": segments,
                 "speaker_embeddings": speaker_embeddings,
                 "processing_time_ms": processing_time_ms,
+                "quality": preset.name,
+                "degradation_level": level,
             }
 
         except Exception as e:
             logger.error(f"Diarization with embeddings failed: {e}")
             raise
+
+    def _apply_session_labels(
+        self,
+        session_id: str,
+        segments: List[Dict[str, Any]],
+        speaker_embeddings: List[Dict[str, Any]],
+        speaker_vectors: Dict[str, np.ndarray],
+        speaker_durations: Dict[str, float],
+        new_durations: Optional[Dict[str, float]] = None,
+    ):
+        """Rename chunk speakers in place to the session's stable labels."""
+        mapping = self.session_store.assign(
+            session_id, speaker_vectors, speaker_durations, weights=new_durations
+        )
+
+        # Speakers without an embedding (only turns < 0.5 s) cannot be matched
+        for seg in segments:
+            seg["speaker"] = mapping.get(seg["speaker"], UNKNOWN_SPEAKER)
+        for emb in speaker_embeddings:
+            emb["label"] = mapping[emb["label"]]
+
+    def close_session(self, session_id: str) -> bool:
+        """Forget a session's speaker state. Returns whether the session was known."""
+        closed = self.session_store.close(session_id)
+        logger.info("Diarization session closed", session_id=session_id, known=closed)
+        return closed
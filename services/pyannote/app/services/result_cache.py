@@ -0,0 +1,252 @@
+"""
+Content-addressed diarization result cache
+
+Chunks are sometimes sent twice (``process-audio`` retries, mobile upload
+retries). Results are cached under a hash of the uploaded bytes plus every
+parameter that changes the result, in an in-memory LRU bounded by size and,
+optionally, an on-disk tier that survives restarts. Identical requests that
+arrive while the first one is still running wait for its result instead of
+running their own inference (singleflight).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import structlog
+
+from app.metrics import metrics
+
+logger = structlog.get_logger()
+
+
+class _LeaderCancelled(Exception):
+    """The caller computing a result was cancelled before it finished."""
+
+
+class _NotShared(Exception):
+    """The computed result may not be handed to other callers (e.g. it was degraded)."""
+
+
+def make_cache_key(content_hash: str, **params: Any) -> str:
+    """Cache key for audio content and the parameters it was processed with."""
+    encoded = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(f"{content_hash}:{encoded}".encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier LRU cache of JSON-serializable results with request coalescing.
+
+    Entries are stored serialized, so their size is known exactly and every
+    hit returns a fresh copy that callers are free to modify.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._inflight: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        # Disk tier index: file sizes by key, least recently used first
+        self._disk_entries: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+        self._disk_lock = threading.Lock()
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    @property
+    def size_bytes(self) -> int:
+        """Size of the in-memory tier."""
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        cacheable: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Return the cached result for ``key``, computing it at most once.
+
+        Concurrent callers with the same key share one ``compute()`` call; if
+        it fails, all of them receive the error and nothing is cached. If the
+        caller running ``compute()`` is cancelled, one of the waiting callers
+        runs it instead. A computed result for which ``cacheable`` returns
+        False is neither stored nor shared: the key does not describe it (e.g.
+        it was computed with degraded settings), so waiting callers run their
+        own ``compute()``.
+        """
+        while True:
+            result = await self.get(key)
+            if result is not None:
+                return result
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            metrics.counter("result_cache_coalesced").inc()
+            try:
+                return json.loads(json.dumps(await asyncio.shield(inflight)))
+            except (_LeaderCancelled, _NotShared):
+                # Take over the computation (or join whoever did first)
+                continue
+
+        metrics.counter("result_cache_misses").inc()
+        future: asyncio.Future[Dict[str, Any]] = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            try:
+                result = await compute()
+            except asyncio.CancelledError:
+                future.set_exception(_LeaderCancelled())
+                future.exception()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                # Waiters re-raise it; don't warn about an unretrieved exception
+                future.exception()
+                raise
+
+            if cacheable is not None and not cacheable(result):
+                future.set_exception(_NotShared())
+                future.exception()
+                return result
+
+            # Waiters get the result now, whatever happens to the cache write
+            future.set_result(result)
+            await self.put(key, result)
+        finally:
+            del self._inflight[key]
+
+        return result
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a result in memory, then on disk."""
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            metrics.counter("result_cache_hits", tier="memory").inc()
+            return json.loads(data)
+
+        if self.disk_dir:
+            data = await asyncio.to_thread(self._read_disk, key)
+            if data is not None:
+                metrics.counter("result_cache_hits", tier="disk").inc()
+                self._store_memory(key, data)
+                return json.loads(data)
+
+        return None
+
+    async def put(self, key: str, result: Dict[str, Any]):
+        """Store a result in both tiers (best effort: failures are logged, not raised)."""
+        try:
+            data = json.dumps(result).encode()
+            self._store_memory(key, data)
+        except Exception as e:
+            logger.warning("Result cache write failed", tier="memory", error=str(e))
+            return
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, key, data)
+            except Exception as e:
+                metrics.counter("result_cache_write_errors", tier="disk").inc()
+                logger.warning("Result cache write failed", tier="disk", error=str(e))
+
+    def _store_memory(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._entries[key] = data
+        self._size += len(data)
+
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            metrics.counter("result_cache_evictions", tier="memory").inc()
+
+    def _path(self, key: str) -> str:
+        assert self.disk_dir is not None
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # The modification time doubles as the LRU timestamp
+            os.utime(path)
+        except FileNotFoundError:
+            with self._disk_lock:
+                self._disk_size -= self._disk_entries.pop(key, 0)
+            return None
+        with self._disk_lock:
+            if key not in self._disk_entries:
+                self._disk_size += len(data)
+            self._disk_entries[key] = len(data)
+            self._disk_entries.move_to_end(key)
+        return data
+
+    def _write_disk(self, key: str, data: bytes):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._disk_lock:
+            self._disk_size += len(data) - self._disk_entries.pop(key, 0)
+            self._disk_entries[key] = len(data)
+            if self._disk_size > self.disk_max_bytes:
+                self._evict_disk()
+
+    def _scan_disk(self):
+        """Rebuild the disk tier index from the directory, ordered by modification time."""
+        assert self.disk_dir is not None
+        entries = []
+        with os.scandir(self.disk_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, entry.name[: -len(".json")], stat.st_size))
+        entries.sort()
+        self._disk_entries = OrderedDict((key, size) for _, key, size in entries)
+        self._disk_size = sum(size for _, _, size in entries)
+
+    def _evict_disk(self):
+        """
+        Remove least recently used files until the disk tier fits its budget.
+
+        Only runs once the index exceeds the budget. The directory is rescanned
+        first, to account for files written by other processes sharing it.
+        """
+        self._scan_disk()
+        while self._disk_size > self.disk_max_bytes and self._disk_entries:
+            key, size = self._disk_entries.popitem(last=False)
+            self._disk_size -= size
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                continue
+            metrics.counter("result_cache_evictions", tier="disk").inc()
@@ -0,0 +1,105 @@
+"""
+Early-stopping segment selection for voice print extraction
+
+A speaker's voice print is the mean of the embeddings of their turns, and
+its confidence stops growing after five turns. Rather than embedding every
+turn, the longest turns are embedded first (they carry the most reliable
+embeddings) and embedding stops once the running centroid has converged,
+i.e. its cosine change from one step to the next falls below a tolerance,
+or once a segment budget is reached.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+
+
+@dataclass
+class Selection:
+    """Embeddings of the turns that were embedded before stopping."""
+
+    embeddings: List[np.ndarray]
+    # Turns available and turns embedded (including any that failed)
+    total: int
+    used: int
+    # "converged", "budget", "exhausted" (every turn embedded) or "failed"
+    # (no turn could be embedded)
+    stopped: str
+
+
+def rank_segments(
+    segments: Sequence[Dict[str, Any]], speaker: str, min_duration: float = 0.5
+) -> List[Dict[str, Any]]:
+    """A speaker's turns of at least ``min_duration`` seconds, longest first."""
+    turns = [
+        seg
+        for seg in segments
+        if seg["speaker"] == speaker and seg["end"] - seg["start"] >= min_duration
+    ]
+    return sorted(turns, key=lambda seg: seg["end"] - seg["start"], reverse=True)
+
+
+def cosine_change(before: np.ndarray, after: np.ndarray) -> float:
+    """1 - cosine similarity of two centroids."""
+    before = before.ravel()
+    after = after.ravel()
+    norm = np.linalg.norm(before) * np.linalg.norm(after)
+    if norm == 0:
+        return 1.0
+    return float(1.0 - np.dot(before, after) / norm)
+
+
+async def embed_until_converged(
+    chunks: Sequence[torch.Tensor],
+    embed: Callable[[List[torch.Tensor]], Awaitable[List[Optional[np.ndarray]]]],
+    min_segments: int = 5,
+    max_segments: int = 10,
+    step: int = 2,
+    tolerance: float = 0.005,
+) -> Selection:
+    """
+    Embed ranked chunks until their running centroid converges.
+
+    The first ``min_segments`` chunks are embedded in one batch, then
+    ``step`` chunks at a time until adding a step moves the centroid by less
+    than ``tolerance`` (cosine change), ``max_segments`` chunks are embedded
+    or none are left. Chunks that fail to embed are skipped.
+
+    Args:
+        chunks: Waveform chunks, most reliable first
+        embed: Embeds a batch of chunks (None in place of a chunk that fails)
+        min_segments: Chunks always embedded before convergence is checked
+        max_segments: Segment budget (0 = no budget)
+        step: Chunks embedded between convergence checks
+        tolerance: Cosine change of the centroid below which it has converged
+
+    Returns:
+        Selection with the embeddings computed
+    """
+    limit = len(chunks) if max_segments <= 0 else min(len(chunks), max_segments)
+    taken = min(max(min_segments, 1), limit)
+    embeddings = [e for e in await embed(list(chunks[:taken])) if e is not None]
+    stopped = "exhausted"
+
+    while taken < limit:
+        end = min(taken + max(step, 1), limit)
+        batch = [e for e in await embed(list(chunks[taken:end])) if e is not None]
+        taken = end
+        if not embeddings or not batch:
+            embeddings.extend(batch)
+            continue
+        centroid = np.mean(np.stack(embeddings), axis=0)
+        embeddings.extend(batch)
+        if cosine_change(centroid, np.mean(np.stack(embeddings), axis=0)) < tolerance:
+            stopped = "converged"
+            break
+    else:
+        if limit < len(chunks):
+            stopped = "budget"
+
+    if chunks and not embeddings:
+        stopped = "failed"
+
+    return Selection(embeddings=embeddings, total=len(chunks), used=taken, stopped=stopped)
@@ -0,0 +1,187 @@
+"""
+Cross-chunk session speaker state
+
+Each ``/diarize`` call sees a single chunk, so the pipeline's SPEAKER_00 in
+one chunk may be SPEAKER_01 in the next. The store keeps, per session, a
+running centroid of every speaker seen so far and maps each new chunk's
+speakers onto those centroids by cosine similarity, so labels stay stable
+for the whole session. Idle sessions are evicted by TTL and LRU; a session
+can also be closed explicitly when it ends.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+@dataclass
+class SessionSpeaker:
+    """Running centroid of one speaker within a session."""
+
+    label: str
+    centroid: np.ndarray
+    weight: float
+
+
+@dataclass
+class SessionState:
+    """Speakers seen so far in one session."""
+
+    session_id: str
+    speakers: List[SessionSpeaker] = field(default_factory=list)
+    last_seen: float = 0.0
+
+    def next_label(self) -> str:
+        return f"SPEAKER_{len(self.speakers):02d}"
+
+
+class SessionSpeakerStore:
+    """
+    Per-session speaker centroids with TTL/LRU eviction.
+
+    Not thread-safe: use it from the event loop only.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        ttl_seconds: float = 3600.0,
+        match_threshold: float = 0.5,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.match_threshold = match_threshold
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        """Get a session's state without touching its LRU position."""
+        return self._sessions.get(session_id)
+
+    def assign(
+        self,
+        session_id: str,
+        embeddings: Dict[str, np.ndarray],
+        durations: Optional[Dict[str, float]] = None,
+        now: Optional[float] = None,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> Dict[str, str]:
+        """
+        Map a chunk's speaker labels onto the session's stable labels.
+
+        Chunk speakers are matched one-to-one to existing speakers, most
+        similar pair first, as long as the cosine similarity reaches
+        ``match_threshold``; unmatched speakers become new session speakers.
+        Matched centroids are updated with the chunk embedding, weighted by
+        speaking duration (or by ``weights``).
+
+        Args:
+            session_id: Session identifier
+            embeddings: Chunk speaker label -> embedding
+            durations: Chunk speaker label -> speaking duration in seconds
+            now: Current time (defaults to time.monotonic())
+            weights: Chunk speaker label -> weight of its embedding in the
+                     centroid update (defaults to durations); a weight of 0
+                     matches the speaker without updating its centroid
+
+        Returns:
+            Chunk speaker label -> stable session label
+        """
+        now = time.monotonic() if now is None else now
+        self.evict_expired(now)
+
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = SessionState(session_id=session_id)
+            self._sessions[session_id] = state
+            self._evict_lru()
+        self._sessions.move_to_end(session_id)
+        state.last_seen = now
+
+        durations = durations or {}
+        weights = durations if weights is None else weights
+        local_labels = list(embeddings)
+        vectors = {label: _normalize(np.asarray(embeddings[label], dtype=np.float32))
+                   for label in local_labels}
+
+        # Candidate pairs sorted by decreasing similarity
+        pairs = []
+        for local in local_labels:
+            for index, speaker in enumerate(state.speakers):
+                similarity = float(np.dot(vectors[local], _normalize(speaker.centroid)))
+                if similarity >= self.match_threshold:
+                    pairs.append((similarity, local, index))
+        pairs.sort(key=lambda pair: pair[0], reverse=True)
+
+        mapping: Dict[str, str] = {}
+        taken = set()
+        for _, local, index in pairs:
+            if local in mapping or index in taken:
+                continue
+            speaker = state.speakers[index]
+            mapping[local] = speaker.label
+            taken.add(index)
+            weight = weights.get(local, 1.0)
+            if weight <= 0:
+                continue
+            speaker.centroid = (speaker.centroid * speaker.weight + vectors[local] * weight) / (
+                speaker.weight + weight
+            )
+            speaker.weight += weight
+
+        # Unmatched chunk speakers are new to the session, longest first
+        for local in sorted(
+            (label for label in local_labels if label not in mapping),
+            key=lambda label: durations.get(label, 0.0),
+            reverse=True,
+        ):
+            speaker = SessionSpeaker(
+                label=state.next_label(),
+                centroid=vectors[local],
+                weight=max(weights.get(local, 1.0), 1e-3),
+            )
+            state.speakers.append(speaker)
+            mapping[local] = speaker.label
+
+        return mapping
+
+    def close(self, session_id: str) -> bool:
+        """Drop a session's state. Returns whether the session existed."""
+        return self._sessions.pop(session_id, None) is not None
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """Drop sessions idle for longer than the TTL. Returns the number evicted."""
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        # Sessions are kept in LRU order, so idle ones are at the front
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if now - state.last_seen <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+            evicted += 1
+
+        if evicted:
+            logger.info("Evicted idle diarization sessions", count=evicted)
+        return evicted
+
+    def _evict_lru(self):
+        while len(self._sessions) > self.max_sessions:
+            session_id, _ = self._sessions.popitem(last=False)
+            logger.info("Evicted least recently used diarization session", session_id=session_id)
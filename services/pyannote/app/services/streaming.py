@@ -0,0 +1,189 @@
+"""
+Online streaming diarization
+
+A live session streams 16-bit PCM frames instead of uploading whole chunks.
+Every ``step_seconds`` of new audio, the most recent ``window_seconds`` are
+diarized, and the window's speakers are matched onto the session's running
+speaker centroids (see ``SessionSpeakerStore``), so labels are stable for the
+whole stream. Speech older than ``finalize_lag_seconds`` before the end of the
+window will not be revisited and is emitted as final speaker turns; the rest
+of the window is reported as a provisional update.
+
+Audio is only dropped from the buffer once it has been finalized: if
+inference falls behind, the next window grows to cover everything not yet
+finalized. Windows overlap, so only audio not diarized before updates the
+session's speaker centroids.
+
+Each window waits for a slot in the service's salon-fair scheduler like any
+/diarize request, and a stream never has more than one window in flight:
+steps that come due while a window runs are skipped, so a stream costs at
+most one window at a time however slow inference gets.
+"""
+
+import functools
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+import numpy as np
+import structlog
+import torch
+
+from app.metrics import metrics
+from app.services.audio import SAMPLE_RATE
+from app.services.tenant_scheduler import DEFAULT_TENANT
+
+logger = structlog.get_logger()
+
+# PCM sample rates accepted from stream clients (resampled to SAMPLE_RATE)
+SUPPORTED_SAMPLE_RATES = (8000, 16000, 22050, 24000, 32000, 44100, 48000)
+
+
+@dataclass
+class StreamUpdate:
+    """Result of diarizing one window of the stream."""
+
+    # Speaker turns that will not change any more, in stream time
+    turns: List[Dict[str, Any]] = field(default_factory=list)
+    # Provisional speaker turns after the finalization horizon
+    partial: List[Dict[str, Any]] = field(default_factory=list)
+    # Stream time up to which turns are final
+    finalized_until: float = 0.0
+
+
+class StreamingDiarizer:
+    """Sliding-window diarization over a stream of PCM frames."""
+
+    def __init__(
+        self,
+        service: Any,
+        session_id: str,
+        sample_rate: int = SAMPLE_RATE,
+        window_seconds: float = 5.0,
+        step_seconds: float = 0.5,
+        finalize_lag_seconds: float = 0.5,
+        tenant: str = DEFAULT_TENANT,
+    ):
+        if sample_rate not in SUPPORTED_SAMPLE_RATES:
+            raise ValueError(f"Unsupported sample rate: {sample_rate}")
+
+        self.service = service
+        self.session_id = session_id
+        self.tenant = tenant
+        self.sample_rate = sample_rate
+        self.window_samples = int(window_seconds * sample_rate)
+        self.step_samples = max(int(step_seconds * sample_rate), 1)
+        self.finalize_lag = finalize_lag_seconds
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        # Stream sample index of the first buffered sample
+        self._buffer_start = 0
+        self._remainder = b""
+        self._received = 0
+        self._processed = 0
+        self._running = False
+        self.finalized_until = 0.0
+
+    @property
+    def received_seconds(self) -> float:
+        """Duration of audio received so far."""
+        return self._received / self.sample_rate
+
+    @property
+    def ready(self) -> bool:
+        """Whether no window is running and enough new audio has arrived for another."""
+        return not self._running and self._received - self._processed >= self.step_samples
+
+    def push(self, frame: bytes):
+        """Append a frame of 16-bit little-endian mono PCM."""
+        data = self._remainder + frame
+        # Frames may split a sample; keep the odd byte for the next frame
+        usable = len(data) - len(data) % 2
+        self._remainder = data[usable:]
+
+        samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        self._received += len(samples)
+        self._buffer = np.concatenate([self._buffer, samples])
+        self._trim()
+
+    def _trim(self):
+        """Drop audio that is both before the latest window and finalized."""
+        finalized = int(round(self.finalized_until * self.sample_rate))
+        keep_from = max(min(self._received - self.window_samples, finalized), self._buffer_start)
+        self._buffer = self._buffer[keep_from - self._buffer_start :]
+        self._buffer_start = keep_from
+
+    async def process(self, final: bool = False) -> StreamUpdate:
+        """
+        Diarize the latest window and finalize turns behind the horizon.
+
+        Args:
+            final: The stream has ended; finalize everything up to its end
+
+        Returns:
+            Newly finalized turns and the provisional rest of the window
+        """
+        window_end = self._received / self.sample_rate
+        window_start = self._buffer_start / self.sample_rate
+        # Leading part of the window that an earlier window already covered
+        seen_seconds = max(self._processed / self.sample_rate - window_start, 0.0)
+        # Steps that came due while the previous window ran are folded into this one
+        due = (self._received - self._processed) // self.step_samples
+        if due > 1:
+            metrics.counter("stream_steps_skipped").inc(due - 1)
+        self._processed = self._received
+
+        if len(self._buffer) == 0:
+            return StreamUpdate(finalized_until=self.finalized_until)
+
+        audio = {
+            "waveform": torch.from_numpy(self._buffer.copy())[None],
+            "sample_rate": self.sample_rate,
+        }
+        start_time = time.perf_counter()
+        self._running = True
+        try:
+            result = await self._diarize(audio, seen_seconds)
+        finally:
+            self._running = False
+        metrics.summary("stream_window_seconds").observe(time.perf_counter() - start_time)
+
+        horizon = window_end if final else max(window_end - self.finalize_lag, self.finalized_until)
+        update = StreamUpdate()
+
+        for seg in sorted(result["segments"], key=lambda s: s["start"]):
+            start = window_start + seg["start"]
+            end = min(window_start + seg["end"], window_end)
+
+            final_start, final_end = max(start, self.finalized_until), min(end, horizon)
+            if final_end > final_start:
+                update.turns.append(_turn(seg["speaker"], final_start, final_end))
+
+            partial_start = max(start, horizon)
+            if end > partial_start:
+                update.partial.append(_turn(seg["speaker"], partial_start, end))
+
+        self.finalized_until = horizon
+        update.finalized_until = horizon
+        self._trim()
+        metrics.counter("stream_finalized_turns").inc(len(update.turns))
+
+        return update
+
+    async def _diarize(self, audio: Dict[str, Any], seen_seconds: float) -> Dict[str, Any]:
+        """Diarize a window in a scheduler slot of the stream's salon."""
+        diarize = functools.partial(
+            self.service.diarize_with_embeddings,
+            audio,
+            session_id=self.session_id,
+            seen_seconds=seen_seconds,
+        )
+        scheduler = self.service.scheduler
+        if scheduler is None:
+            return await diarize()
+        async with scheduler.slot(self.tenant):
+            return await diarize()
+
+
+def _turn(speaker: str, start: float, end: float) -> Dict[str, Any]:
+    return {"speaker": speaker, "start": round(start, 3), "end": round(end, 3)}
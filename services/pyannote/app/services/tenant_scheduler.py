@@ -0,0 +1,254 @@
+"""
+Per-tenant fair scheduling
+
+Salons (tenants) share the inference replicas. Work is ordered with virtual
+clock fair queuing: each tenant's n-th waiting request is tagged as if its
+previous requests had been served at the tenant's weighted share, so a chain
+uploading a burst of chunks queues behind its own backlog while a small
+salon's request is served almost immediately. Each tenant can also be capped
+to a number of concurrently running requests.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Mapping, Optional
+
+from app.metrics import metrics
+
+# Tenant of requests that do not name a salon
+DEFAULT_TENANT = "default"
+
+# Metric label shared by tenants that the tenant policy does not name
+OTHER_TENANT = "other"
+
+# Metadata keys that identify the tenant of a job
+TENANT_METADATA_KEYS = ("salon_id", "tenant_id")
+
+
+def tenant_of(metadata: Optional[Mapping[str, Any]]) -> str:
+    """Tenant named in request or job metadata."""
+    for key in TENANT_METADATA_KEYS:
+        value = (metadata or {}).get(key)
+        if value:
+            return str(value)
+    return DEFAULT_TENANT
+
+
+class TenantPolicy:
+    """Per-tenant weights and concurrency caps."""
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        max_concurrency: Optional[Dict[str, int]] = None,
+        default_max_concurrency: int = 0,
+    ):
+        """
+        Args:
+            weights: Tenant -> share weight (default 1.0)
+            max_concurrency: Tenant -> cap on running requests
+            default_max_concurrency: Cap for tenants without an override (0 = none)
+        """
+        self.weights = dict(weights or {})
+        self.max_concurrency = dict(max_concurrency or {})
+        self.default_max_concurrency = default_max_concurrency
+
+    def weight(self, tenant: str) -> float:
+        return max(self.weights.get(tenant, 1.0), 1e-6)
+
+    def allows(self, tenant: str, running: int) -> bool:
+        """Whether a tenant with ``running`` requests in flight may start another."""
+        cap = self.max_concurrency.get(tenant, self.default_max_concurrency)
+        return cap <= 0 or running < cap
+
+    def names(self, tenant: str) -> bool:
+        """Whether the tenant has its own weight or concurrency cap."""
+        return tenant in self.weights or tenant in self.max_concurrency
+
+
+def tenant_label(tenant: str, policy: Optional[TenantPolicy] = None) -> str:
+    """
+    Metric label of a tenant.
+
+    Tenant ids come from clients, so only the default tenant and the tenants
+    named in the policy get a label of their own; all others share
+    OTHER_TENANT, which keeps the number of metric series bounded.
+    """
+    if tenant == DEFAULT_TENANT or (policy is not None and policy.names(tenant)):
+        return tenant
+    return OTHER_TENANT
+
+
+class VirtualClock:
+    """Virtual clock tags for weighted fair queuing."""
+
+    def __init__(self):
+        self._last: Dict[Hashable, float] = {}
+
+    def tag(
+        self,
+        flow: Hashable,
+        now: float,
+        cost: float = 1.0,
+        weight: float = 1.0,
+        commit: bool = True,
+    ) -> float:
+        """
+        Service tag of a new request of ``flow``; lower tags are served first.
+
+        Args:
+            flow: Queue the request belongs to (e.g. its tenant)
+            now: Current time
+            cost: Expected service time of the request
+            weight: Share of the flow
+            commit: Record the tag (False to only estimate it)
+        """
+        tag = max(now, self._last.get(flow, now)) + cost / weight
+        if commit:
+            self._last[flow] = tag
+            if len(self._last) > 1024:
+                # Flows whose tag has passed behave exactly like new flows
+                self._last = {f: t for f, t in self._last.items() if t > now}
+        return tag
+
+
+@dataclass(order=True)
+class _Waiter:
+    tag: float
+    seq: int
+    tenant: str = field(compare=False)
+    future: "asyncio.Future[None]" = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class FairScheduler:
+    """
+    Admits requests into ``capacity`` slots in weighted fair order.
+
+    Use ``async with scheduler.slot(tenant):`` around the work.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        policy: Optional[TenantPolicy] = None,
+        request_cost_seconds: float = 1.0,
+        on_wait: Optional[Callable[[float], None]] = None,
+    ):
+        """
+        Args:
+            capacity: Number of requests that may run at once
+            policy: Tenant weights and concurrency caps
+            request_cost_seconds: Typical request duration, which spaces the
+                                  tags of a tenant's consecutive requests
+            on_wait: Called with the seconds each admitted request waited
+        """
+        self.capacity = max(capacity, 1)
+        self.policy = policy or TenantPolicy()
+        self.request_cost_seconds = request_cost_seconds
+        self.on_wait = on_wait
+        self._clock = VirtualClock()
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._running: Dict[str, int] = {}
+        self._waiting: Dict[str, int] = {}
+        self._active = 0
+
+    @property
+    def active(self) -> int:
+        """Number of requests holding a slot."""
+        return self._active
+
+    def waiting(self, tenant: Optional[str] = None) -> int:
+        """Number of waiting requests, optionally of one tenant."""
+        if tenant is None:
+            return sum(self._waiting.values())
+        return self._waiting.get(tenant, 0)
+
+    @asynccontextmanager
+    async def slot(self, tenant: str = DEFAULT_TENANT) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        await self.acquire(tenant)
+        try:
+            yield
+        finally:
+            self.release(tenant)
+
+    async def acquire(self, tenant: str = DEFAULT_TENANT):
+        """Wait for a slot, in fair order among tenants."""
+        now = time.monotonic()
+        waiter = _Waiter(
+            tag=self._clock.tag(
+                tenant, now, cost=self.request_cost_seconds, weight=self.policy.weight(tenant)
+            ),
+            seq=next(self._seq),
+            tenant=tenant,
+            future=asyncio.get_running_loop().create_future(),
+            enqueued_at=now,
+        )
+        heapq.heappush(self._waiters, waiter)
+        self._add_waiting(tenant, 1)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller was cancelled: hand the slot on
+                self.release(tenant)
+            else:
+                waiter.future.cancel()
+                self._add_waiting(tenant, -1)
+            raise
+
+        waited = time.monotonic() - waiter.enqueued_at
+        metrics.summary(
+            "tenant_queue_wait_seconds", tenant=tenant_label(tenant, self.policy)
+        ).observe(waited)
+        if self.on_wait is not None:
+            self.on_wait(waited)
+
+    def release(self, tenant: str = DEFAULT_TENANT):
+        """Free a slot taken with ``acquire``."""
+        self._active -= 1
+        self._running[tenant] -= 1
+        if not self._running[tenant]:
+            del self._running[tenant]
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to the waiters with the lowest tags."""
+        skipped: List[_Waiter] = []
+        while self._waiters and self._active < self.capacity:
+            waiter = heapq.heappop(self._waiters)
+            if waiter.future.done():
+                continue
+            if not self.policy.allows(waiter.tenant, self._running.get(waiter.tenant, 0)):
+                skipped.append(waiter)
+                continue
+
+            self._active += 1
+            self._running[waiter.tenant] = self._running.get(waiter.tenant, 0) + 1
+            waiter.future.set_result(None)
+            self._add_waiting(waiter.tenant, -1)
+
+        for waiter in skipped:
+            heapq.heappush(self._waiters, waiter)
+
+    def _add_waiting(self, tenant: str, delta: int):
+        count = self._waiting.get(tenant, 0) + delta
+        if count:
+            self._waiting[tenant] = count
+        else:
+            self._waiting.pop(tenant, None)
+        label = tenant_label(tenant, self.policy)
+        depth = sum(
+            waiting
+            for other, waiting in self._waiting.items()
+            if tenant_label(other, self.policy) == label
+        )
+        metrics.gauge("tenant_queue_depth", tenant=label).set(depth)
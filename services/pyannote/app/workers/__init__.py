@@ -2,5 +2,14 @@
 Workers module for background task processing
 """
 from .diarization_worker import DiarizationWorker
+from .job_queue import AdmissionController, PriorityJobQueue, QueueFullError
+from .job_store import DiarizationJob, JobStore
 
-__all__ = ["DiarizationWorker"]
+__all__ = [
+    "AdmissionController",
+    "DiarizationJob",
+    "DiarizationWorker",
+    "JobStore",
+    "PriorityJobQueue",
+    "QueueFullError",
+]
@@ -1,34 +1,48 @@
 """
 Diarization Worker
 Background task worker for processing diarization jobs
+
+Jobs flow through four stages connected by bounded queues: fetch (stream the
+audio download), decode, inference and callback. While one job is being
+diarized the next ones are already downloaded and decoded, so inference does
+not wait on storage I/O; the bounded queues stop fetching when inference
+falls behind.
 """
 import asyncio
-import os
-import tempfile
-from typing import Any, Callable, Dict, Optional
+import time
 from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
 from datetime import datetime
 import uuid
 
 import structlog
 import httpx
 
+from app.metrics import metrics
+from app.services.audio import DecodedAudio
+from app.services.degradation import DegradationController
+from app.services.download import DownloadedAudio, download_audio
+from app.services.tenant_scheduler import TenantPolicy, tenant_label, tenant_of
+from app.workers.job_queue import AdmissionController, PriorityJobQueue, QueuedJob, QueueFullError
+from app.workers.job_store import DiarizationJob, JobStore
+
 logger = structlog.get_logger()
 
 
 @dataclass
-class DiarizationJob:
-    """Represents a diarization job."""
-    id: str
-    audio_url: str
-    callback_url: str
-    metadata: Dict[str, Any]
-    status: str  # pending, processing, completed, failed
-    created_at: datetime
-    started_at: Optional[datetime] = None
-    completed_at: Optional[datetime] = None
-    result: Optional[Dict[str, Any]] = None
-    error: Optional[str] = None
+class _WorkItem:
+    """A job moving through the pipeline stages."""
+
+    job: DiarizationJob
+    queued: QueuedJob
+    download: Optional[DownloadedAudio] = None
+    audio: Optional[DecodedAudio] = None
+
+    def discard(self):
+        """Drop the downloaded audio, if any."""
+        if self.download is not None:
+            self.download.discard()
+            self.download = None
 
 
 class DiarizationWorker:
@@ -41,14 +55,65 @@ class DiarizationWorker:
         self,
         diarization_service: Any,
         max_concurrent_jobs: int = 2,
+        job_store: Optional[JobStore] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        callback_outbox: Optional[Any] = None,
+        admission: Optional[AdmissionController] = None,
+        priority_aging_seconds: float = 30.0,
+        tenant_policy: Optional[TenantPolicy] = None,
+        degradation: Optional[DegradationController] = None,
+        prefetch_jobs: int = 2,
+        fetch_concurrency: int = 2,
+        spill_threshold_bytes: int = 32 * 1024 * 1024,
+        download_chunk_bytes: int = 256 * 1024,
+        recover_jobs: bool = True,
     ):
+        """
+        Args:
+            diarization_service: Service running the diarization
+            max_concurrent_jobs: Number of jobs processed in parallel
+            job_store: Persistent job store (defaults to an in-memory one)
+            http_client: Shared HTTP client; the worker creates its own if omitted
+            callback_outbox: Outbox delivering callbacks with retries; callbacks
+                             are posted directly if omitted
+            admission: Admission control for submit_job (defaults to its defaults)
+            priority_aging_seconds: Waiting time that raises a job by one priority class
+            tenant_policy: Per-salon weights and concurrency caps; the salon is
+                           taken from the job metadata (salon_id or tenant_id)
+            degradation: Degradation controller fed with realtime jobs' queue waits
+            prefetch_jobs: Capacity of the queues between stages, i.e. how many
+                           jobs are downloaded/decoded ahead of inference
+            fetch_concurrency: Number of concurrent downloads
+            spill_threshold_bytes: Downloads larger than this are streamed to a
+                                   temporary file instead of memory
+            download_chunk_bytes: Read size of streamed downloads
+            recover_jobs: Requeue unfinished jobs from the job store on start
+        """
         self.diarization_service = diarization_service
         self.max_concurrent_jobs = max_concurrent_jobs
-        self.jobs: Dict[str, DiarizationJob] = {}
-        self.job_queue: asyncio.Queue[str] = asyncio.Queue()
+        self.job_store = job_store or JobStore()
+        self.job_queue = PriorityJobQueue(
+            aging_seconds=priority_aging_seconds, policy=tenant_policy
+        )
+        self.admission = admission or AdmissionController()
+        self.degradation = degradation
+        self._tenants_seen: set[str] = set()
+        self.prefetch_jobs = max(prefetch_jobs, 1)
+        self.fetch_concurrency = max(fetch_concurrency, 1)
+        self.spill_threshold_bytes = spill_threshold_bytes
+        self.download_chunk_bytes = download_chunk_bytes
+        self.recover_jobs = recover_jobs
+        self._decode_queue: asyncio.Queue[_WorkItem] = asyncio.Queue(self.prefetch_jobs)
+        self._infer_queue: asyncio.Queue[_WorkItem] = asyncio.Queue(self.prefetch_jobs)
+        self._callback_queue: asyncio.Queue[DiarizationJob] = asyncio.Queue(self.prefetch_jobs)
+        # Inference tasks; the fetch, decode and callback tasks are kept apart
         self._workers: list[asyncio.Task[None]] = []
+        self._stage_tasks: list[asyncio.Task[None]] = []
+        self._purge_task: Optional[asyncio.Task[None]] = None
         self._running = False
-        self._http_client: Optional[httpx.AsyncClient] = None
+        self._http_client = http_client
+        self._owns_http_client = http_client is None
+        self.callback_outbox = callback_outbox
 
     async def start(self):
         """Start the worker pool."""
@@ -56,28 +121,77 @@ class DiarizationWorker:
             return
 
         self._running = True
-        self._http_client = httpx.AsyncClient(timeout=60.0)
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(timeout=60.0)
+
+        if self.recover_jobs:
+            await self._recover_jobs()
 
         # Start worker tasks
         for i in range(self.max_concurrent_jobs):
             task = asyncio.create_task(self._worker_loop(i))
             self._workers.append(task)
+        if self.max_concurrent_jobs > 0:
+            self._stage_tasks = [
+                asyncio.create_task(self._fetch_loop(i)) for i in range(self.fetch_concurrency)
+            ]
+            self._stage_tasks.append(asyncio.create_task(self._decode_loop()))
+            self._stage_tasks.append(asyncio.create_task(self._callback_loop()))
+        self._purge_task = asyncio.create_task(self._purge_loop())
 
         logger.info(f"Started {self.max_concurrent_jobs} diarization workers")
 
+    async def _recover_jobs(self):
+        """Requeue jobs that were pending or processing when the process stopped."""
+        unfinished = await asyncio.to_thread(self.job_store.unfinished)
+        for job in unfinished:
+            job.status = "pending"
+            job.started_at = None
+            await asyncio.to_thread(self.job_store.update, job)
+            self.job_queue.put_nowait(
+                job.id, job.priority, tenant_of(job.metadata), cost=self.admission.job_seconds
+            )
+
+        if unfinished:
+            logger.info("Recovered unfinished diarization jobs", count=len(unfinished))
+
+    async def _purge_loop(self):
+        """Periodically delete jobs past their retention period."""
+        interval = min(self.job_store.retention_seconds / 10, 3600.0)
+        while self._running:
+            try:
+                await asyncio.to_thread(self.job_store.purge_expired)
+            except Exception as e:
+                logger.error(f"Job purge failed: {e}")
+            await asyncio.sleep(interval)
+
     async def stop(self):
         """Stop the worker pool."""
         self._running = False
 
         # Cancel all workers
-        for task in self._workers:
+        tasks = self._stage_tasks + self._workers
+        for task in tasks:
             task.cancel()
+        if self._purge_task:
+            self._purge_task.cancel()
 
         # Wait for workers to finish
-        await asyncio.gather(*self._workers, return_exceptions=True)
+        await asyncio.gather(*tasks, return_exceptions=True)
         self._workers.clear()
-
-        if self._http_client:
+        self._stage_tasks.clear()
+
+        # Jobs still between stages stay "processing" and are recovered on restart
+        for queue in (self._decode_queue, self._infer_queue):
+            while not queue.empty():
+                queue.get_nowait().discard()
+        while not self._callback_queue.empty():
+            await self._send_callback(self._callback_queue.get_nowait())
+        if self._purge_task:
+            await asyncio.gather(self._purge_task, return_exceptions=True)
+            self._purge_task = None
+
+        if self._http_client and self._owns_http_client:
             await self._http_client.aclose()
             self._http_client = None
 
@@ -88,13 +202,35 @@ class DiarizationWorker:
         audio_url: str,
         callback_url: str,
         metadata: Optional[Dict[str, Any]] = None,
+        priority: str = "realtime",
     ) -> str:
         """
         Submit a new diarization job.
 
+        Args:
+            audio_url: URL of the audio to diarize
+            callback_url: URL that receives the result
+            metadata: Echoed back in the callback
+            priority: "realtime" (live chunks), "finalization" (end of session)
+                      or "backfill" (reprocessing)
+
         Returns:
             Job ID
+
+        Raises:
+            QueueFullError: If the queue is too deep or the expected wait too long
         """
+        tenant = tenant_of(metadata)
+        try:
+            self.admission.check(self.job_queue, priority, self.max_concurrent_jobs, tenant)
+        except QueueFullError as e:
+            label = tenant_label(tenant, self.job_queue.policy)
+            metrics.counter("jobs_rejected", priority=priority, tenant=label).inc()
+            logger.warning(
+                "Rejected diarization job", priority=priority, tenant=tenant, reason=str(e)
+            )
+            raise
+
         job_id = str(uuid.uuid4())
         job = DiarizationJob(
             id=job_id,
@@ -103,118 +239,221 @@ class DiarizationWorker:
             metadata=metadata or {},
             status="pending",
             created_at=datetime.utcnow(),
+            priority=priority,
         )
 
-        self.jobs[job_id] = job
-        await self.job_queue.put(job_id)
+        await asyncio.to_thread(self.job_store.add, job)
+        self.job_queue.put_nowait(job_id, priority, tenant, cost=self.admission.job_seconds)
+        self._update_queue_metrics()
 
-        logger.info(f"Submitted diarization job", job_id=job_id)
+        logger.info(
+            f"Submitted diarization job", job_id=job_id, priority=priority, tenant=tenant
+        )
         return job_id
 
+    def _update_queue_metrics(self):
+        for priority, depth in self.job_queue.depth_by_priority().items():
+            metrics.gauge("job_queue_depth", priority=priority).set(depth)
+        label_depths: Dict[str, int] = {}
+        for tenant, depth in self.job_queue.depth_by_tenant().items():
+            label = tenant_label(tenant, self.job_queue.policy)
+            label_depths[label] = label_depths.get(label, 0) + depth
+        for label in label_depths.keys() | self._tenants_seen:
+            metrics.gauge("job_queue_depth", tenant=label).set(label_depths.get(label, 0))
+        self._tenants_seen = set(label_depths)
+
     def get_job_status(self, job_id: str) -> Optional[DiarizationJob]:
-        """Get the status of a job."""
-        return self.jobs.get(job_id)
+        """Get the status of a job, including its result once completed."""
+        return self.job_store.get(job_id)
 
-    async def _worker_loop(self, worker_id: int):
-        """Main worker loop."""
-        logger.info(f"Worker {worker_id} started")
+    async def _fetch_loop(self, fetcher_id: int):
+        """Fetch stage: take jobs off the queue and download their audio."""
+        logger.info(f"Fetcher {fetcher_id} started")
 
         while self._running:
             try:
                 # Get next job from queue (with timeout to allow shutdown)
                 try:
-                    job_id = await asyncio.wait_for(
-                        self.job_queue.get(), timeout=1.0
-                    )
+                    queued = await asyncio.wait_for(self.job_queue.pop(), timeout=1.0)
                 except asyncio.TimeoutError:
                     continue
+                self._update_queue_metrics()
+                metrics.summary("job_queue_wait_seconds", priority=queued.priority).observe(
+                    queued.waited
+                )
+                label = tenant_label(queued.tenant, self.job_queue.policy)
+                metrics.summary("job_queue_wait_seconds", tenant=label).observe(queued.waited)
+                if queued.priority == "realtime" and self.degradation is not None:
+                    self.degradation.observe_wait(queued.waited)
+
+                job = await asyncio.to_thread(self.job_store.get, queued.job_id, False)
+                if not job or job.status != "pending":
+                    self.job_queue.task_done(queued.tenant)
+                    continue
+
+                logger.info(f"Fetcher {fetcher_id} processing job", job_id=job.id)
+                job.status = "processing"
+                job.started_at = datetime.utcnow()
+                await asyncio.to_thread(self.job_store.update, job)
 
-                job = self.jobs.get(job_id)
-                if not job:
+                item = _WorkItem(job=job, queued=queued)
+                try:
+                    start_time = time.monotonic()
+                    await self._download_audio(item)
+                    metrics.summary("job_stage_seconds", stage="fetch").observe(
+                        time.monotonic() - start_time
+                    )
+                except Exception as e:
+                    item.discard()
+                    await self._finish_job(item, error=e)
                     continue
 
-                await self._process_job(job, worker_id)
+                try:
+                    await self._decode_queue.put(item)
+                except BaseException:
+                    item.discard()
+                    raise
 
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"Worker {worker_id} error: {e}")
+                logger.error(f"Fetcher {fetcher_id} error: {e}")
 
-        logger.info(f"Worker {worker_id} stopped")
+        logger.info(f"Fetcher {fetcher_id} stopped")
 
-    async def _process_job(self, job: DiarizationJob, worker_id: int):
-        """Process a single diarization job."""
-        logger.info(f"Worker {worker_id} processing job", job_id=job.id)
+    async def _decode_loop(self):
+        """Decode stage: decode downloaded audio to 16 kHz mono off the event loop."""
+        while self._running:
+            try:
+                item = await self._decode_queue.get()
+                try:
+                    start_time = time.monotonic()
+                    item.audio = await asyncio.to_thread(self._decode, item)
+                    metrics.summary("job_stage_seconds", stage="decode").observe(
+                        time.monotonic() - start_time
+                    )
+                except Exception as e:
+                    await self._finish_job(item, error=e)
+                    continue
+                finally:
+                    item.discard()
 
-        job.status = "processing"
-        job.started_at = datetime.utcnow()
+                await self._infer_queue.put(item)
 
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Decoder error: {e}")
+
+    def _decode(self, item: "_WorkItem") -> DecodedAudio:
+        uploaded = item.download.decode(self.spill_threshold_bytes)
         try:
-            # Download audio file
-            audio_path = await self._download_audio(job.audio_url)
+            return DecodedAudio.load(uploaded.audio)
+        finally:
+            uploaded.close()
 
-            try:
-                # Run diarization
-                result = await self.diarization_service.diarize(audio_path)
+    async def _worker_loop(self, worker_id: int):
+        """Inference stage: diarize decoded audio."""
+        logger.info(f"Worker {worker_id} started")
 
-                # Estimate speaker roles
-                role_mapping = self.diarization_service.estimate_speakers(
-                    result["segments"]
+        while self._running:
+            try:
+                idle_since = time.monotonic()
+                item = await self._infer_queue.get()
+                metrics.summary("job_inference_idle_seconds").observe(
+                    time.monotonic() - idle_since
                 )
 
-                # Map speaker IDs to roles
-                for segment in result["segments"]:
-                    speaker_id = segment["speaker"]
-                    segment["role"] = role_mapping.get(speaker_id, "unknown")
+                start_time = time.monotonic()
+                try:
+                    result = await self.diarization_service.diarize(
+                        item.audio, priority=item.job.priority
+                    )
 
-                job.result = result
-                job.status = "completed"
-                job.completed_at = datetime.utcnow()
+                    # Estimate speaker roles
+                    role_mapping = self.diarization_service.estimate_speakers(
+                        result["segments"]
+                    )
 
-                logger.info(
-                    f"Job completed",
-                    job_id=job.id,
-                    num_segments=len(result["segments"]),
-                )
+                    # Map speaker IDs to roles
+                    for segment in result["segments"]:
+                        speaker_id = segment["speaker"]
+                        segment["role"] = role_mapping.get(speaker_id, "unknown")
 
-            finally:
-                # Clean up downloaded file
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
+                except Exception as e:
+                    await self._finish_job(item, error=e)
+                else:
+                    await self._finish_job(item, result=result)
+                finally:
+                    elapsed = time.monotonic() - start_time
+                    self.admission.record_job(elapsed)
+                    metrics.summary("job_stage_seconds", stage="inference").observe(elapsed)
 
-        except Exception as e:
-            job.status = "failed"
-            job.error = str(e)
-            job.completed_at = datetime.utcnow()
-            logger.error(f"Job failed", job_id=job.id, error=str(e))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Worker {worker_id} error: {e}")
 
-        # Send callback
-        await self._send_callback(job)
+        logger.info(f"Worker {worker_id} stopped")
 
-    async def _download_audio(self, audio_url: str) -> str:
-        """Download audio file to temporary location."""
-        if not self._http_client:
-            raise RuntimeError("HTTP client not initialized")
+    async def _finish_job(
+        self,
+        item: "_WorkItem",
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[Exception] = None,
+    ):
+        """Record a job's outcome, release its queue slot and hand it to the callback stage."""
+        job = item.job
+        item.audio = None
+        job.completed_at = datetime.utcnow()
+        if error is None:
+            job.result = result
+            job.status = "completed"
+            logger.info(
+                f"Job completed",
+                job_id=job.id,
+                num_segments=len(result["segments"]),
+            )
+        else:
+            job.status = "failed"
+            job.error = str(error)
+            logger.error(f"Job failed", job_id=job.id, error=str(error))
 
-        response = await self._http_client.get(audio_url)
-        response.raise_for_status()
+        try:
+            await asyncio.to_thread(self.job_store.update, job)
+        finally:
+            self.job_queue.task_done(item.queued.tenant)
+            label = tenant_label(item.queued.tenant, self.job_queue.policy)
+            metrics.summary("job_latency_seconds", tenant=label).observe(item.queued.waited)
 
-        # Create temp file
-        suffix = ".wav" if ".wav" in audio_url.lower() else ".m4a"
-        fd, path = tempfile.mkstemp(suffix=suffix)
+        await self._callback_queue.put(job)
 
-        try:
-            with os.fdopen(fd, "wb") as f:
-                f.write(response.content)
-        except Exception:
-            os.close(fd)
-            raise
+    async def _callback_loop(self):
+        """Callback stage: deliver results without holding up inference."""
+        while self._running:
+            try:
+                job = await self._callback_queue.get()
+                await self._send_callback(job)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Callback stage error: {e}")
+
+    async def _download_audio(self, item: "_WorkItem"):
+        """Stream a job's audio into memory or, above the spill threshold, to disk."""
+        if not self._http_client:
+            raise RuntimeError("HTTP client not initialized")
 
-        return path
+        item.download = await download_audio(
+            self._http_client,
+            item.job.audio_url,
+            self.spill_threshold_bytes,
+            self.download_chunk_bytes,
+        )
 
     async def _send_callback(self, job: DiarizationJob):
         """Send callback with job result."""
-        if not self._http_client:
+        if not self._http_client and not self.callback_outbox:
             return
 
         try:
@@ -231,12 +470,15 @@ class DiarizationWorker:
             elif job.status == "failed" and job.error:
                 payload["error"] = job.error
 
-            response = await self._http_client.post(
-                job.callback_url,
-                json=payload,
-                headers={"Content-Type": "application/json"},
-            )
-            response.raise_for_status()
+            if self.callback_outbox is not None:
+                await self.callback_outbox.enqueue(job.callback_url, payload)
+            else:
+                response = await self._http_client.post(
+                    job.callback_url,
+                    json=payload,
+                    headers={"Content-Type": "application/json"},
+                )
+                response.raise_for_status()
 
             logger.info(f"Callback sent", job_id=job.id, status=job.status)
 
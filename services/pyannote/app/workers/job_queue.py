@@ -0,0 +1,259 @@
+"""
+Priority job queue
+Priority classes with aging, per-tenant fairness and admission control
+for DiarizationWorker
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal, Optional
+
+from app.services.tenant_scheduler import DEFAULT_TENANT, TenantPolicy, VirtualClock
+
+JobPriority = Literal["realtime", "finalization", "backfill"]
+
+# Lower rank is served first
+PRIORITY_RANKS: Dict[str, int] = {
+    "realtime": 0,
+    "finalization": 1,
+    "backfill": 2,
+}
+
+
+class QueueFullError(Exception):
+    """Raised when a job is rejected because the queue is overloaded."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class QueuedJob:
+    """A job waiting in the queue."""
+
+    key: float
+    seq: int
+    job_id: str = field(compare=False)
+    priority: str = field(compare=False)
+    tenant: str = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+    @property
+    def waited(self) -> float:
+        """Seconds spent in the queue."""
+        return time.monotonic() - self.enqueued_at
+
+
+class PriorityJobQueue:
+    """
+    Job queue ordered by priority class with aging, fair across tenants.
+
+    A job's effective rank is its class rank minus the time it has waited
+    divided by ``aging_seconds``: a backfill job that has waited
+    ``2 * aging_seconds`` competes as a realtime job that has just arrived, so
+    low-priority work keeps progressing under a steady stream of realtime
+    jobs. Since every job ages at the same rate, ordering by
+    ``arrival + rank * aging_seconds`` is equivalent and lets the queue be a
+    plain heap.
+
+    Across tenants the arrival time is a virtual clock tag (see
+    ``VirtualClock``): a tenant's job arrives, for scheduling purposes, no
+    earlier than its previous job of the same class plus ``cost / weight``.
+    Jobs of tenants at their concurrency cap stay queued until one of the
+    tenant's jobs is marked done.
+    """
+
+    def __init__(self, aging_seconds: float = 30.0, policy: Optional[TenantPolicy] = None):
+        self.aging_seconds = aging_seconds
+        self.policy = policy or TenantPolicy()
+        self._clock = VirtualClock()
+        self._heap: List[QueuedJob] = []
+        self._seq = itertools.count()
+        self._running: Dict[str, int] = {}
+        self._changed = asyncio.Event()
+
+    def qsize(self) -> int:
+        return len(self._heap)
+
+    def empty(self) -> bool:
+        return not self._heap
+
+    def depth_by_priority(self) -> Dict[str, int]:
+        """Number of queued jobs per priority class."""
+        depth = {priority: 0 for priority in PRIORITY_RANKS}
+        for item in self._heap:
+            depth[item.priority] += 1
+        return depth
+
+    def depth_by_tenant(self) -> Dict[str, int]:
+        """Number of queued jobs per tenant."""
+        depth: Dict[str, int] = {}
+        for item in self._heap:
+            depth[item.tenant] = depth.get(item.tenant, 0) + 1
+        return depth
+
+    def running(self, tenant: str) -> int:
+        """Number of popped jobs of a tenant not yet marked done."""
+        return self._running.get(tenant, 0)
+
+    def _key(
+        self, priority: str, tenant: str, now: float, cost: float, commit: bool = True
+    ) -> float:
+        arrival = self._clock.tag(
+            (tenant, priority), now, cost=cost, weight=self.policy.weight(tenant), commit=commit
+        )
+        return arrival + PRIORITY_RANKS[priority] * self.aging_seconds
+
+    def jobs_ahead(
+        self,
+        priority: str,
+        tenant: str = DEFAULT_TENANT,
+        cost: float = 1.0,
+        now: Optional[float] = None,
+    ) -> int:
+        """Number of queued jobs that would be served before a new job."""
+        now = time.monotonic() if now is None else now
+        key = self._key(priority, tenant, now, cost, commit=False)
+        return sum(1 for item in self._heap if item.key <= key)
+
+    def put_nowait(
+        self,
+        job_id: str,
+        priority: str = "realtime",
+        tenant: str = DEFAULT_TENANT,
+        cost: float = 1.0,
+        now: Optional[float] = None,
+    ):
+        """
+        Queue a job.
+
+        Args:
+            job_id: Job identifier
+            priority: Priority class
+            tenant: Tenant the job belongs to
+            cost: Expected processing time, which spaces the tenant's jobs
+            now: Current time (defaults to time.monotonic())
+        """
+        if priority not in PRIORITY_RANKS:
+            raise ValueError(f"Unknown job priority: {priority}")
+        now = time.monotonic() if now is None else now
+        heapq.heappush(
+            self._heap,
+            QueuedJob(
+                self._key(priority, tenant, now, cost), next(self._seq),
+                job_id, priority, tenant, now,
+            ),
+        )
+        self._changed.set()
+
+    def get_nowait(self) -> str:
+        """Pop the next job ID. Raises asyncio.QueueEmpty if there is none."""
+        return self.pop_nowait().job_id
+
+    def pop_nowait(self) -> QueuedJob:
+        """
+        Pop the next job whose tenant is below its concurrency cap.
+
+        Raises:
+            asyncio.QueueEmpty: If no queued job may run now
+        """
+        skipped: List[QueuedJob] = []
+        try:
+            while self._heap:
+                item = heapq.heappop(self._heap)
+                if self.policy.allows(item.tenant, self.running(item.tenant)):
+                    self._running[item.tenant] = self.running(item.tenant) + 1
+                    return item
+                skipped.append(item)
+        finally:
+            for item in skipped:
+                heapq.heappush(self._heap, item)
+        raise asyncio.QueueEmpty
+
+    async def get(self) -> str:
+        """Wait for and pop the next job ID."""
+        return (await self.pop()).job_id
+
+    async def pop(self) -> QueuedJob:
+        """Wait for and pop the next job that may run."""
+        while True:
+            try:
+                return self.pop_nowait()
+            except asyncio.QueueEmpty:
+                self._changed.clear()
+                await self._changed.wait()
+
+    def task_done(self, tenant: str = DEFAULT_TENANT):
+        """Mark a popped job of ``tenant`` as finished."""
+        count = self.running(tenant) - 1
+        if count > 0:
+            self._running[tenant] = count
+        else:
+            self._running.pop(tenant, None)
+        self._changed.set()
+
+
+class AdmissionController:
+    """
+    Rejects new jobs when the queue is too deep or the wait too long.
+
+    The expected wait is estimated from the jobs that would be served first
+    and a moving average of job processing time.
+    """
+
+    def __init__(
+        self,
+        max_queue_depth: int = 100,
+        max_wait_seconds: float = 120.0,
+        initial_job_seconds: float = 10.0,
+        smoothing: float = 0.2,
+    ):
+        self.max_queue_depth = max_queue_depth
+        self.max_wait_seconds = max_wait_seconds
+        self.job_seconds = initial_job_seconds
+        self.smoothing = smoothing
+
+    def record_job(self, seconds: float):
+        """Update the moving average of job processing time."""
+        self.job_seconds += self.smoothing * (seconds - self.job_seconds)
+
+    def estimated_wait(self, jobs_ahead: int, concurrency: int) -> float:
+        """Expected seconds before a job with ``jobs_ahead`` jobs before it starts."""
+        return jobs_ahead * self.job_seconds / max(concurrency, 1)
+
+    def check(
+        self,
+        queue: PriorityJobQueue,
+        priority: str,
+        concurrency: int,
+        tenant: str = DEFAULT_TENANT,
+    ):
+        """
+        Admit or reject a new job.
+
+        A tenant with a large backlog sees its own backlog in the estimated
+        wait, so it is throttled before other tenants are.
+
+        Raises:
+            QueueFullError: With a Retry-After estimate, if the job is rejected
+        """
+        per_job = self.job_seconds / max(concurrency, 1)
+
+        depth = queue.qsize()
+        if depth >= self.max_queue_depth:
+            retry_after = (depth - self.max_queue_depth + 1) * per_job
+            raise QueueFullError(
+                f"Job queue is full ({depth} jobs)", max(math.ceil(retry_after), 1)
+            )
+
+        jobs_ahead = queue.jobs_ahead(priority, tenant, cost=self.job_seconds)
+        wait = self.estimated_wait(jobs_ahead, concurrency)
+        if wait > self.max_wait_seconds:
+            raise QueueFullError(
+                f"Estimated wait of {wait:.0f}s exceeds {self.max_wait_seconds:.0f}s",
+                max(math.ceil(wait - self.max_wait_seconds), 1),
+            )
@@ -0,0 +1,219 @@
+"""
+Diarization job store
+Bounded job records backed by SQLite
+"""
+import dataclasses
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+# Jobs in these states were not finished when the process stopped
+UNFINISHED_STATUSES = ("pending", "processing")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    audio_url TEXT NOT NULL,
+    callback_url TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    completed_at REAL,
+    result TEXT,
+    error TEXT,
+    priority TEXT NOT NULL DEFAULT 'realtime'
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_completed_at ON jobs (completed_at);
+"""
+
+
+@dataclass
+class DiarizationJob:
+    """Represents a diarization job."""
+    id: str
+    audio_url: str
+    callback_url: str
+    metadata: Dict[str, Any]
+    status: str  # pending, processing, completed, failed
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    priority: str = "realtime"  # realtime, finalization, backfill
+
+
+def _to_timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.replace(tzinfo=timezone.utc).timestamp() if value else None
+
+
+def _from_timestamp(value: Optional[float]) -> Optional[datetime]:
+    # Job times are naive UTC, like datetime.utcnow()
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+
+
+class JobStore:
+    """
+    Job records with a bounded in-memory cache.
+
+    Every job is persisted in SQLite, so pending jobs survive a restart and
+    status lookups are a primary-key read however many jobs have run. Only
+    the ``max_recent`` most recently used jobs are kept in memory, without
+    their result; results are read from SQLite on demand. Finished jobs are
+    deleted ``retention_seconds`` after completion.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        max_recent: int = 1000,
+        retention_seconds: float = 7 * 24 * 3600,
+    ):
+        self.path = path
+        self.max_recent = max_recent
+        self.retention_seconds = retention_seconds
+        self._recent: "OrderedDict[str, DiarizationJob]" = OrderedDict()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def add(self, job: DiarizationJob):
+        """Persist a new job."""
+        self.update(job)
+
+    def update(self, job: DiarizationJob):
+        """Persist a job's current state."""
+        result = json.dumps(job.result) if job.result is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, audio_url, callback_url, metadata, "
+                "created_at, started_at, completed_at, result, error, priority) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.status,
+                    job.audio_url,
+                    job.callback_url,
+                    json.dumps(job.metadata),
+                    _to_timestamp(job.created_at),
+                    _to_timestamp(job.started_at),
+                    _to_timestamp(job.completed_at),
+                    result,
+                    job.error,
+                    job.priority,
+                ),
+            )
+            # Results live only in SQLite; the cached record stays compact
+            self._remember(dataclasses.replace(job, result=None) if result else job)
+
+    def get(self, job_id: str, include_result: bool = True) -> Optional[DiarizationJob]:
+        """
+        Look up a job.
+
+        Args:
+            job_id: Job identifier
+            include_result: Load the result of completed jobs
+
+        Returns:
+            The job, or None if it is unknown or has expired
+        """
+        with self._lock:
+            job = self._recent.get(job_id)
+            if job is not None:
+                self._recent.move_to_end(job_id)
+                if not include_result or job.status != "completed":
+                    return job
+
+            row = self._db.execute(
+                "SELECT id, status, audio_url, callback_url, metadata, created_at, "
+                "started_at, completed_at, error, "
+                f"{'result' if include_result else 'NULL'}, priority FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            job = self._from_row(row)
+            self._remember(dataclasses.replace(job, result=None))
+            return job
+
+    def unfinished(self) -> List[DiarizationJob]:
+        """Jobs that were pending or processing, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, status, audio_url, callback_url, metadata, created_at, "
+                "started_at, completed_at, error, NULL, priority FROM jobs "
+                f"WHERE status IN ({','.join('?' * len(UNFINISHED_STATUSES))}) "
+                "ORDER BY created_at",
+                UNFINISHED_STATUSES,
+            ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Delete jobs finished longer than the retention period ago."""
+        cutoff = (time.time() if now is None else now) - self.retention_seconds
+        with self._lock:
+            expired = [
+                row[0]
+                for row in self._db.execute(
+                    "SELECT id FROM jobs WHERE completed_at < ?", (cutoff,)
+                ).fetchall()
+            ]
+            self._db.execute("DELETE FROM jobs WHERE completed_at < ?", (cutoff,))
+            for job_id in expired:
+                self._recent.pop(job_id, None)
+
+        if expired:
+            logger.info("Purged expired diarization jobs", count=len(expired))
+        return len(expired)
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def _remember(self, job: DiarizationJob):
+        self._recent[job.id] = job
+        self._recent.move_to_end(job.id)
+        while len(self._recent) > self.max_recent:
+            self._recent.popitem(last=False)
+
+    @staticmethod
+    def _from_row(row: tuple) -> DiarizationJob:
+        return DiarizationJob(
+            id=row[0],
+            status=row[1],
+            audio_url=row[2],
+            callback_url=row[3],
+            metadata=json.loads(row[4]),
+            created_at=_from_timestamp(row[5]),
+            started_at=_from_timestamp(row[6]),
+            completed_at=_from_timestamp(row[7]),
+            error=row[8],
+            result=json.loads(row[9]) if row[9] else None,
+            priority=row[10],
+        )
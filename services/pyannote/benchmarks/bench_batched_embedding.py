@@ -0,0 +1,140 @@
+"""
+Benchmark: per-turn vs batched segment embedding
+
+Embeds N speaker turns (0.5-6 s) one forward pass at a time, as the service
+used to, and with embed_chunks, then reports the speedup and how far the
+mean-pooled speaker embedding moved.
+
+Uses the real pyannote/embedding model when HUGGINGFACE_TOKEN is set and
+pyannote.audio is installed, and a synthetic x-vector-like model otherwise:
+
+    python -m benchmarks.bench_batched_embedding [--turns 5 10 20 40 80]
+"""
+
+import argparse
+import os
+import time
+import warnings
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from app.services.embedding_batch import embed_chunks
+
+SAMPLE_RATE = 16000
+
+
+class SyntheticXVector(torch.nn.Module):
+    """Convolutional frame encoder + weighted statistics pooling, x-vector sized."""
+
+    def __init__(self):
+        super().__init__()
+        self.encoder = torch.nn.Sequential(
+            torch.nn.Conv1d(1, 64, kernel_size=251, stride=10),
+            torch.nn.LeakyReLU(),
+            torch.nn.MaxPool1d(3),
+            torch.nn.Conv1d(64, 128, kernel_size=5, dilation=2),
+            torch.nn.LeakyReLU(),
+            torch.nn.Conv1d(128, 256, kernel_size=3, dilation=3),
+            torch.nn.LeakyReLU(),
+            torch.nn.Conv1d(256, 512, kernel_size=1),
+        )
+        self.embedding = torch.nn.Linear(1024, 512)
+
+    def forward(self, waveforms, weights=None):
+        frames = self.encoder(waveforms)
+        if weights is None:
+            pooled = torch.cat([frames.mean(dim=-1), frames.std(dim=-1)], dim=-1)
+        else:
+            w = F.interpolate(weights[:, None], size=frames.shape[-1], mode="nearest")
+            v1 = w.sum(dim=2) + 1e-8
+            mean = (frames * w).sum(dim=2) / v1
+            var = ((frames - mean[..., None]) ** 2 * w).sum(dim=2) / (
+                v1 - (w**2).sum(dim=2) / v1 + 1e-8
+            )
+            pooled = torch.cat([mean, var.sqrt()], dim=-1)
+        return self.embedding(pooled)
+
+
+class SyntheticInference:
+    """Minimal stand-in for pyannote Inference around SyntheticXVector."""
+
+    def __init__(self):
+        self.model = SyntheticXVector().eval()
+        self.device = torch.device("cpu")
+
+    def infer(self, chunks):
+        with torch.inference_mode():
+            return self.model(chunks).numpy()
+
+
+def load_inference():
+    """Load the real embedding model if possible, else the synthetic one."""
+    token = os.getenv("HUGGINGFACE_TOKEN")
+    if token:
+        try:
+            from pyannote.audio import Inference, Model
+
+            model = Model.from_pretrained("pyannote/embedding", use_auth_token=token)
+            return Inference(model, window="whole"), "pyannote/embedding"
+        except ImportError:
+            pass
+    return SyntheticInference(), "synthetic x-vector"
+
+
+def make_turns(num_turns: int, seed: int = 0):
+    """Random speaker turns between 0.5 and 6 seconds."""
+    generator = torch.Generator().manual_seed(seed)
+    durations = torch.empty(num_turns).uniform_(0.5, 6.0, generator=generator)
+    return [torch.randn(1, int(d * SAMPLE_RATE), generator=generator) * 0.1 for d in durations]
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def run(turn_counts, repeats: int):
+    inference, name = load_inference()
+    torch.set_grad_enabled(False)
+    print(f"Embedding model: {name}, torch threads: {torch.get_num_threads()}")
+    print(f"{'turns':>6} {'per-turn ms':>12} {'batched ms':>11} {'speedup':>8} {'mean cos':>9}")
+
+    for num_turns in turn_counts:
+        chunks = make_turns(num_turns)
+
+        # Warm up both paths
+        inference.infer(chunks[0][None])
+        embed_chunks(inference, chunks[:2])
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            sequential = [inference.infer(chunk[None])[0] for chunk in chunks]
+        per_turn_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            batched = embed_chunks(inference, chunks)
+        batched_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        similarity = cosine(
+            np.mean(np.stack(sequential), axis=0), np.mean(np.stack(batched), axis=0)
+        )
+        print(
+            f"{num_turns:>6} {per_turn_ms:>12.1f} {batched_ms:>11.1f} "
+            f"{per_turn_ms / batched_ms:>7.2f}x {similarity:>9.5f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--turns", type=int, nargs="+", default=[5, 10, 20, 40, 80])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    run(args.turns, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
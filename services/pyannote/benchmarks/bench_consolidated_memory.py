@@ -0,0 +1,141 @@
+"""
+Benchmark: resident memory of two diarization servers vs one
+
+Before consolidation a node ran services/pyannote and services/pyannote-server
+side by side, each loading its own copy of the diarization model. Now one
+process serves /api/v1 and the legacy /diarize routes from a single model.
+This starts one Python process per server, loads the model, runs one
+inference per API the process serves, and sums resident memory (VmRSS).
+
+Uses the real pyannote/speaker-diarization-3.1 pipeline when
+HUGGINGFACE_TOKEN is set and pyannote.audio is installed, and synthetic
+segmentation/embedding models of similar size otherwise:
+
+    python -m benchmarks.bench_consolidated_memory [--seconds 30]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import warnings
+
+import torch
+
+from benchmarks.bench_batched_embedding import SyntheticXVector
+
+SAMPLE_RATE = 16000
+
+
+class SyntheticSegmentation(torch.nn.Module):
+    """PyanNet-sized stand-in: conv front end, 4-layer BiLSTM, frame classifier."""
+
+    def __init__(self):
+        super().__init__()
+        self.frontend = torch.nn.Sequential(
+            torch.nn.Conv1d(1, 80, kernel_size=251, stride=10),
+            torch.nn.LeakyReLU(),
+            torch.nn.MaxPool1d(3),
+            torch.nn.Conv1d(80, 60, kernel_size=5),
+            torch.nn.LeakyReLU(),
+            torch.nn.MaxPool1d(3),
+        )
+        self.lstm = torch.nn.LSTM(60, 128, num_layers=4, bidirectional=True, batch_first=True)
+        self.classifier = torch.nn.Linear(256, 7)
+
+    def forward(self, waveforms):
+        frames = self.frontend(waveforms).transpose(1, 2)
+        return self.classifier(self.lstm(frames)[0])
+
+
+def load_model():
+    """Load the real pipeline if possible, else the synthetic models."""
+    token = os.getenv("HUGGINGFACE_TOKEN")
+    if token:
+        try:
+            from pyannote.audio import Pipeline
+
+            pipeline = Pipeline.from_pretrained(
+                "pyannote/speaker-diarization-3.1", use_auth_token=token
+            )
+            return pipeline, "pyannote/speaker-diarization-3.1"
+        except ImportError:
+            pass
+
+    segmentation = SyntheticSegmentation().eval()
+    embedding = SyntheticXVector().eval()
+
+    def pipeline(audio):
+        waveform = audio["waveform"][None]
+        with torch.inference_mode():
+            segmentation(waveform)
+            # One embedding per 10 s window, as a stand-in for per-speaker embeddings
+            windows = waveform.unfold(-1, 10 * SAMPLE_RATE, 10 * SAMPLE_RATE)[0]
+            embedding(windows.transpose(0, 1))
+
+    return pipeline, "synthetic segmentation + x-vector"
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def serve(apis: int, seconds: float):
+    """Child process: load one model and run one inference per API it serves."""
+    warnings.filterwarnings("ignore")
+    torch.set_num_threads(1)
+    baseline = rss_mb()
+    pipeline, name = load_model()
+    audio = {"waveform": torch.randn(1, int(seconds * SAMPLE_RATE)) * 0.1,
+             "sample_rate": SAMPLE_RATE}
+    for _ in range(apis):
+        pipeline(audio)
+    print(json.dumps({"model": name, "baseline_mb": baseline, "rss_mb": rss_mb()}))
+
+
+def measure(apis: int, seconds: float) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_consolidated_memory",
+         "--serve", str(apis), "--seconds", str(seconds)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(seconds: float):
+    # Before: pyannote service and pyannote-server, one API each, one model each
+    before = [measure(1, seconds), measure(1, seconds)]
+    # After: one process, both APIs, one model
+    after = measure(2, seconds)
+
+    before_total = sum(p["rss_mb"] for p in before)
+    model_mb = after["rss_mb"] - after["baseline_mb"]
+    print(f"Model: {after['model']}, {seconds:.0f} s of audio per request")
+    print(f"{'setup':<28} {'processes':>9} {'RSS MB':>9}")
+    print(f"{'two servers (before)':<28} {2:>9} {before_total:>9.0f}")
+    print(f"{'consolidated (after)':<28} {1:>9} {after['rss_mb']:>9.0f}")
+    print(
+        f"Saved {before_total - after['rss_mb']:.0f} MB per node "
+        f"({model_mb:.0f} MB of it model and inference state)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.seconds)
+    else:
+        run(args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Benchmark: reduced-precision inference (int8 / bf16) against fp32
+
+Runs the segmentation and embedding models in each precision mode of
+app.services.precision over the synthetic conversation corpus and reports,
+against fp32:
+
+- segmentation and embedding latency (ms per minute of audio)
+- peak memory: the largest increase in process RSS while the mode's models
+  are built and run over the corpus (MB; modes share one process, so a
+  later mode can reuse pages an earlier one freed)
+- serialized model size (state_dict bytes, MB)
+- segmentation agreement: frames whose most likely class is unchanged
+- embedding cosine similarity per speaker turn (mean and minimum)
+- speaker-assignment agreement: turns assigned to the same speaker as in
+  fp32, assigning each turn to the nearest fp32 speaker centroid of its
+  conversation (accuracy against the ground truth is shown as well)
+
+Uses the real pyannote/speaker-diarization-3.1 segmentation model and
+pyannote/embedding when HUGGINGFACE_TOKEN is set and pyannote.audio is
+installed, and synthetic models of similar size otherwise:
+
+    python -m benchmarks.bench_precision [--conversations 6] [--seconds 60]
+"""
+
+import argparse
+import copy
+import gc
+import io
+import os
+import threading
+import time
+import warnings
+from typing import Dict, List
+
+import numpy as np
+import torch
+
+from app.services.embedding_batch import embed_chunks
+from app.services.precision import PRECISIONS, apply_precision
+from benchmarks.bench_batched_embedding import SyntheticInference
+from benchmarks.bench_consolidated_memory import SyntheticSegmentation, rss_mb
+from benchmarks.synthetic_corpus import SAMPLE_RATE, make_corpus
+
+
+def load_models():
+    """Load the real segmentation and embedding models if possible, else synthetic ones."""
+    token = os.getenv("HUGGINGFACE_TOKEN")
+    if token:
+        try:
+            from pyannote.audio import Inference, Model, Pipeline
+
+            pipeline = Pipeline.from_pretrained(
+                "pyannote/speaker-diarization-3.1", use_auth_token=token
+            )
+            embedding = Model.from_pretrained("pyannote/embedding", use_auth_token=token)
+            return (
+                pipeline._segmentation.model.eval(),
+                Inference(embedding, window="whole"),
+                "pyannote/speaker-diarization-3.1 segmentation + pyannote/embedding",
+            )
+        except ImportError:
+            pass
+    return SyntheticSegmentation().eval(), SyntheticInference(), "synthetic"
+
+
+def model_mb(model: torch.nn.Module) -> float:
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1e6
+
+
+class PeakRss:
+    """Samples the process RSS in a background thread and keeps the largest value."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.baseline = self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self):
+        self.baseline = self.peak = rss_mb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+    @property
+    def increase_mb(self) -> float:
+        return self.peak - self.baseline
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-12))
+
+
+def segmentation_windows(corpus, seconds: float) -> List[torch.Tensor]:
+    """Batches of consecutive, non-overlapping windows, one batch per conversation."""
+    size = int(seconds * SAMPLE_RATE)
+    return [
+        conversation.waveform.unfold(-1, size, size).transpose(0, 1)
+        for conversation in corpus
+    ]
+
+
+def turn_chunks(corpus) -> List[List[torch.Tensor]]:
+    return [
+        [
+            conversation.waveform[:, int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+            for start, end, _ in conversation.turns
+        ]
+        for conversation in corpus
+    ]
+
+
+def assign_speakers(embeddings: List[np.ndarray], centroids: np.ndarray) -> np.ndarray:
+    normalized = np.stack([e / (np.linalg.norm(e) + 1e-12) for e in embeddings])
+    return np.argmax(normalized @ centroids.T, axis=1)
+
+
+def speaker_centroids(embeddings: List[np.ndarray], speakers: List[int]) -> np.ndarray:
+    centroids = []
+    for speaker in sorted(set(speakers)):
+        members = [e for e, s in zip(embeddings, speakers) if s == speaker]
+        centroid = np.mean(members, axis=0)
+        centroids.append(centroid / (np.linalg.norm(centroid) + 1e-12))
+    return np.stack(centroids)
+
+
+def run_mode(segmentation, inference, windows, chunks) -> Dict:
+    """Run every model over the corpus once (after a warm-up) and time it."""
+    with torch.inference_mode():
+        segmentation(windows[0][:1])
+        embed_chunks(inference, chunks[0][:2])
+
+        start = time.perf_counter()
+        frames = [segmentation(batch).argmax(dim=-1) for batch in windows]
+        segmentation_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        embeddings = [embed_chunks(inference, turns) for turns in chunks]
+        embedding_s = time.perf_counter() - start
+
+    return {
+        "frames": frames,
+        "embeddings": embeddings,
+        "segmentation_s": segmentation_s,
+        "embedding_s": embedding_s,
+    }
+
+
+def run_precision(precision: str, segmentation, inference, windows, chunks) -> Dict:
+    """Copy the models into one precision mode and run them, sampling peak RSS."""
+    # Release the previous mode's models so its pages can be reused
+    gc.collect()
+    with PeakRss() as memory:
+        mode_segmentation = copy.deepcopy(segmentation)
+        mode_inference = copy.deepcopy(inference)
+        applied = apply_precision(
+            precision,
+            {"segmentation": [mode_segmentation], "embedding": [mode_inference.model]},
+        )
+        result = run_mode(mode_segmentation, mode_inference, windows, chunks)
+    result["applied"] = applied
+    result["peak_mb"] = memory.increase_mb
+    result["mb"] = model_mb(mode_segmentation) + model_mb(mode_inference.model)
+    return result
+
+
+def run(conversations: int, seconds: float):
+    torch.set_grad_enabled(False)
+    warnings.filterwarnings("ignore")
+    segmentation, inference, name = load_models()
+    corpus = make_corpus(conversations, seconds)
+    specifications = getattr(segmentation, "specifications", None)
+    windows = segmentation_windows(corpus, getattr(specifications, "duration", None) or 10.0)
+    chunks = turn_chunks(corpus)
+    speakers = [[speaker for _, _, speaker in c.turns] for c in corpus]
+    minutes = sum(c.duration for c in corpus) / 60
+
+    print(f"Models: {name}, torch threads: {torch.get_num_threads()}")
+    print(
+        f"Corpus: {conversations} synthetic conversations, {minutes:.0f} min, "
+        f"{sum(len(t) for t in chunks)} speaker turns"
+    )
+
+    results = {
+        precision: run_precision(precision, segmentation, inference, windows, chunks)
+        for precision in PRECISIONS
+    }
+
+    reference = results["fp32"]
+    centroids = [
+        speaker_centroids(embeddings, truth)
+        for embeddings, truth in zip(reference["embeddings"], speakers)
+    ]
+    reference_assignments = [
+        assign_speakers(embeddings, c) for embeddings, c in zip(reference["embeddings"], centroids)
+    ]
+
+    print(
+        f"{'mode':<6} {'seg ms/min':>10} {'emb ms/min':>10} {'speedup':>8} {'peak MB':>8} {'model MB':>9} "
+        f"{'seg agree':>9} {'cos mean':>9} {'cos min':>8} {'spk agree':>9} {'spk acc':>8}"
+    )
+    for precision, result in results.items():
+        frame_agreement = np.mean([
+            (frames == reference_frames).float().mean().item()
+            for frames, reference_frames in zip(result["frames"], reference["frames"])
+        ])
+        similarities = [
+            cosine(a, b)
+            for embeddings, reference_embeddings in zip(result["embeddings"], reference["embeddings"])
+            for a, b in zip(embeddings, reference_embeddings)
+        ]
+        assignments = [
+            assign_speakers(embeddings, c) for embeddings, c in zip(result["embeddings"], centroids)
+        ]
+        agreement = np.mean(np.concatenate([
+            a == r for a, r in zip(assignments, reference_assignments)
+        ]))
+        accuracy = np.mean(np.concatenate([
+            a == np.array(truth) for a, truth in zip(assignments, speakers)
+        ]))
+        total_s = result["segmentation_s"] + result["embedding_s"]
+        reference_s = reference["segmentation_s"] + reference["embedding_s"]
+        print(
+            f"{precision:<6} {result['segmentation_s'] * 1000 / minutes:>10.0f} "
+            f"{result['embedding_s'] * 1000 / minutes:>10.0f} {reference_s / total_s:>7.2f}x "
+            f"{result['peak_mb']:>8.1f} {result['mb']:>9.1f} {frame_agreement:>9.4f} {np.mean(similarities):>9.5f} "
+            f"{np.min(similarities):>8.5f} {agreement:>9.4f} {accuracy:>8.4f}"
+        )
+        if precision != "fp32" and set(result["applied"].values()) != {precision}:
+            print(f"       (not applied to every model: {result['applied']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--conversations", type=int, default=6)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    args = parser.parse_args()
+
+    run(args.conversations, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark: latency and accuracy of the diarization quality presets
+
+Diarizes the synthetic conversation corpus with each preset of
+app.services.presets and reports processing time per minute of audio and,
+with the real pipeline, the diarization error rate against the corpus's
+ground-truth turns.
+
+Uses the real pyannote/speaker-diarization-3.1 pipeline when
+HUGGINGFACE_TOKEN is set and pyannote.audio is installed. Otherwise the
+pipeline's inference work is replayed with synthetic models of similar size
+(segmentation of every sliding window, then one masked embedding per window
+and local speaker, as pyannote 3.1 does); that measures latency only, so no
+error rate is reported:
+
+    python -m benchmarks.bench_quality_presets [--conversations 4] [--seconds 60]
+"""
+
+import argparse
+import os
+import time
+import warnings
+from typing import Optional
+
+import torch
+
+from app.services.presets import PRESETS, QualityPreset, configure_pipeline
+from benchmarks.bench_batched_embedding import SyntheticXVector
+from benchmarks.bench_consolidated_memory import SyntheticSegmentation
+from benchmarks.synthetic_corpus import SAMPLE_RATE, Conversation, make_corpus
+
+# Window length and local speakers per window of the segmentation model
+WINDOW_SECONDS = 10.0
+LOCAL_SPEAKERS = 3
+SEGMENTATION_BATCH_SIZE = 32
+
+
+def load_pipeline():
+    token = os.getenv("HUGGINGFACE_TOKEN")
+    if not token:
+        return None
+    try:
+        from pyannote.audio import Pipeline
+    except ImportError:
+        return None
+    return Pipeline.from_pretrained("pyannote/speaker-diarization-3.1", use_auth_token=token)
+
+
+class SyntheticPipeline:
+    """Replays the inference work of pyannote 3.1 with synthetic models."""
+
+    def __init__(self):
+        self.segmentation = SyntheticSegmentation().eval()
+        self.embedding = SyntheticXVector().eval()
+
+    def __call__(self, conversation: Conversation, preset: QualityPreset):
+        size = int(WINDOW_SECONDS * SAMPLE_RATE)
+        step = int(preset.segmentation_step * size)
+        windows = conversation.waveform.unfold(-1, size, step).transpose(0, 1)
+
+        with torch.inference_mode():
+            for batch in windows.split(SEGMENTATION_BATCH_SIZE):
+                self.segmentation(batch)
+
+            # One masked embedding per (window, local speaker)
+            chunks = windows.repeat_interleave(LOCAL_SPEAKERS, dim=0)
+            masks = (torch.rand(len(chunks), size) > 0.5).float()
+            if preset.num_speakers is not None and preset.num_speakers < LOCAL_SPEAKERS:
+                keep = torch.arange(len(chunks)) % LOCAL_SPEAKERS < preset.num_speakers
+                chunks, masks = chunks[keep], masks[keep]
+            for batch, weights in zip(
+                chunks.split(preset.embedding_batch_size),
+                masks.split(preset.embedding_batch_size),
+            ):
+                self.embedding(batch, weights=weights)
+
+
+def reference_annotation(conversation: Conversation):
+    from pyannote.core import Annotation, Segment
+
+    annotation = Annotation()
+    for start, end, speaker in conversation.turns:
+        annotation[Segment(start, end)] = f"speaker{speaker}"
+    return annotation
+
+
+def run_preset(pipeline, synthetic: Optional[SyntheticPipeline], corpus, preset) -> dict:
+    der = None
+    start = time.perf_counter()
+    if synthetic is not None:
+        for conversation in corpus:
+            synthetic(conversation, preset)
+    else:
+        from pyannote.metrics.diarization import DiarizationErrorRate
+
+        metric = DiarizationErrorRate()
+        configure_pipeline(pipeline, preset)
+        for conversation in corpus:
+            hypothesis = pipeline(
+                {"waveform": conversation.waveform, "sample_rate": SAMPLE_RATE},
+                **preset.pipeline_kwargs(),
+            )
+            metric(reference_annotation(conversation), hypothesis)
+        der = abs(metric)
+    return {"seconds": time.perf_counter() - start, "der": der}
+
+
+def run(conversations: int, seconds: float):
+    warnings.filterwarnings("ignore")
+    torch.set_grad_enabled(False)
+    pipeline = load_pipeline()
+    synthetic = SyntheticPipeline() if pipeline is None else None
+    corpus = make_corpus(conversations, seconds)
+    minutes = sum(c.duration for c in corpus) / 60
+
+    name = "pyannote/speaker-diarization-3.1" if pipeline else "synthetic (latency only)"
+    print(f"Pipeline: {name}, torch threads: {torch.get_num_threads()}")
+    print(f"Corpus: {conversations} synthetic conversations, {minutes:.0f} min")
+
+    # Warm up
+    run_preset(pipeline, synthetic, corpus[:1], PRESETS["fast"])
+
+    results = {name: run_preset(pipeline, synthetic, corpus, p) for name, p in PRESETS.items()}
+    balanced = results["balanced"]["seconds"]
+
+    print(f"{'quality':<9} {'ms/min':>8} {'vs balanced':>12} {'DER':>7}")
+    for quality, result in results.items():
+        der = f"{result['der']:.3f}" if result["der"] is not None else "n/a"
+        print(
+            f"{quality:<9} {result['seconds'] * 1000 / minutes:>8.0f} "
+            f"{result['seconds'] / balanced:>11.2f}x {der:>7}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--conversations", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    args = parser.parse_args()
+
+    run(args.conversations, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
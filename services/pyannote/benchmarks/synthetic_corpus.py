@@ -0,0 +1,94 @@
+"""
+Synthetic conversation corpus for benchmarks
+
+Deterministic two-speaker "salon conversations" generated from a seed, so the
+benchmarks need no recordings: each speaker is a voiced source with its own
+pitch, vibrato and formant resonances, and speakers alternate in turns of
+0.5-6 s separated by short pauses, with light background noise. Ground-truth
+turns come with every conversation.
+"""
+
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+import torch
+
+SAMPLE_RATE = 16000
+
+
+@dataclass
+class Voice:
+    pitch_hz: float
+    vibrato_hz: float
+    formants_hz: Tuple[float, float, float]
+
+
+@dataclass
+class Conversation:
+    waveform: torch.Tensor
+    turns: List[Tuple[float, float, int]]
+
+    @property
+    def duration(self) -> float:
+        return self.waveform.shape[-1] / SAMPLE_RATE
+
+
+def make_voice(rng: np.random.Generator) -> Voice:
+    return Voice(
+        pitch_hz=float(rng.uniform(95, 260)),
+        vibrato_hz=float(rng.uniform(3, 7)),
+        formants_hz=(
+            float(rng.uniform(300, 900)),
+            float(rng.uniform(900, 2400)),
+            float(rng.uniform(2400, 3400)),
+        ),
+    )
+
+
+def speak(voice: Voice, seconds: float, rng: np.random.Generator) -> np.ndarray:
+    """Voiced speech-like signal: harmonics shaped by formants, syllable envelope."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = voice.pitch_hz * (1 + 0.03 * np.sin(2 * np.pi * voice.vibrato_hz * t))
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+
+    signal = np.zeros_like(t)
+    for harmonic in range(1, 30):
+        frequency = harmonic * voice.pitch_hz
+        if frequency > SAMPLE_RATE / 2:
+            break
+        gain = sum(np.exp(-(((frequency - f) / 120.0) ** 2)) for f in voice.formants_hz)
+        signal += (gain + 0.05) / harmonic * np.sin(harmonic * phase)
+
+    syllables = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3, 5) * t + rng.uniform(0, np.pi)))
+    signal *= syllables
+    return 0.3 * signal / (np.abs(signal).max() + 1e-8)
+
+
+def make_conversation(seconds: float, seed: int) -> Conversation:
+    rng = np.random.default_rng(seed)
+    voices = [make_voice(rng), make_voice(rng)]
+    audio = [np.zeros(int(rng.uniform(0.2, 1.0) * SAMPLE_RATE))]
+    turns = []
+    position = len(audio[0]) / SAMPLE_RATE
+    speaker = 0
+
+    while position < seconds:
+        length = min(float(rng.uniform(0.5, 6.0)), seconds - position)
+        if length < 0.3:
+            break
+        audio.append(speak(voices[speaker], length, rng))
+        turns.append((position, position + length, speaker))
+        pause = float(rng.uniform(0.1, 0.6))
+        audio.append(np.zeros(int(pause * SAMPLE_RATE)))
+        position += length + pause
+        speaker = 1 - speaker
+
+    waveform = np.concatenate(audio)
+    waveform = waveform + 0.005 * rng.standard_normal(len(waveform))
+    return Conversation(torch.from_numpy(waveform.astype(np.float32))[None], turns)
+
+
+def make_corpus(conversations: int = 6, seconds: float = 60.0, seed: int = 0) -> List[Conversation]:
+    """The benchmark corpus: ``conversations`` conversations of ``seconds`` each."""
+    return [make_conversation(seconds, seed + index) for index in range(conversations)]
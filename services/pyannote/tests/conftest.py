@@ -4,6 +4,14 @@ Pytest configuration and fixtures
 import pytest
 import sys
 import os
+import io
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import soundfile as sf
+import torch
+import torch.nn.functional as F
+from fastapi.testclient import TestClient
 
 # Add app directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -14,3 +22,188 @@ def event_loop_policy():
     """Configure asyncio event loop for tests."""
     import asyncio
     return asyncio.DefaultEventLoopPolicy()
+
+
+class FakeTurn:
+    """Minimal stand-in for pyannote.core.Segment."""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+
+class FakeAnnotation:
+    """Minimal stand-in for pyannote.core.Annotation."""
+
+    def __init__(self, tracks):
+        self.tracks = tracks
+
+    def itertracks(self, yield_label=False):
+        for index, (start, end, speaker) in enumerate(self.tracks):
+            yield FakeTurn(start, end), index, speaker
+
+    def labels(self):
+        return sorted({speaker for _, _, speaker in self.tracks})
+
+
+class FakePipeline:
+    """Diarization pipeline returning fixed speaker turns."""
+
+    def __init__(self, tracks, dimension=256):
+        self.tracks = tracks
+        self.dimension = dimension
+        self.calls = []
+
+    def __call__(self, file, **kwargs):
+        self.calls.append((file, kwargs))
+        annotation = FakeAnnotation(self.tracks)
+        if not kwargs.get("return_embeddings"):
+            return annotation
+
+        import numpy as np
+
+        # Centroid i is filled with i + 1, like one cluster per label
+        centroids = np.stack([
+            np.full(self.dimension, index + 1, dtype=np.float32)
+            for index, _ in enumerate(annotation.labels())
+        ])
+        return annotation, centroids
+
+
+class FakeEmbeddingInference:
+    """Embedding model whose output depends on the chunk content."""
+
+    def __init__(self, dimension=512):
+        self.dimension = dimension
+        self.batches = []
+
+    def infer(self, chunks):
+        import numpy as np
+
+        self.batches.append(tuple(chunks.shape))
+        means = chunks.mean(dim=(1, 2)).numpy()
+        return np.stack([np.full(self.dimension, m, dtype=np.float32) for m in means])
+
+
+class ToyEmbeddingModel(torch.nn.Module):
+    """Frame encoder with (optionally weighted) statistics pooling, like pyannote's xvector."""
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.frames = torch.nn.Conv1d(1, 8, kernel_size=160, stride=160)
+        self.embedding = torch.nn.Linear(16, 4)
+
+    def forward(self, waveforms, weights=None):
+        frames = torch.tanh(self.frames(waveforms))
+        if weights is None:
+            weights = torch.ones(frames.shape[0], frames.shape[-1])
+        else:
+            weights = F.interpolate(weights[:, None], size=frames.shape[-1], mode="nearest")[:, 0]
+        w = weights[:, None]
+        v1 = w.sum(dim=2) + 1e-8
+        mean = (frames * w).sum(dim=2) / v1
+        var = ((frames - mean[..., None]) ** 2 * w).sum(dim=2) / (v1 - (w**2).sum(dim=2) / v1 + 1e-8)
+        return self.embedding(torch.cat([mean, var.sqrt()], dim=1))
+
+
+class ToyInference:
+    """Stand-in for pyannote Inference counting forward passes."""
+
+    def __init__(self, model):
+        self.model = model
+        self.device = torch.device("cpu")
+        self.passes = 0
+
+    def infer(self, chunks):
+        self.passes += 1
+        with torch.inference_mode():
+            return self.model(chunks).numpy()
+
+
+class ToySegmentationModel(torch.nn.Module):
+    """Frame encoder, LSTM and classifier, shaped like pyannote's PyanNet."""
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(1)
+        self.frames = torch.nn.Conv1d(1, 8, kernel_size=270, stride=270)
+        self.lstm = torch.nn.LSTM(8, 8, batch_first=True, bidirectional=True)
+        self.classifier = torch.nn.Linear(16, 7)
+
+    def forward(self, waveforms):
+        frames = torch.tanh(self.frames(waveforms)).transpose(1, 2)
+        outputs, _ = self.lstm(frames)
+        return torch.log_softmax(self.classifier(outputs), dim=-1)
+
+
+def wav_bytes(seconds=1.0, sample_rate=16000, channels=1):
+    """Silent float WAV audio."""
+    buffer = io.BytesIO()
+    samples = np.zeros((int(seconds * sample_rate), channels), dtype=np.float32)
+    sf.write(buffer, samples, sample_rate, format="WAV", subtype="FLOAT")
+    return buffer.getvalue()
+
+
+def post_diarize(client, **data):
+    """POST one second of audio to /api/v1/diarize for chunk 0 of session s1."""
+    return client.post(
+        "/api/v1/diarize",
+        files={"file": ("chunk.wav", wav_bytes(), "audio/wav")},
+        data={"session_id": "s1", "chunk_index": "0", **data},
+    )
+
+
+@pytest.fixture
+def service():
+    """Mocked PyannoteService without a result cache or scheduler."""
+    service = AsyncMock()
+    service.result_cache = None
+    service.scheduler = None
+    return service
+
+
+@pytest.fixture
+def client(service):
+    """Test client for the app serving the mocked service."""
+    with patch("app.main.pyannote_service", service):
+        from app.main import app
+        yield TestClient(app)
+
+
+@pytest.fixture
+def speaker_tracks():
+    """Speaker turns over 10 seconds of audio."""
+    return [
+        (0.0, 3.0, "SPEAKER_00"),
+        (3.0, 4.0, "SPEAKER_01"),
+        (4.0, 4.2, "SPEAKER_01"),
+        (4.2, 8.0, "SPEAKER_00"),
+        (8.0, 10.0, "SPEAKER_01"),
+    ]
+
+
+@pytest.fixture
+def ready_service(speaker_tracks):
+    """PyannoteService with a single fake inference replica (no VAD pre-filter)."""
+    from app.config import get_settings
+    from app.services.inference_pool import InferencePool, InferenceReplica
+    from app.services.pyannote_service import PyannoteService
+
+    service = PyannoteService(get_settings().model_copy(update={"vad_enabled": False}))
+    service.pipeline = FakePipeline(speaker_tracks)
+    service.embedding_inference = FakeEmbeddingInference()
+    service.pool = InferencePool(
+        [InferenceReplica(0, service.pipeline, service.embedding_inference)]
+    )
+    service.is_ready = True
+    yield service
+    service.pool.shutdown()
+
+
+@pytest.fixture
+def waveform_input():
+    """Ten seconds of 16 kHz mono audio as a waveform mapping."""
+    import torch
+
+    return {"waveform": torch.linspace(-1.0, 1.0, 160000)[None], "sample_rate": 16000}
@@ -0,0 +1,119 @@
+"""
+Tests for in-memory audio loading
+"""
+import os
+
+import pytest
+
+from app.services.audio import DecodedAudio, UploadedAudio, decode_audio_bytes
+from tests.conftest import wav_bytes
+
+
+@pytest.fixture
+def stereo_wav():
+    """One second of 16 kHz stereo WAV audio."""
+    return wav_bytes(channels=2)
+
+
+class TestDecodeAudio:
+    """Tests for decode_audio_bytes."""
+
+    def test_decode_returns_channel_first_waveform(self, stereo_wav):
+        """Test that decoded audio is a (channel, time) float32 tensor."""
+        decoded = decode_audio_bytes(stereo_wav)
+
+        assert decoded["sample_rate"] == 16000
+        assert tuple(decoded["waveform"].shape) == (2, 16000)
+        assert str(decoded["waveform"].dtype) == "torch.float32"
+
+
+class TestUploadedAudio:
+    """Tests for UploadedAudio class."""
+
+    def test_small_upload_stays_in_memory(self, stereo_wav):
+        """Test that small uploads are not written to disk."""
+        uploaded = UploadedAudio.from_bytes(stereo_wav, "chunk.wav", spill_threshold_bytes=1 << 20)
+
+        assert uploaded.in_memory
+        assert "waveform" in uploaded.audio
+        uploaded.close()
+
+    def test_large_upload_spills_to_disk(self, stereo_wav):
+        """Test that uploads above the threshold are spilled to a temp file."""
+        uploaded = UploadedAudio.from_bytes(stereo_wav, "chunk.wav", spill_threshold_bytes=10)
+
+        assert not uploaded.in_memory
+        assert uploaded.audio.endswith(".wav")
+        assert os.path.exists(uploaded.audio)
+
+        uploaded.close()
+        assert not os.path.exists(uploaded.spill_path)
+
+    def test_undecodable_upload_spills_to_disk(self):
+        """Test that formats soundfile cannot decode fall back to a temp file."""
+        uploaded = UploadedAudio.from_bytes(b"\x00" * 64, "chunk.m4a", spill_threshold_bytes=1 << 20)
+
+        assert not uploaded.in_memory
+        assert uploaded.audio.endswith(".m4a")
+        uploaded.close()
+
+
+class TestDecodedAudio:
+    """Tests for DecodedAudio class."""
+
+    def test_load_downmixes_and_resamples(self):
+        """Test that audio is converted to 16 kHz mono once."""
+        import torch
+
+        decoded = DecodedAudio.load({"waveform": torch.zeros(2, 8000), "sample_rate": 8000})
+
+        assert decoded.sample_rate == 16000
+        assert tuple(decoded.waveform.shape) == (1, 16000)
+        assert decoded.duration == pytest.approx(1.0)
+
+    def test_load_is_idempotent(self, waveform_input):
+        """Test that loading decoded audio returns the same object."""
+        decoded = DecodedAudio.load(waveform_input)
+
+        assert DecodedAudio.load(decoded) is decoded
+
+    def test_crop_is_zero_copy(self, waveform_input):
+        """Test that crops are views into the shared waveform."""
+        decoded = DecodedAudio.load(waveform_input)
+
+        chunk = decoded.crop(1.0, 2.5)
+
+        assert tuple(chunk.shape) == (1, 24000)
+        assert chunk.data_ptr() == decoded.waveform[:, 16000:].data_ptr()
+
+    def test_pipeline_input_shares_waveform(self, waveform_input):
+        """Test that the pipeline mapping reuses the decoded tensor."""
+        decoded = DecodedAudio.load(waveform_input)
+
+        mapping = decoded.as_pipeline_input()
+
+        assert mapping["waveform"] is decoded.waveform
+        assert mapping["sample_rate"] == 16000
+
+
+class TestServiceSharedDecode:
+    """Tests that PyannoteService stages share one decoded waveform."""
+
+    @pytest.mark.asyncio
+    async def test_diarize_with_embeddings_slices_decoded_audio(self, ready_service, waveform_input):
+        """Test that segmentation and crops use the same in-memory audio."""
+        result = await ready_service.diarize_with_embeddings(waveform_input)
+
+        pipeline_input = ready_service.pipeline.calls[0][0]
+        assert pipeline_input["waveform"].data_ptr() == waveform_input["waveform"].data_ptr()
+        assert {emb["label"] for emb in result["speaker_embeddings"]} == {"SPEAKER_00", "SPEAKER_01"}
+        # The 0.2s turn is too short to embed
+        assert len(ready_service.embedding_inference.batches) == 4
+
+    @pytest.mark.asyncio
+    async def test_extract_embedding_reports_duration(self, ready_service, waveform_input):
+        """Test that duration comes from the decoded audio."""
+        result = await ready_service.extract_embedding(waveform_input, "customer")
+
+        assert result["duration_seconds"] == pytest.approx(10.0)
+        assert len(result["embedding"]) == 512
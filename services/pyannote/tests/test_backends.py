@@ -0,0 +1,245 @@
+"""
+Tests for the inference backends
+"""
+import importlib.util
+
+import pytest
+import torch
+
+from app.services.backends import (
+    apply_backend,
+    check_parity,
+    embedding_spec,
+    model_fingerprint,
+)
+from app.services.embedding_batch import embed_chunks
+from tests.conftest import ToyEmbeddingModel, ToyInference, ToySegmentationModel
+
+
+class DurationDependentModel(torch.nn.Module):
+    """Embedding model whose output depends on a Python branch on the duration."""
+
+    def __init__(self):
+        super().__init__()
+        self.linear = torch.nn.Linear(1, 4)
+
+    def forward(self, waveforms):
+        embedding = self.linear(waveforms.mean(dim=-1))
+        # Tracing records only the branch taken for the example input
+        if waveforms.shape[-1] > 2 * 16000:
+            return embedding * 2
+        return embedding
+
+
+class FrameMaskModel(torch.nn.Module):
+    """Embedding model that decimates sample-level weights and resamples frame masks."""
+
+    def __init__(self):
+        super().__init__()
+        self.frames = torch.nn.Conv1d(1, 4, kernel_size=160, stride=160)
+
+    def forward(self, waveforms, weights=None):
+        frames = self.frames(waveforms)
+        if weights is None:
+            return frames.mean(dim=-1)
+        # Tracing records only the branch taken for the example weights
+        if weights.shape[-1] == waveforms.shape[-1]:
+            weights = weights[:, ::160]
+        else:
+            weights = torch.nn.functional.interpolate(
+                weights[:, None], size=frames.shape[-1], mode="nearest"
+            )[:, 0]
+        return (frames * weights[:, None]).sum(dim=-1) / (weights.sum(dim=-1, keepdim=True) + 1e-8)
+
+
+def eager_outputs(model, *inputs):
+    with torch.inference_mode():
+        return model(*inputs)
+
+
+requires_onnxruntime = pytest.mark.skipif(
+    importlib.util.find_spec("onnxruntime") is None, reason="onnxruntime not installed"
+)
+
+
+@pytest.mark.parametrize(
+    "backend", ["torchscript", pytest.param("onnx", marks=requires_onnxruntime)]
+)
+class TestBackendParity:
+    """Exported backends must reproduce eager outputs."""
+
+    def test_segmentation_parity(self, backend, tmp_path):
+        """Test segmentation outputs for several batch sizes."""
+        eager = ToySegmentationModel().eval()
+        exported = ToySegmentationModel().eval()
+        torch.manual_seed(2)
+        batches = [torch.randn(n, 1, 160000) * 0.1 for n in (1, 3)]
+        expected = [eager_outputs(eager, batch) for batch in batches]
+
+        applied = apply_backend(backend, {"segmentation": [exported]}, str(tmp_path))
+
+        assert applied == {"segmentation": backend}
+        for batch, reference in zip(batches, expected):
+            torch.testing.assert_close(
+                eager_outputs(exported, batch), reference, rtol=1e-4, atol=1e-5
+            )
+
+    def test_embedding_parity(self, backend, tmp_path):
+        """Test weighted and unweighted embeddings across durations."""
+        eager = ToyEmbeddingModel().eval()
+        exported = ToyEmbeddingModel().eval()
+        torch.manual_seed(3)
+        waveforms = torch.randn(2, 1, 24000) * 0.1
+        weights = torch.ones(2, 24000)
+        weights[1, 12000:] = 0.0
+
+        apply_backend(backend, {"embedding": [exported]}, str(tmp_path))
+
+        torch.testing.assert_close(
+            eager_outputs(exported, waveforms, weights),
+            eager_outputs(eager, waveforms, weights),
+            rtol=1e-4, atol=1e-5,
+        )
+        torch.testing.assert_close(
+            eager_outputs(exported, waveforms), eager_outputs(eager, waveforms),
+            rtol=1e-4, atol=1e-5,
+        )
+
+    def test_embed_chunks_parity(self, backend, tmp_path):
+        """Test that bucketed, padded batches embed the same on the exported model."""
+        torch.manual_seed(4)
+        chunks = [torch.randn(1, n) * 0.1 for n in (16000, 17000, 32000, 8000)]
+        eager = embed_chunks(ToyInference(ToyEmbeddingModel().eval()), chunks, max_batch_size=4)
+
+        inference = ToyInference(ToyEmbeddingModel().eval())
+        apply_backend(backend, {"embedding": [inference.model]}, str(tmp_path))
+        exported = embed_chunks(inference, chunks, max_batch_size=4)
+
+        for actual, reference in zip(exported, eager):
+            torch.testing.assert_close(
+                torch.from_numpy(actual), torch.from_numpy(reference), rtol=1e-4, atol=1e-5
+            )
+
+    def test_replicas_share_runner(self, backend, tmp_path):
+        """Test that every replica's copy runs the exported model."""
+        copies = [ToySegmentationModel().eval() for _ in range(3)]
+
+        apply_backend(backend, {"segmentation": copies}, str(tmp_path))
+
+        batch = torch.randn(1, 1, 160000) * 0.1
+        outputs = [eager_outputs(model, batch) for model in copies]
+        assert all(torch.equal(output, outputs[0]) for output in outputs)
+        assert all("forward" in vars(model) for model in copies)
+        assert len(list(tmp_path.iterdir())) == 1
+
+
+class TestApplyBackend:
+    """Tests for backend selection and fallback."""
+
+    def test_torch_leaves_models_unchanged(self):
+        """Test that the torch backend keeps the eager forward."""
+        model = ToySegmentationModel()
+
+        applied = apply_backend("torch", {"segmentation": [model], "embedding": []})
+
+        assert applied == {"segmentation": "torch"}
+        assert "forward" not in vars(model)
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend is rejected."""
+        with pytest.raises(ValueError):
+            apply_backend("tensorrt", {"segmentation": [ToySegmentationModel()]})
+
+    def test_export_failure_keeps_eager(self, tmp_path, monkeypatch):
+        """Test that a model that fails to export stays in eager mode."""
+        def fail(*args, **kwargs):
+            raise RuntimeError("export failed")
+
+        monkeypatch.setattr(torch.jit, "trace", fail)
+        model = ToySegmentationModel()
+
+        applied = apply_backend("torchscript", {"segmentation": [model]}, str(tmp_path))
+
+        assert applied == {"segmentation": "torch"}
+        assert "forward" not in vars(model)
+
+    def test_export_cache_reused(self, tmp_path):
+        """Test that a second start loads the cached export instead of tracing."""
+        apply_backend("torchscript", {"segmentation": [ToySegmentationModel()]}, str(tmp_path))
+        (exported,) = tmp_path.iterdir()
+        assert model_fingerprint(ToySegmentationModel()) in exported.name
+        mtime = exported.stat().st_mtime_ns
+
+        apply_backend("torchscript", {"segmentation": [ToySegmentationModel()]}, str(tmp_path))
+
+        assert exported.stat().st_mtime_ns == mtime
+
+    def test_frame_mask_failure_keeps_eager(self, tmp_path):
+        """Test that an export that breaks on clustering's frame-level masks stays eager."""
+        model = FrameMaskModel().eval()
+
+        applied = apply_backend("torchscript", {"embedding": [model]}, str(tmp_path))
+
+        assert applied == {"embedding": "torch"}
+        assert "forward" not in vars(model)
+
+    def test_parity_failure_keeps_eager(self, tmp_path):
+        """Test that an export that breaks at other durations stays in eager mode."""
+        model = DurationDependentModel().eval()
+
+        applied = apply_backend("torchscript", {"embedding": [model]}, str(tmp_path))
+
+        assert applied == {"embedding": "torch"}
+        assert "forward" not in vars(model)
+
+
+class TestCheckParity:
+    """Tests for check_parity."""
+
+    def test_matching_runner_passes(self):
+        """Test that the eager model passes against itself."""
+        model = ToyEmbeddingModel().eval()
+
+        check_parity(model, model, embedding_spec(model))
+
+    def test_mismatch_raises(self):
+        """Test that a runner drifting beyond the tolerance is rejected."""
+        model = ToyEmbeddingModel().eval()
+
+        def runner(*inputs):
+            return model(*inputs) + 0.01
+
+        with pytest.raises(RuntimeError, match="differ"):
+            check_parity(model, runner, embedding_spec(model))
+
+    def test_embedding_checks_other_durations(self):
+        """Test that embedding models are checked away from the traced duration."""
+        spec = embedding_spec(ToyEmbeddingModel())
+        traced = spec.example_inputs[0].shape[-1]
+
+        assert {inputs[0].shape[-1] for inputs in spec.check_inputs} - {traced}
+        assert all(len(inputs) == 2 for inputs in spec.check_inputs)
+        # Frame-level masks as well as sample-level weights
+        assert any(
+            inputs[1].shape[-1] != inputs[0].shape[-1] for inputs in spec.check_inputs
+        )
+        assert spec.dynamic_axes["weights"][1] != spec.dynamic_axes["waveforms"][2]
+
+
+class TestModelId:
+    """Tests for the backend part of the service's model id."""
+
+    def test_reports_installed_backends(self, ready_service):
+        """Test that a model that fell back to eager is not reported as exported."""
+        ready_service.settings = ready_service.settings.model_copy(
+            update={"inference_backend": "onnx"}
+        )
+        ready_service.backends = {"segmentation": "torch", "embedding": "torch"}
+        fallback = ready_service.model_id
+
+        ready_service.backends = {"segmentation": "onnx", "embedding": "torch"}
+        mixed = ready_service.model_id
+
+        assert "onnx" not in fallback
+        assert "segmentation=onnx" in mixed
+        assert "embedding" not in mixed.split("@")[1]
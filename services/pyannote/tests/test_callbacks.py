@@ -0,0 +1,202 @@
+"""
+Tests for callback delivery
+"""
+import asyncio
+import sqlite3
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.metrics import metrics
+from app.services.callbacks import CallbackOutbox, validate_callback_url
+
+
+class FakeTransport(httpx.AsyncBaseTransport):
+    """Transport answering with queued status codes and recording requests."""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.requests = []
+        self.delivered = asyncio.Event()
+
+    async def handle_async_request(self, request):
+        self.requests.append(request)
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status == 200:
+            self.delivered.set()
+        return httpx.Response(status)
+
+
+def make_outbox(tmp_path, statuses, **kwargs):
+    transport = FakeTransport(statuses)
+    client = httpx.AsyncClient(transport=transport)
+    kwargs.setdefault("retry_base_seconds", 0.001)
+    outbox = CallbackOutbox(str(tmp_path / "outbox.sqlite3"), client, **kwargs)
+    return outbox, transport
+
+
+@pytest_asyncio.fixture
+async def outbox_factory(tmp_path):
+    created = []
+
+    def factory(statuses=(), **kwargs):
+        outbox, transport = make_outbox(tmp_path, statuses, **kwargs)
+        created.append(outbox)
+        return outbox, transport
+
+    yield factory
+    for outbox in created:
+        await outbox.close()
+        await outbox.client.aclose()
+
+
+async def wait_until(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.005)
+
+
+class TestCallbackOutbox:
+    """Tests for CallbackOutbox class."""
+
+    @pytest.mark.asyncio
+    async def test_delivers_callback(self, outbox_factory):
+        """Test that an enqueued callback is posted and removed."""
+        metrics.reset()
+        outbox, transport = outbox_factory()
+        outbox.start()
+
+        await outbox.enqueue("http://callback/", {"session_id": "s1", "success": True})
+        await wait_until(lambda: metrics.summary("callback_delivery_lag_seconds").count == 1)
+
+        assert outbox.pending() == 0
+        assert transport.requests[0].url == "http://callback/"
+
+    @pytest.mark.asyncio
+    async def test_retries_server_errors(self, outbox_factory):
+        """Test that 5xx responses and 429 are retried until delivered."""
+        outbox, transport = outbox_factory(statuses=[503, 429, 200])
+        outbox.start()
+
+        await outbox.enqueue("http://callback/", {"session_id": "s1"})
+        await asyncio.wait_for(transport.delivered.wait(), 2.0)
+
+        assert len(transport.requests) == 3
+
+    @pytest.mark.asyncio
+    async def test_client_error_dropped(self, outbox_factory):
+        """Test that a 4xx response is not retried."""
+        outbox, transport = outbox_factory(statuses=[400])
+        outbox.start()
+
+        await outbox.enqueue("http://callback/", {"session_id": "s1"})
+        await wait_until(lambda: outbox.pending() == 0)
+
+        assert len(transport.requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self, outbox_factory):
+        """Test that delivery stops after max_attempts failures."""
+        outbox, transport = outbox_factory(statuses=[500] * 10, max_attempts=3)
+        outbox.start()
+
+        await outbox.enqueue("http://callback/", {"session_id": "s1"})
+        await wait_until(lambda: outbox.pending() == 0)
+
+        assert len(transport.requests) == 3
+
+    @pytest.mark.asyncio
+    async def test_pending_callbacks_survive_restart(self, tmp_path):
+        """Test that callbacks queued before a restart are delivered after it."""
+        outbox, _ = make_outbox(tmp_path, [])
+        await outbox.enqueue("http://callback/", {"session_id": "s1"})
+        await outbox.close()
+        await outbox.client.aclose()
+
+        restarted, transport = make_outbox(tmp_path, [])
+        restarted.start()
+        try:
+            await asyncio.wait_for(transport.delivered.wait(), 2.0)
+            await wait_until(lambda: restarted.pending() == 0)
+        finally:
+            await restarted.close()
+            await restarted.client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_malformed_url_dead_lettered(self, outbox_factory):
+        """Test that an undeliverable URL is dead-lettered and delivery goes on."""
+        outbox, transport = outbox_factory()
+        outbox.start()
+
+        await outbox.enqueue("http://[::1/", {"session_id": "bad"})
+        await outbox.enqueue("http://callback/", {"session_id": "good"})
+        await asyncio.wait_for(transport.delivered.wait(), 2.0)
+        await wait_until(lambda: outbox.pending() == 0)
+
+        assert outbox.dead_letters() == 1
+        assert not outbox._task.done()
+
+    @pytest.mark.asyncio
+    async def test_loop_survives_unexpected_errors(self, outbox_factory, monkeypatch):
+        """Test that an error in the delivery loop does not stop delivery."""
+        monkeypatch.setattr("app.services.callbacks.LOOP_ERROR_BACKOFF_SECONDS", 0.01)
+        outbox, transport = outbox_factory()
+        due = outbox._due
+        failures = [sqlite3.OperationalError("database is locked")]
+
+        def flaky_due(now):
+            if failures:
+                raise failures.pop()
+            return due(now)
+
+        outbox._due = flaky_due
+        outbox.start()
+        await outbox.enqueue("http://callback/", {"session_id": "s1"})
+
+        await asyncio.wait_for(transport.delivered.wait(), 2.0)
+        assert failures == []
+
+    def test_backoff_grows_and_is_capped(self, tmp_path):
+        """Test the exponential backoff schedule."""
+        outbox, _ = make_outbox(tmp_path, [], retry_base_seconds=1.0, retry_max_seconds=10.0)
+
+        assert 0.5 <= outbox.backoff(1) <= 1.0
+        assert 4.0 <= outbox.backoff(4) <= 8.0
+        assert 5.0 <= outbox.backoff(20) <= 10.0
+
+
+class TestCallbackUrlValidation:
+    """Tests for callback_url validation."""
+
+    @pytest.mark.parametrize("url", ["http://[::1/", "http://host:99999/", "ftp://host/", "/cb"])
+    def test_rejected(self, url):
+        """Test that malformed and non-http(s) URLs are rejected."""
+        with pytest.raises(ValueError):
+            validate_callback_url(url)
+
+    def test_accepted(self):
+        """Test that an absolute https URL is accepted."""
+        url = "https://example.supabase.co/functions/v1/diarization-callback"
+        assert validate_callback_url(url) == url
+
+    def test_routes_reject_malformed_url(self):
+        """Test that /diarize and /jobs answer 400 for a malformed callback_url."""
+        from fastapi.testclient import TestClient
+
+        from app.main import app
+
+        client = TestClient(app)
+        diarize = client.post(
+            "/api/v1/diarize",
+            files={"file": ("chunk.wav", b"RIFF", "audio/wav")},
+            data={"session_id": "s1", "chunk_index": "0", "callback_url": "http://[::1/"},
+        )
+        jobs = client.post(
+            "/api/v1/jobs",
+            json={"audio_url": "https://example.com/a.wav", "callback_url": "http://[::1/"},
+        )
+
+        assert diarize.status_code == 400
+        assert jobs.status_code == 400
@@ -0,0 +1,247 @@
+"""
+Tests for load-adaptive quality degradation
+"""
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.metrics import metrics
+from app.services.degradation import DegradationController
+from app.services.result_cache import ResultCache
+from tests.conftest import post_diarize
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def controller(clock):
+    return DegradationController(
+        queue_wait_slo_seconds=5.0,
+        latency_slo_seconds=20.0,
+        min_dwell_seconds=10.0,
+        max_level=2,
+        smoothing=1.0,
+        clock=clock,
+    )
+
+
+def degrade(controller, clock, level):
+    """Raise the controller to ``level`` with queue waits over the SLO."""
+    for _ in range(level):
+        controller.observe_wait(8.0)
+        clock.now += controller.min_dwell_seconds
+    clock.now -= controller.min_dwell_seconds
+
+
+class TestDegradationController:
+    """Tests for raising and restoring the degradation level."""
+
+    @pytest.fixture(autouse=True)
+    def reset_metrics(self):
+        metrics.reset()
+        yield
+        metrics.reset()
+
+    def test_raised_on_breach_with_dwell(self, controller, clock):
+        """Test that a breach raises one level per dwell period up to the maximum."""
+        controller.observe_wait(8.0)
+        assert controller.level == 1
+
+        clock.now = 5.0
+        controller.observe_wait(8.0)
+        assert controller.level == 1
+
+        clock.now = 15.0
+        controller.observe_inference(30.0)
+        assert controller.level == 2
+
+        clock.now = 30.0
+        controller.observe_wait(8.0)
+        assert controller.level == 2
+        assert metrics.gauge("degradation_level").value == 2
+        assert metrics.counter("degradation_changes", direction="raised").value == 2
+
+    def test_restored_with_hysteresis(self, controller, clock):
+        """Test that the level only drops once both signals are below the recover ratio."""
+        controller.observe_wait(8.0)
+        assert controller.level == 1
+
+        # Below the SLO but above half of it: hold
+        clock.now = 20.0
+        controller.observe_wait(4.0)
+        assert controller.level == 1
+
+        clock.now = 40.0
+        controller.observe_wait(1.0)
+        controller.observe_inference(2.0)
+        assert controller.level == 0
+        assert metrics.counter("degradation_changes", direction="lowered").value == 1
+
+    def test_restored_after_idle_period(self, controller, clock):
+        """Test that the level falls back during an idle period without new samples."""
+        controller.half_life_seconds = 5.0
+        degrade(controller, clock, 2)
+        assert controller.level == 2
+
+        # No samples for a minute: the averages decay and the level is
+        # re-evaluated when the next request reads it
+        clock.now += 60.0
+        assert controller.resolve("accurate") == ("accurate", 0)
+        assert controller.queue_wait < 0.1
+
+    def test_level_held_within_dwell_when_read(self, controller, clock):
+        """Test that reading the level does not lower it before the dwell period ends."""
+        controller.half_life_seconds = 1.0
+        controller.observe_wait(8.0)
+
+        clock.now = 5.0
+        assert controller.resolve("balanced") == ("fast", 1)
+
+    def test_resolve_single_evaluation(self, controller, clock):
+        """Test that the quality and level come from the same evaluation."""
+        controller.half_life_seconds = 1.0
+        degrade(controller, clock, 1)
+
+        # The level drops during this read; quality and level agree on it
+        clock.now += 60.0
+        assert controller.resolve("accurate") == ("accurate", 0)
+
+        degrade(controller, clock, 1)
+        assert controller.resolve("accurate") == ("balanced", 1)
+        assert controller.resolve("accurate", priority="finalization") == ("accurate", 0)
+
+    def test_quality_shifted_for_realtime_only(self, controller, clock):
+        """Test that realtime requests run presets lower and others are untouched."""
+        assert controller.resolve("accurate") == ("accurate", 0)
+
+        degrade(controller, clock, 1)
+        assert controller.resolve("accurate") == ("balanced", 1)
+        assert controller.resolve("fast") == ("fast", 1)
+        assert controller.resolve("accurate", priority="backfill") == ("accurate", 0)
+        assert controller.resolve("balanced", priority="finalization") == ("balanced", 0)
+
+        clock.now += 10.0
+        degrade(controller, clock, 1)
+        assert controller.resolve("balanced") == ("fast", 2)
+        assert controller.resolve("accurate", priority="realtime") == ("fast", 2)
+
+
+class TestServiceDegradation:
+    """Tests for degradation in PyannoteService."""
+
+    @pytest.mark.asyncio
+    async def test_degraded_preset_reported(
+        self, ready_service, waveform_input, controller, clock
+    ):
+        """Test that a degraded realtime request runs lighter settings and reports the level."""
+        ready_service.degradation = controller
+        ready_service.pipeline.embedding_batch_size = 32
+        degrade(controller, clock, 1)
+
+        realtime = await ready_service.diarize(waveform_input)
+        realtime_batch_size = ready_service.pipeline.embedding_batch_size
+        backfill = await ready_service.diarize(waveform_input, priority="backfill")
+
+        assert realtime["quality"] == "balanced"
+        assert realtime["degradation_level"] == 1
+        assert realtime_batch_size == 64
+        assert backfill["degradation_level"] == 0
+        assert ready_service.pipeline.embedding_batch_size == 32
+
+    @pytest.mark.asyncio
+    async def test_speaker_count_not_degraded(
+        self, ready_service, waveform_input, controller, clock
+    ):
+        """Test that degrading to fast settings does not fix the number of speakers."""
+        ready_service.degradation = controller
+        degrade(controller, clock, 2)
+
+        result = await ready_service.diarize_with_embeddings(waveform_input, quality="accurate")
+
+        assert result["degradation_level"] == 2
+        assert "num_speakers" not in ready_service.pipeline.calls[-1][1]
+        assert result["speaker_embeddings"]
+
+    @pytest.mark.asyncio
+    async def test_inference_time_observed(self, ready_service, waveform_input, controller):
+        """Test that pipeline runs feed the controller's inference latency."""
+        ready_service.degradation = controller
+        controller.smoothing = 0.5
+        controller.inference = 1.0
+
+        await ready_service.diarize(waveform_input)
+
+        assert controller.inference < 1.0
+
+
+class TestDegradedResponses:
+    """Tests for the degradation level on /diarize."""
+
+    @pytest.fixture
+    def service(self, service):
+        service.result_cache = ResultCache()
+        service.diarize = AsyncMock(
+            return_value={
+                "segments": [],
+                "processing_time_ms": 5,
+                "quality": "fast",
+                "degradation_level": 1,
+            }
+        )
+        return service
+
+    def test_level_reported_and_not_cached(self, client, service):
+        """Test that the level is in the response and degraded results are not cached."""
+        first = post_diarize(client)
+        second = post_diarize(client)
+
+        assert first.status_code == second.status_code == 200
+        assert first.json()["degradation_level"] == 1
+        assert service.diarize.await_count == 2
+        assert len(service.result_cache) == 0
+
+    def test_full_quality_result_cached(self, client, service):
+        """Test that results at level 0 are still cached."""
+        service.diarize.return_value = {
+            "segments": [],
+            "processing_time_ms": 5,
+            "quality": "balanced",
+            "degradation_level": 0,
+        }
+
+        assert post_diarize(client).json()["degradation_level"] == 0
+        post_diarize(client)
+
+        assert service.diarize.await_count == 1
+
+    def test_requested_quality_not_degraded(self, client, service):
+        """Test that a request for an explicit quality does not run as realtime."""
+        post_diarize(client)
+        assert service.diarize.call_args.kwargs["priority"] == "realtime"
+
+        post_diarize(client, quality="accurate")
+        assert service.diarize.call_args.kwargs == {
+            "quality": "accurate",
+            "priority": "finalization",
+        }
+
+    def test_priority_field(self, client, service):
+        """Test that the priority form field overrides the default."""
+        post_diarize(client, quality="accurate", priority="realtime")
+        assert service.diarize.call_args.kwargs["priority"] == "realtime"
+
+        post_diarize(client, priority="backfill")
+        assert service.diarize.call_args.kwargs["priority"] == "backfill"
+
+        assert post_diarize(client, priority="urgent").status_code == 422
@@ -11,6 +11,8 @@ def mock_pyannote_service():
     """Create a mock pyannote service."""
     service = AsyncMock()
     service.is_ready = True
+    service.result_cache = None
+    service.scheduler = None
     service.diarize = AsyncMock(return_value={
         "segments": [
             {"speaker": "SPEAKER_00", "start": 0.0, "end": 5.5},
@@ -76,7 +78,7 @@ class TestDiarizationEndpoint:
         """Create test client with mocked service."""
         with patch("app.main.pyannote_service", mock_pyannote_service):
             from app.main import app
-            return TestClient(app)
+            yield TestClient(app)
 
     def test_health_check(self, client):
         """Test health check endpoint."""
@@ -90,6 +92,28 @@ class TestDiarizationEndpoint:
         response = client.post("/api/v1/diarize")
         assert response.status_code == 422  # Validation error
 
+    def test_diarize_decodes_upload_in_memory(self, client, mock_pyannote_service):
+        """Test that uploaded WAV audio reaches the service as a waveform mapping."""
+        import io
+
+        import numpy as np
+        import soundfile as sf
+
+        buffer = io.BytesIO()
+        sf.write(buffer, np.zeros(16000, dtype=np.float32), 16000, format="WAV")
+
+        response = client.post(
+            "/api/v1/diarize",
+            files={"file": ("chunk.wav", buffer.getvalue(), "audio/wav")},
+            data={"session_id": "test-123", "chunk_index": "0"},
+        )
+
+        assert response.status_code == 200
+        assert len(response.json()["segments"]) == 3
+        audio = mock_pyannote_service.diarize.call_args.args[0]
+        assert audio["sample_rate"] == 16000
+        assert tuple(audio["waveform"].shape) == (1, 16000)
+
 
 class TestDiarizationWorker:
     """Tests for DiarizationWorker class."""
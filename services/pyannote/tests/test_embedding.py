@@ -207,3 +207,31 @@ class TestConfidenceCalculation:
             confidence = "none"
 
         assert confidence == "none"
+
+
+class TestPipelineEmbeddingSource:
+    """Tests for reusing the diarization pipeline's speaker embeddings."""
+
+    @pytest.mark.asyncio
+    async def test_centroids_returned_without_reembedding(self, ready_service, waveform_input):
+        """Test that pipeline centroids are returned and no turn is re-embedded."""
+        ready_service.settings = ready_service.settings.model_copy(
+            update={"embedding_source": "pipeline"}
+        )
+
+        result = await ready_service.diarize_with_embeddings(waveform_input)
+
+        embeddings = {emb["label"]: emb["embedding"] for emb in result["speaker_embeddings"]}
+        assert embeddings["SPEAKER_00"] == [1.0] * 256
+        assert embeddings["SPEAKER_01"] == [2.0] * 256
+        assert ready_service.pipeline.calls[0][1] == {"return_embeddings": True}
+        assert ready_service.embedding_inference.batches == []
+
+    @pytest.mark.asyncio
+    async def test_model_source_reembeds_turns(self, ready_service, waveform_input):
+        """Test that the default source embeds turns with the embedding model."""
+        result = await ready_service.diarize_with_embeddings(waveform_input)
+
+        assert len(result["speaker_embeddings"]) == 2
+        assert len(result["speaker_embeddings"][0]["embedding"]) == 512
+        assert ready_service.embedding_inference.batches != []
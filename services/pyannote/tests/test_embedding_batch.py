@@ -0,0 +1,85 @@
+"""
+Tests for batched speaker embedding
+"""
+import numpy as np
+import pytest
+import torch
+
+from app.services.embedding_batch import embed_chunks, make_buckets
+from tests.conftest import ToyEmbeddingModel, ToyInference
+
+
+@pytest.fixture
+def chunks():
+    """Speaker turns of varying length (multiples of the frame hop)."""
+    generator = torch.Generator().manual_seed(1)
+    lengths = [8000, 8160, 9600, 16000, 16800, 32000, 40000, 8320]
+    return [torch.randn(1, n, generator=generator) for n in lengths]
+
+
+class TestMakeBuckets:
+    """Tests for make_buckets."""
+
+    def test_buckets_respect_ratio(self):
+        """Test that bucket members differ by at most the ratio."""
+        lengths = [100, 110, 124, 200, 240, 1000]
+
+        buckets = make_buckets(lengths, max_batch_size=32, bucket_ratio=1.25)
+
+        assert buckets == [[0, 1, 2], [3, 4], [5]]
+
+    def test_buckets_respect_batch_size(self):
+        """Test that no bucket exceeds max_batch_size."""
+        buckets = make_buckets([100] * 5, max_batch_size=2, bucket_ratio=1.25)
+
+        assert [len(b) for b in buckets] == [2, 2, 1]
+
+
+class TestEmbedChunks:
+    """Tests for embed_chunks."""
+
+    def test_matches_unbatched_embeddings(self, chunks):
+        """Test that batched embeddings match per-chunk forward passes."""
+        inference = ToyInference(ToyEmbeddingModel())
+
+        sequential = [inference.infer(chunk[None])[0] for chunk in chunks]
+        batched = embed_chunks(inference, chunks, max_batch_size=32, bucket_ratio=1.25)
+
+        for expected, actual in zip(sequential, batched):
+            np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-5)
+
+    def test_speaker_mean_preserved(self, chunks):
+        """Test that the mean-pooled speaker embedding is unchanged."""
+        inference = ToyInference(ToyEmbeddingModel())
+
+        sequential = np.mean(np.stack([inference.infer(c[None])[0] for c in chunks]), axis=0)
+        batched = np.mean(np.stack(embed_chunks(inference, chunks)), axis=0)
+
+        np.testing.assert_allclose(batched, sequential, rtol=1e-4, atol=1e-5)
+
+    def test_fewer_forward_passes(self, chunks):
+        """Test that similar-length chunks share a forward pass."""
+        inference = ToyInference(ToyEmbeddingModel())
+
+        embed_chunks(inference, chunks, max_batch_size=32, bucket_ratio=1.25)
+
+        # Same-length buckets go through infer(); padded ones call the model directly
+        assert inference.passes <= 2
+
+    def test_falls_back_without_weights_support(self, chunks):
+        """Test per-chunk inference when the model cannot mask padding."""
+
+        class NoWeightsModel(torch.nn.Module):
+            def forward(self, waveforms):
+                return waveforms.mean(dim=-1)
+
+        inference = ToyInference(NoWeightsModel())
+
+        batched = embed_chunks(inference, chunks)
+
+        for chunk, actual in zip(chunks, batched):
+            np.testing.assert_allclose(actual, chunk.mean(dim=-1).numpy(), rtol=1e-5)
+
+    def test_empty_input(self):
+        """Test that no chunks yield no embeddings."""
+        assert embed_chunks(ToyInference(ToyEmbeddingModel()), []) == []
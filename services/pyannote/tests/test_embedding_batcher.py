@@ -0,0 +1,142 @@
+"""
+Tests for the cross-request embedding batcher
+"""
+import asyncio
+
+import numpy as np
+import pytest
+import pytest_asyncio
+import torch
+
+from app.metrics import metrics
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.inference_pool import InferencePool, InferenceReplica
+from tests.conftest import FakeEmbeddingInference
+
+
+@pytest.fixture
+def embedding_inference():
+    return FakeEmbeddingInference(dimension=4)
+
+
+@pytest_asyncio.fixture
+async def batcher(embedding_inference):
+    """Batcher over a single-replica pool."""
+    metrics.reset()
+    pool = InferencePool([InferenceReplica(0, None, embedding_inference)])
+    batcher = EmbeddingBatcher(pool, max_batch_size=16, max_wait_ms=20)
+    yield batcher
+    await batcher.close()
+    pool.shutdown()
+
+
+def constant_chunk(value, length=8000):
+    return torch.full((1, length), float(value))
+
+
+class TestEmbeddingBatcher:
+    """Tests for EmbeddingBatcher class."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_a_batch(self, batcher, embedding_inference):
+        """Test that crops from concurrent requests run in one forward pass."""
+        results = await asyncio.gather(
+            batcher.embed([constant_chunk(1), constant_chunk(2)]),
+            batcher.embed([constant_chunk(3)]),
+            batcher.embed([constant_chunk(4), constant_chunk(5)]),
+        )
+
+        assert embedding_inference.batches == [(5, 1, 8000)]
+        # Results are fanned back out to the right caller, in order
+        assert [r[0] for r in results[0]] == [1.0, 2.0]
+        assert [r[0] for r in results[1]] == [3.0]
+        assert [r[0] for r in results[2]] == [4.0, 5.0]
+
+    @pytest.mark.asyncio
+    async def test_batch_size_metric(self, batcher):
+        """Test that the achieved batch size is recorded."""
+        await asyncio.gather(*(batcher.embed([constant_chunk(i)]) for i in range(3)))
+
+        summary = metrics.snapshot()["embedding_batch_size"]
+        assert summary["count"] == 1
+        assert summary["max"] == 3
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size_respected(self, embedding_inference):
+        """Test that batches never exceed max_batch_size."""
+        pool = InferencePool([InferenceReplica(0, None, embedding_inference)])
+        batcher = EmbeddingBatcher(pool, max_batch_size=2, max_wait_ms=20)
+
+        results = await batcher.embed([constant_chunk(i) for i in range(5)])
+
+        assert all(shape[0] <= 2 for shape in embedding_inference.batches)
+        np.testing.assert_allclose([r[0] for r in results], [0, 1, 2, 3, 4])
+        await batcher.close()
+        pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_caller(self, batcher, embedding_inference):
+        """Test that a failed batch fails all of its callers."""
+
+        def fail(chunks):
+            raise RuntimeError("model failure")
+
+        embedding_inference.infer = fail
+
+        results = await asyncio.gather(
+            batcher.embed([constant_chunk(1)]),
+            batcher.embed([constant_chunk(2)]),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert batcher.pool.available == 1
+
+    @pytest.mark.asyncio
+    async def test_bad_crop_fails_only_its_caller(self, batcher, embedding_inference):
+        """Test that a batch failed by one crop is retried crop by crop."""
+        infer = embedding_inference.infer
+
+        def fail_on_bad_crop(chunks):
+            if (chunks == 99).any():
+                raise RuntimeError("bad crop")
+            return infer(chunks)
+
+        embedding_inference.infer = fail_on_bad_crop
+
+        good, bad, mixed = await asyncio.gather(
+            batcher.embed([constant_chunk(1)]),
+            batcher.embed([constant_chunk(99)]),
+            batcher.embed([constant_chunk(2), constant_chunk(99)], return_exceptions=True),
+            return_exceptions=True,
+        )
+
+        assert good[0][0] == 1.0
+        assert isinstance(bad, RuntimeError)
+        assert mixed[0][0] == 2.0
+        assert isinstance(mixed[1], RuntimeError)
+        assert metrics.counter("embedding_batch_retries").value == 1
+        assert batcher.pool.available == 1
+
+
+class TestServiceSegmentFailures:
+    """Tests for crops that fail to embed in PyannoteService."""
+
+    @pytest.mark.asyncio
+    async def test_failed_turn_skipped(self, ready_service, waveform_input):
+        """Test that a turn that fails to embed loses only its own embedding."""
+        infer = ready_service.embedding_inference.infer
+
+        def fail_on_one_second_crops(chunks):
+            if chunks.shape[-1] == 16000:
+                raise RuntimeError("bad crop")
+            return infer(chunks)
+
+        ready_service.embedding_inference.infer = fail_on_one_second_crops
+
+        result = await ready_service.diarize_with_embeddings(waveform_input)
+
+        assert {emb["label"] for emb in result["speaker_embeddings"]} == {
+            "SPEAKER_00",
+            "SPEAKER_01",
+        }
@@ -0,0 +1,101 @@
+"""
+Tests for the inference replica pool
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.inference_pool import InferencePool, InferenceReplica
+
+
+@pytest.fixture
+def pool():
+    """Create a pool with two dummy replicas."""
+    replicas = [InferenceReplica(i, pipeline=object(), embedding_inference=object()) for i in range(2)]
+    pool = InferencePool(replicas)
+    yield pool
+    pool.shutdown()
+
+
+class TestInferencePool:
+    """Tests for InferencePool class."""
+
+    def test_requires_replicas(self):
+        """Test that an empty pool is rejected."""
+        with pytest.raises(ValueError):
+            InferencePool([])
+
+    @pytest.mark.asyncio
+    async def test_run_passes_replica(self, pool):
+        """Test that the function receives a replica and its arguments."""
+        result = await pool.run(lambda replica, x: (replica.index, x * 2), 21)
+
+        assert result[0] in (0, 1)
+        assert result[1] == 42
+        assert pool.available == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrency_bounded_by_replicas(self, pool):
+        """Test that at most one inference runs per replica."""
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def work(replica):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+
+        await asyncio.gather(*(pool.run(work) for _ in range(6)))
+
+        assert peak == 2
+        assert pool.available == 2
+
+    @pytest.mark.asyncio
+    async def test_event_loop_not_blocked(self, pool):
+        """Test that blocking inference does not stall other coroutines."""
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            for _ in range(5):
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        await asyncio.gather(pool.run(lambda replica: time.sleep(0.2)), ticker())
+
+        assert ticks == 5
+
+    @pytest.mark.asyncio
+    async def test_replica_returned_on_error(self, pool):
+        """Test that a failing inference returns its replica."""
+
+        def fail(replica):
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            await pool.run(fail)
+
+        assert pool.available == 2
+
+    @pytest.mark.asyncio
+    async def test_replica_held_until_cancelled_work_finishes(self, pool):
+        """Test that cancellation does not return a replica that is still in use."""
+        release = threading.Event()
+        task = asyncio.create_task(pool.run(lambda replica: release.wait(1.0)))
+        await asyncio.sleep(0.05)
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert pool.available == 1
+
+        release.set()
+        await asyncio.sleep(0.05)
+        assert pool.available == 2
@@ -0,0 +1,203 @@
+"""
+Tests for the staged job pipeline in DiarizationWorker
+"""
+import asyncio
+import json
+import os
+from datetime import datetime
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.services.audio import DecodedAudio
+from app.services.degradation import DegradationController
+from app.workers.diarization_worker import DiarizationWorker, _WorkItem
+from app.workers.job_queue import QueuedJob
+from app.workers.job_store import DiarizationJob
+from tests.conftest import wav_bytes
+
+
+class AudioTransport(httpx.AsyncBaseTransport):
+    """Serves WAV audio for GET requests and records POSTed callbacks."""
+
+    def __init__(self, audio):
+        self.audio = audio
+        self.downloads = []
+        self.callbacks = []
+        self.callback_received = asyncio.Event()
+
+    async def handle_async_request(self, request):
+        if request.method == "GET":
+            self.downloads.append(str(request.url))
+            if "missing" in str(request.url):
+                return httpx.Response(404)
+            return httpx.Response(200, content=self.audio)
+
+        self.callbacks.append(json.loads(request.content))
+        self.callback_received.set()
+        return httpx.Response(200)
+
+
+class GatedService:
+    """Diarization service whose diarize() blocks until released."""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.inputs = []
+
+    async def diarize(self, audio, priority=None):
+        self.inputs.append(audio)
+        self.started.set()
+        await self.release.wait()
+        return {"segments": [{"speaker": "SPEAKER_00", "start": 0.0, "end": 1.0}]}
+
+    def estimate_speakers(self, segments):
+        return {"SPEAKER_00": "stylist"}
+
+
+@pytest_asyncio.fixture
+async def pipeline():
+    transport = AudioTransport(wav_bytes())
+    client = httpx.AsyncClient(transport=transport)
+    service = GatedService()
+    worker = DiarizationWorker(
+        service, max_concurrent_jobs=1, http_client=client, prefetch_jobs=1, fetch_concurrency=1
+    )
+    await worker.start()
+    yield worker, service, transport
+    await worker.stop()
+    await client.aclose()
+
+
+async def wait_for(condition, timeout=2.0):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+class TestJobPipeline:
+    """Tests for the fetch, decode, inference and callback stages."""
+
+    @pytest.mark.asyncio
+    async def test_job_completes(self, pipeline):
+        """Test that a job is downloaded, decoded, diarized and called back."""
+        worker, service, transport = pipeline
+        service.release.set()
+
+        job_id = await worker.submit_job(
+            "https://storage.example.com/a.wav", "https://example.com/callback"
+        )
+        await asyncio.wait_for(transport.callback_received.wait(), 2.0)
+
+        assert isinstance(service.inputs[0], DecodedAudio)
+        assert service.inputs[0].duration == pytest.approx(1.0)
+        callback = transport.callbacks[0]
+        assert callback["job_id"] == job_id
+        assert callback["status"] == "completed"
+        assert callback["result"]["segments"][0]["role"] == "stylist"
+        assert worker.get_job_status(job_id).status == "completed"
+
+    @pytest.mark.asyncio
+    async def test_prefetch_while_inferring(self, pipeline):
+        """Test that the next job is downloaded and decoded during inference."""
+        worker, service, transport = pipeline
+
+        await worker.submit_job("https://storage.example.com/a.wav", "https://example.com/cb")
+        await worker.submit_job("https://storage.example.com/b.wav", "https://example.com/cb")
+        await asyncio.wait_for(service.started.wait(), 2.0)
+
+        # The second job waits decoded in front of the busy inference stage
+        await wait_for(lambda: worker._infer_queue.qsize() == 1)
+        assert len(transport.downloads) == 2
+        assert len(service.inputs) == 1
+
+        service.release.set()
+        await wait_for(lambda: len(transport.callbacks) == 2)
+        assert [c["status"] for c in transport.callbacks] == ["completed", "completed"]
+
+    @pytest.mark.asyncio
+    async def test_download_failure(self, pipeline):
+        """Test that a failed download fails the job without reaching inference."""
+        worker, service, transport = pipeline
+
+        job_id = await worker.submit_job(
+            "https://storage.example.com/missing.wav", "https://example.com/callback"
+        )
+        await asyncio.wait_for(transport.callback_received.wait(), 2.0)
+
+        assert transport.callbacks[0]["status"] == "failed"
+        assert "404" in transport.callbacks[0]["error"]
+        assert service.inputs == []
+        assert worker.job_queue.running("default") == 0
+        assert worker.get_job_status(job_id).status == "failed"
+
+
+    @pytest.mark.asyncio
+    async def test_realtime_waits_observed(self, pipeline):
+        """Test that realtime jobs' queue waits feed the degradation controller."""
+        worker, service, transport = pipeline
+        waits = []
+        worker.degradation = DegradationController()
+        worker.degradation.observe_wait = waits.append
+        service.release.set()
+
+        await worker.submit_job("https://storage.example.com/a.wav", "https://example.com/cb")
+        await worker.submit_job(
+            "https://storage.example.com/b.wav", "https://example.com/cb", priority="backfill"
+        )
+        await wait_for(lambda: len(transport.callbacks) == 2)
+
+        assert len(waits) == 1
+
+
+class TestStreamingDownload:
+    """Tests for streamed audio downloads."""
+
+    def make_item(self, url):
+        job = DiarizationJob(
+            id="a", audio_url=url, callback_url="https://example.com/cb",
+            metadata={}, status="processing", created_at=datetime.utcnow(),
+        )
+        return _WorkItem(job=job, queued=QueuedJob(0.0, 0, "a", "realtime", "default", 0.0))
+
+    @pytest.mark.asyncio
+    async def test_small_download_in_memory(self):
+        """Test that downloads under the threshold stay in memory."""
+        audio = wav_bytes()
+        client = httpx.AsyncClient(transport=AudioTransport(audio))
+        worker = DiarizationWorker(GatedService(), http_client=client)
+        item = self.make_item("https://storage.example.com/a.wav")
+
+        await worker._download_audio(item)
+        await client.aclose()
+
+        assert item.download.content == audio
+        assert item.download.path is None
+
+    @pytest.mark.asyncio
+    async def test_large_download_spills(self):
+        """Test that downloads over the threshold stream to a removable temp file."""
+        audio = wav_bytes(seconds=2.0)
+        client = httpx.AsyncClient(transport=AudioTransport(audio))
+        worker = DiarizationWorker(
+            GatedService(), http_client=client,
+            spill_threshold_bytes=1024, download_chunk_bytes=4096,
+        )
+        item = self.make_item("https://storage.example.com/a.wav")
+
+        await worker._download_audio(item)
+        await client.aclose()
+
+        assert item.download.content is None
+        path = item.download.path
+        with open(path, "rb") as f:
+            assert f.read() == audio
+
+        decoded = worker._decode(item)
+        item.discard()
+        assert decoded.duration == pytest.approx(2.0)
+        assert not os.path.exists(path)
@@ -0,0 +1,117 @@
+"""
+Tests for priority scheduling and admission control
+"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.workers.job_queue import AdmissionController, PriorityJobQueue, QueueFullError
+
+
+class TestPriorityJobQueue:
+    """Tests for PriorityJobQueue class."""
+
+    def test_served_by_priority(self):
+        """Test that higher classes are served first, FIFO within a class."""
+        queue = PriorityJobQueue(aging_seconds=30)
+        queue.put_nowait("backfill", "backfill", now=0.0)
+        queue.put_nowait("final", "finalization", now=0.0)
+        queue.put_nowait("live-1", "realtime", now=0.0)
+        queue.put_nowait("live-2", "realtime", now=1.0)
+
+        order = [queue.get_nowait() for _ in range(4)]
+
+        assert order == ["live-1", "live-2", "final", "backfill"]
+
+    def test_aging_prevents_starvation(self):
+        """Test that a long-waiting backfill job overtakes new realtime jobs."""
+        queue = PriorityJobQueue(aging_seconds=30)
+        queue.put_nowait("backfill", "backfill", now=0.0)
+        queue.put_nowait("live-early", "realtime", now=59.0)
+        queue.put_nowait("live-late", "realtime", now=61.0)
+
+        order = [queue.get_nowait() for _ in range(3)]
+
+        assert order == ["live-early", "backfill", "live-late"]
+
+    def test_unknown_priority(self):
+        """Test that an unknown class is rejected."""
+        with pytest.raises(ValueError):
+            PriorityJobQueue().put_nowait("job", "urgent")
+
+    @pytest.mark.asyncio
+    async def test_get_waits_for_job(self):
+        """Test that get blocks until a job is queued."""
+        queue = PriorityJobQueue()
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+
+        queue.put_nowait("job")
+
+        assert await asyncio.wait_for(getter, 1.0) == "job"
+
+
+class TestAdmissionController:
+    """Tests for AdmissionController class."""
+
+    def test_rejects_deep_queue(self):
+        """Test rejection by queue depth with a Retry-After estimate."""
+        queue = PriorityJobQueue()
+        for index in range(3):
+            queue.put_nowait(str(index))
+        admission = AdmissionController(max_queue_depth=3, initial_job_seconds=10.0)
+
+        with pytest.raises(QueueFullError) as error:
+            admission.check(queue, "realtime", concurrency=2)
+
+        assert error.value.retry_after == 5
+
+    def test_rejects_long_wait_for_low_priority_only(self):
+        """Test that the estimated wait depends on the jobs served first."""
+        queue = PriorityJobQueue(aging_seconds=30)
+        for index in range(5):
+            queue.put_nowait(str(index), "finalization")
+        admission = AdmissionController(max_wait_seconds=30.0, initial_job_seconds=10.0)
+
+        # Realtime jobs skip the finalization backlog
+        admission.check(queue, "realtime", concurrency=1)
+        with pytest.raises(QueueFullError) as error:
+            admission.check(queue, "backfill", concurrency=1)
+
+        assert error.value.retry_after == 20
+
+    def test_moving_average(self):
+        """Test that observed job times update the estimate."""
+        admission = AdmissionController(initial_job_seconds=10.0, smoothing=0.5)
+        admission.record_job(2.0)
+
+        assert admission.job_seconds == 6.0
+
+
+class TestJobBackpressure:
+    """Tests for 429 responses from the job endpoint."""
+
+    def test_submit_rejected_with_retry_after(self):
+        """Test that an overloaded queue answers 429 with Retry-After."""
+        from app.workers.diarization_worker import DiarizationWorker
+
+        worker = DiarizationWorker(
+            AsyncMock(), admission=AdmissionController(max_queue_depth=1)
+        )
+        with patch("app.main.diarization_worker", worker):
+            from app.main import app
+
+            client = TestClient(app)
+            body = {
+                "audio_url": "https://example.com/audio.wav",
+                "callback_url": "https://example.com/callback",
+                "priority": "backfill",
+            }
+            assert client.post("/api/v1/jobs", json=body).status_code == 202
+            response = client.post("/api/v1/jobs", json=body)
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
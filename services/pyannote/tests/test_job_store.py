@@ -0,0 +1,153 @@
+"""
+Tests for the diarization job store and job endpoints
+"""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.workers.job_store import DiarizationJob, JobStore
+
+
+def make_job(job_id, status="pending", completed_at=None, result=None):
+    return DiarizationJob(
+        id=job_id,
+        audio_url="https://example.com/audio.wav",
+        callback_url="https://example.com/callback",
+        metadata={"session_id": "s1"},
+        status=status,
+        created_at=datetime(2024, 1, 1, 12, 0, 0),
+        completed_at=completed_at,
+        result=result,
+    )
+
+
+class TestJobStore:
+    """Tests for JobStore class."""
+
+    def test_round_trip(self):
+        """Test that a stored job reads back unchanged."""
+        store = JobStore()
+        job = make_job("a", status="completed", completed_at=datetime(2024, 1, 1, 12, 1),
+                       result={"segments": [{"speaker": "SPEAKER_00"}]})
+
+        store.add(job)
+        store._recent.clear()
+
+        assert store.get("a") == job
+
+    def test_memory_records_are_compact(self):
+        """Test that results stay out of the in-memory cache."""
+        store = JobStore()
+        store.add(make_job("a", status="completed", completed_at=datetime.utcnow(),
+                           result={"segments": [1, 2, 3]}))
+
+        assert store._recent["a"].result is None
+        assert store.get("a").result == {"segments": [1, 2, 3]}
+        assert store.get("a", include_result=False).result is None
+
+    def test_memory_bounded(self):
+        """Test that only the most recent jobs are kept in memory."""
+        store = JobStore(max_recent=2)
+        for job_id in "abc":
+            store.add(make_job(job_id))
+
+        assert list(store._recent) == ["b", "c"]
+        assert store.get("a") is not None
+        assert len(store) == 3
+
+    def test_retention(self):
+        """Test that finished jobs expire after the retention period."""
+        store = JobStore(retention_seconds=3600)
+        now = datetime.utcnow()
+        store.add(make_job("old", status="completed", completed_at=now - timedelta(hours=2)))
+        store.add(make_job("new", status="completed", completed_at=now))
+        store.add(make_job("pending"))
+
+        assert store.purge_expired() == 1
+        assert store.get("old") is None
+        assert store.get("new") is not None
+        assert store.get("pending") is not None
+
+    def test_unfinished_survive_restart(self, tmp_path):
+        """Test that pending jobs are found again after reopening the store."""
+        path = str(tmp_path / "jobs.sqlite3")
+        store = JobStore(path)
+        store.add(make_job("a", status="processing"))
+        store.add(make_job("b", status="completed", completed_at=datetime.utcnow()))
+        store.close()
+
+        reopened = JobStore(path)
+        assert [job.id for job in reopened.unfinished()] == ["a"]
+
+
+class TestWorkerRecovery:
+    """Tests for job recovery in DiarizationWorker."""
+
+    @pytest.mark.asyncio
+    async def test_unfinished_jobs_requeued(self):
+        """Test that jobs interrupted by a restart are queued again."""
+        from app.workers.diarization_worker import DiarizationWorker
+
+        store = JobStore()
+        store.add(make_job("a", status="processing"))
+        worker = DiarizationWorker(AsyncMock(), max_concurrent_jobs=0, job_store=store)
+
+        await worker.start()
+        await worker.stop()
+
+        assert worker.job_queue.get_nowait() == "a"
+        assert store.get("a").status == "pending"
+
+    @pytest.mark.asyncio
+    async def test_recovery_disabled(self):
+        """Test that a worker sharing the store with others can skip recovery."""
+        from app.workers.diarization_worker import DiarizationWorker
+
+        store = JobStore()
+        store.add(make_job("a", status="processing"))
+        worker = DiarizationWorker(
+            AsyncMock(), max_concurrent_jobs=0, job_store=store, recover_jobs=False
+        )
+
+        await worker.start()
+        await worker.stop()
+
+        assert worker.job_queue.empty()
+        assert store.get("a").status == "processing"
+
+
+class TestJobEndpoints:
+    """Tests for /api/v1/jobs endpoints."""
+
+    @pytest.fixture
+    def client(self):
+        """Create test client with a worker that is not started."""
+        from app.workers.diarization_worker import DiarizationWorker
+
+        worker = DiarizationWorker(AsyncMock())
+        with patch("app.main.diarization_worker", worker):
+            from app.main import app
+            yield TestClient(app)
+
+    def test_submit_and_get(self, client):
+        """Test submitting a job and polling its status."""
+        response = client.post("/api/v1/jobs", json={
+            "audio_url": "https://example.com/audio.wav",
+            "callback_url": "https://example.com/callback",
+            "metadata": {"session_id": "s1"},
+        })
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        response = client.get(f"/api/v1/jobs/{job_id}")
+        assert response.status_code == 200
+        assert response.json()["status"] == "pending"
+        assert response.json()["metadata"] == {"session_id": "s1"}
+
+    def test_unknown_job(self, client):
+        """Test that an unknown job is a 404."""
+        response = client.get("/api/v1/jobs/missing")
+        assert response.status_code == 404
+
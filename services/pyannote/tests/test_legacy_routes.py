@@ -0,0 +1,117 @@
+"""
+Tests for the legacy pyannote-server routes
+"""
+import io
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+
+
+def storage_transport(request):
+    if "missing" in str(request.url):
+        return httpx.Response(404)
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(16000, dtype=np.float32), 16000, format="WAV")
+    return httpx.Response(200, content=buffer.getvalue())
+
+
+@pytest.fixture
+def service():
+    service = MagicMock()
+    service.result_cache = None
+    service.scheduler = None
+    service.diarize = AsyncMock(return_value={
+        "segments": [
+            {"speaker": "SPEAKER_00", "start": 0.0, "end": 2.0},
+            {"speaker": "SPEAKER_01", "start": 2.0, "end": 3.5},
+            {"speaker": "SPEAKER_00", "start": 3.5, "end": 4.0},
+        ],
+        "processing_time_ms": 120,
+    })
+    return service
+
+
+@pytest.fixture
+def outbox():
+    return MagicMock(enqueue=AsyncMock())
+
+
+@pytest.fixture
+def client(service, outbox):
+    """Create test client with a mocked service and storage."""
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(storage_transport))
+    with patch("app.main.pyannote_service", service), \
+            patch("app.main.http_client", http_client), \
+            patch("app.main.callback_outbox", outbox):
+        from app.main import app
+        yield TestClient(app)
+
+
+class TestLegacyRoutes:
+    """Tests for /diarize and /diarize/sync."""
+
+    def test_sync_returns_legacy_shape(self, client, service):
+        """Test that /diarize/sync downloads the audio and answers in seconds."""
+        response = client.post(
+            "/diarize/sync", json={"audio_url": "https://storage.example.com/a.wav"}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["speakers"] == ["SPEAKER_00", "SPEAKER_01"]
+        assert data["segments"][1] == {"speaker": "SPEAKER_01", "start": 2.0, "end": 3.5}
+        assert data["processing_time_ms"] == 120
+        audio = service.diarize.call_args.args[0]
+        assert tuple(audio["waveform"].shape) == (1, 16000)
+        # pyannote-server's min_speakers=max_speakers=2
+        assert service.diarize.call_args.kwargs["num_speakers"] == 2
+
+    def test_sync_download_failure(self, client):
+        """Test that a failed download is reported as a 500, like pyannote-server."""
+        response = client.post(
+            "/diarize/sync", json={"audio_url": "https://storage.example.com/missing.wav"}
+        )
+
+        assert response.status_code == 500
+
+    def test_async_queues_legacy_callback(self, client, outbox, service):
+        """Test that /diarize answers at once and queues a legacy callback payload."""
+        response = client.post(
+            "/diarize",
+            json={
+                "audio_url": "https://storage.example.com/a.wav",
+                "callback_url": "https://example.com/callback",
+                "metadata": {"session_id": "s1", "chunk_index": 0},
+            },
+        )
+
+        assert response.status_code == 200
+        job_id = response.json()["job_id"]
+        assert response.json()["status"] == "processing"
+
+        url, payload = outbox.enqueue.call_args.args
+        assert url == "https://example.com/callback"
+        assert payload["job_id"] == job_id
+        assert payload["success"] is True
+        assert payload["metadata"] == {"session_id": "s1", "chunk_index": 0}
+        assert len(payload["result"]["segments"]) == 3
+        assert service.diarize.call_args.kwargs["num_speakers"] == 2
+
+    def test_api_key(self, client, monkeypatch):
+        """Test that a configured API key is required."""
+        monkeypatch.setattr(get_settings(), "legacy_api_key", "secret")
+        body = {"audio_url": "https://storage.example.com/a.wav"}
+
+        assert client.post("/diarize/sync", json=body).status_code == 401
+        assert client.post(
+            "/diarize/sync", json=body, headers={"Authorization": "Bearer wrong"}
+        ).status_code == 401
+        assert client.post(
+            "/diarize/sync", json=body, headers={"Authorization": "Bearer secret"}
+        ).status_code == 200
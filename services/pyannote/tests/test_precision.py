@@ -0,0 +1,74 @@
+"""
+Tests for the reduced-precision inference modes
+"""
+import numpy as np
+import pytest
+import torch
+
+from app.services.embedding_batch import _supports_weights, embed_chunks
+from app.services.precision import apply_precision
+from tests.conftest import ToyEmbeddingModel, ToyInference, ToySegmentationModel
+
+
+def outputs(model, *inputs):
+    with torch.inference_mode():
+        return model(*inputs)
+
+
+class TestApplyPrecision:
+    """Tests for apply_precision."""
+
+    @pytest.mark.parametrize("precision", ["int8", "bf16"])
+    def test_outputs_close_to_fp32(self, precision):
+        """Test that reduced-precision outputs stay close to fp32, as float32."""
+        reference = ToySegmentationModel().eval()
+        model = ToySegmentationModel().eval()
+        waveforms = torch.randn(2, 1, 32000) * 0.1
+
+        applied = apply_precision(precision, {"segmentation": [model]})
+
+        assert applied == {"segmentation": precision}
+        actual = outputs(model, waveforms)
+        assert actual.dtype == torch.float32
+        torch.testing.assert_close(actual, outputs(reference, waveforms), rtol=0.05, atol=0.05)
+
+    def test_int8_quantizes_lstm_and_linear(self):
+        """Test that int8 swaps the LSTM and Linear layers and keeps the model object."""
+        model = ToySegmentationModel()
+
+        apply_precision("int8", {"segmentation": [model]})
+
+        assert type(model.lstm).__module__.startswith("torch.ao.nn.quantized.dynamic")
+        assert type(model.classifier).__module__.startswith("torch.ao.nn.quantized.dynamic")
+        assert isinstance(model.frames, torch.nn.Conv1d)
+
+    @pytest.mark.parametrize("precision", ["int8", "bf16"])
+    def test_embeddings_keep_weights_support(self, precision):
+        """Test that masked batched embedding still works and matches fp32 closely."""
+        torch.manual_seed(5)
+        chunks = [torch.randn(1, n) * 0.1 for n in (16000, 17000, 24000)]
+        reference = embed_chunks(ToyInference(ToyEmbeddingModel().eval()), chunks)
+        inference = ToyInference(ToyEmbeddingModel().eval())
+
+        apply_precision(precision, {"embedding": [inference.model]})
+
+        assert _supports_weights(inference.model)
+        for actual, expected in zip(embed_chunks(inference, chunks), reference):
+            cosine = np.dot(actual, expected) / (np.linalg.norm(actual) * np.linalg.norm(expected))
+            assert cosine > 0.99
+
+    def test_fp32_and_gpu_unchanged(self):
+        """Test that fp32, and any mode on a non-CPU device, leaves models untouched."""
+        model = ToySegmentationModel()
+
+        assert apply_precision("fp32", {"segmentation": [model]}) == {"segmentation": "fp32"}
+        assert apply_precision("int8", {"segmentation": [model]}, device="cuda") == {
+            "segmentation": "fp32"
+        }
+        assert isinstance(model.lstm, torch.nn.LSTM)
+        assert "forward" not in vars(model)
+
+    def test_unknown_precision(self):
+        """Test that an unknown precision mode is rejected."""
+        with pytest.raises(ValueError):
+            apply_precision("fp8", {"segmentation": [ToySegmentationModel()]})
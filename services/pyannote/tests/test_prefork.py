@@ -0,0 +1,158 @@
+"""
+Tests for the prefork server helpers
+"""
+import gc
+import importlib.util
+import os
+
+import pytest
+import torch
+
+from app.config import Settings
+from app.prefork import (
+    PreforkServer,
+    configure_worker,
+    worker_cpus,
+    worker_outbox_path,
+    worker_threads,
+)
+from app.services.backends import OnnxRunner, compile_model, segmentation_spec
+from tests.conftest import ToySegmentationModel
+
+
+class TestCoreShares:
+    """Tests for dividing cores between workers."""
+
+    def test_even_split(self):
+        """Test that cores are split into contiguous equal slices."""
+        cpus = list(range(8))
+        assert [worker_cpus(i, 4, cpus) for i in range(4)] == [[0, 1], [2, 3], [4, 5], [6, 7]]
+
+    def test_uneven_split_covers_all_cores(self):
+        """Test that every core is assigned exactly once when they do not divide evenly."""
+        cpus = [0, 2, 4, 6, 8, 10, 12]
+        shares = [worker_cpus(i, 3, cpus) for i in range(3)]
+
+        assert sorted(sum(shares, [])) == cpus
+        assert [len(s) for s in shares] == [2, 2, 3]
+
+    def test_more_workers_than_cores(self):
+        """Test that surplus workers share cores round-robin with one thread each."""
+        cpus = [0, 1]
+        assert [worker_cpus(i, 5, cpus) for i in range(5)] == [[0], [1], [0], [1], [0]]
+        assert worker_threads(3, 5, cpus) == 1
+
+    def test_configured_threads(self):
+        """Test that an explicit thread count overrides the core share."""
+        assert worker_threads(0, 2, list(range(8))) == 4
+        assert worker_threads(0, 2, list(range(8)), configured=3) == 3
+
+
+class TestConfigureWorker:
+    """Tests for per-worker configuration after fork."""
+
+    @pytest.fixture(autouse=True)
+    def restore_threads(self):
+        threads = torch.get_num_threads()
+        yield
+        torch.set_num_threads(threads)
+
+    def test_worker_settings(self, tmp_path):
+        """Test that a worker gets its thread share and its own outbox file."""
+        settings = Settings(
+            callback_outbox_path=str(tmp_path / "outbox.sqlite3"),
+            prefork_threads_per_worker=1,
+        )
+
+        configure_worker(2, 4, settings, recover_jobs=False)
+
+        assert torch.get_num_threads() == 1
+        assert settings.callback_outbox_path == str(tmp_path / "outbox.worker2.sqlite3")
+        assert settings.job_store_max_recent == 0
+        assert settings.worker_recover_jobs is False
+
+    def test_onnx_sessions_rebuilt_with_worker_threads(self, tmp_path, monkeypatch):
+        """Test that ONNX Runtime sessions created before fork get the worker's threads."""
+        created = []
+        monkeypatch.setattr(
+            OnnxRunner, "_create_session", lambda runner: created.append(torch.get_num_threads())
+        )
+        runner = OnnxRunner(str(tmp_path / "model.onnx"), ["waveforms"])
+        torch.set_num_threads(1)
+        runner.session
+
+        settings = Settings(
+            callback_outbox_path=str(tmp_path / "outbox.sqlite3"),
+            prefork_threads_per_worker=3,
+        )
+        configure_worker(0, 2, settings, recover_jobs=True)
+        runner.session
+
+        assert created == [1, 3]
+
+    @pytest.mark.skipif(
+        importlib.util.find_spec("onnxruntime") is None, reason="onnxruntime not installed"
+    )
+    def test_onnx_session_threads(self, tmp_path):
+        """Test the intra-op thread count of a real session after configure_worker."""
+        model = ToySegmentationModel().eval()
+        torch.set_num_threads(1)
+        runner = compile_model(model, segmentation_spec(model), "onnx", str(tmp_path))
+        assert runner.session.get_session_options().intra_op_num_threads == 1
+
+        settings = Settings(
+            callback_outbox_path=str(tmp_path / "outbox.sqlite3"),
+            prefork_threads_per_worker=3,
+        )
+        configure_worker(0, 2, settings, recover_jobs=True)
+
+        assert runner.session.get_session_options().intra_op_num_threads == 3
+
+    def test_outbox_path(self):
+        """Test that outbox paths without an extension are suffixed too."""
+        assert worker_outbox_path("/data/outbox", 1) == "/data/outbox.worker1"
+
+
+class FakeService:
+    """Stand-in for PyannoteService that records its initialization."""
+
+    def __init__(self, settings):
+        self.weights = torch.randn(256, 256)
+        self.is_ready = False
+
+    async def initialize(self):
+        self.is_ready = True
+
+
+class TestPreforkLoad:
+    """Tests for loading models in the prefork parent."""
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork()")
+    def test_children_share_preloaded_service(self, monkeypatch):
+        """Test that a forked child sees the parent's loaded service without reloading."""
+        import app.main as main
+        import app.services.pyannote_service as pyannote_service
+
+        monkeypatch.setattr(pyannote_service, "PyannoteService", FakeService)
+        monkeypatch.setattr(main, "preloaded_service", None)
+        server = PreforkServer(workers=1, settings=Settings())
+        threads = torch.get_num_threads()
+        try:
+            server.load()
+            assert gc.get_freeze_count() > 0
+
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                service = main.preloaded_service
+                ok = service.is_ready and tuple(service.weights.shape) == (256, 256)
+                os.write(write_fd, b"1" if ok else b"0")
+                os._exit(0)
+
+            os.close(write_fd)
+            assert os.read(read_fd, 1) == b"1"
+            os.waitpid(pid, 0)
+            os.close(read_fd)
+        finally:
+            gc.unfreeze()
+            torch.set_num_threads(threads)
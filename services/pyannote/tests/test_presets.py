@@ -0,0 +1,106 @@
+"""
+Tests for the diarization quality presets
+"""
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services.presets import PRESETS, configure_pipeline, degrade_preset, get_preset
+from tests.conftest import post_diarize
+
+
+class TestPresets:
+    """Tests for preset lookup and pipeline configuration."""
+
+    def test_default_and_unknown_quality(self):
+        """Test that no quality means the configured default and unknown ones fail."""
+        assert get_preset(None).name == "balanced"
+        assert get_preset("fast") is PRESETS["fast"]
+        with pytest.raises(ValueError):
+            get_preset("ultra")
+
+    def test_configure_pipeline(self):
+        """Test that the segmentation step and embedding batch size follow the preset."""
+        pipeline = SimpleNamespace(
+            _segmentation=SimpleNamespace(duration=10.0, step=1.0), embedding_batch_size=32
+        )
+
+        configure_pipeline(pipeline, PRESETS["fast"])
+        assert pipeline._segmentation.step == 5.0
+        assert pipeline.embedding_batch_size == 64
+
+        configure_pipeline(pipeline, PRESETS["accurate"])
+        assert pipeline._segmentation.step == 0.5
+        assert pipeline.embedding_batch_size == 32
+
+    def test_degrade_preset_keeps_speakers_and_embeddings(self):
+        """Test that a degraded preset only takes the lower preset's step and batch size."""
+        accurate = degrade_preset(PRESETS["accurate"], "fast")
+
+        assert accurate.name == "accurate"
+        assert accurate.segmentation_step == PRESETS["fast"].segmentation_step
+        assert accurate.embedding_batch_size == PRESETS["fast"].embedding_batch_size
+        assert accurate.num_speakers is None
+        assert accurate.skip_embeddings is False
+        assert degrade_preset(PRESETS["fast"], "fast") is PRESETS["fast"]
+
+
+class TestServicePresets:
+    """Tests for presets in PyannoteService."""
+
+    @pytest.mark.asyncio
+    async def test_fast_fixes_two_speakers(self, ready_service, waveform_input):
+        """Test that fast clusters into two speakers and balanced leaves it open."""
+        fast = await ready_service.diarize(waveform_input, quality="fast")
+        balanced = await ready_service.diarize(waveform_input)
+
+        (_, fast_kwargs), (_, balanced_kwargs) = ready_service.pipeline.calls
+        assert fast_kwargs == {"num_speakers": 2}
+        assert balanced_kwargs == {}
+        assert fast["quality"] == "fast"
+        assert balanced["quality"] == "balanced"
+
+    @pytest.mark.asyncio
+    async def test_num_speakers_override(self, ready_service, waveform_input):
+        """Test that an explicit speaker count applies on top of the preset."""
+        result = await ready_service.diarize(waveform_input, num_speakers=2)
+
+        (_, kwargs), = ready_service.pipeline.calls
+        assert kwargs == {"num_speakers": 2}
+        assert result["quality"] == "balanced"
+
+
+class TestQualityField:
+    """Tests for the quality form field on /diarize."""
+
+    @pytest.fixture
+    def service(self, service):
+        result = {"segments": [], "processing_time_ms": 5}
+        service.diarize = AsyncMock(return_value={**result, "quality": "fast"})
+        service.diarize_with_embeddings = AsyncMock(
+            return_value={**result, "speaker_embeddings": [], "quality": "accurate"}
+        )
+        return service
+
+    def test_fast_skips_embeddings(self, client, service):
+        """Test that fast answers without speaker embeddings even when asked."""
+        response = post_diarize(client, quality="fast", extract_embeddings="true")
+
+        assert response.status_code == 200
+        assert response.json()["quality"] == "fast"
+        assert response.json()["speaker_embeddings"] is None
+        assert service.diarize.call_args.kwargs["quality"] == "fast"
+        service.diarize_with_embeddings.assert_not_called()
+
+    def test_accurate_keeps_embeddings(self, client, service):
+        """Test that accurate still extracts the requested embeddings."""
+        response = post_diarize(client, quality="accurate", extract_embeddings="true")
+
+        assert response.status_code == 200
+        assert response.json()["quality"] == "accurate"
+        assert service.diarize_with_embeddings.call_args.kwargs["quality"] == "accurate"
+
+    def test_unknown_quality_rejected(self, client):
+        """Test that an unknown quality is a validation error."""
+        assert post_diarize(client, quality="ultra").status_code == 422
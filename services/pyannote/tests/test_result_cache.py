@@ -0,0 +1,226 @@
+"""
+Tests for the diarization result cache
+"""
+import asyncio
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from app.services.result_cache import ResultCache, make_cache_key
+
+
+def counting_compute(result, calls, delay=0.0):
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return dict(result)
+
+    return compute
+
+
+class TestMakeCacheKey:
+    """Tests for make_cache_key."""
+
+    def test_parameters_change_key(self):
+        """Test that the same audio with other parameters gets another key."""
+        assert make_cache_key("abc", extract_embeddings=True) != make_cache_key(
+            "abc", extract_embeddings=False
+        )
+
+    def test_parameter_order_irrelevant(self):
+        """Test that keyword order does not matter."""
+        assert make_cache_key("abc", a=1, b=2) == make_cache_key("abc", b=2, a=1)
+
+
+class TestResultCache:
+    """Tests for ResultCache class."""
+
+    @pytest.mark.asyncio
+    async def test_hit_returns_copy(self):
+        """Test that a second lookup is served from the cache as a fresh copy."""
+        cache = ResultCache()
+        calls = []
+
+        first = await cache.get_or_compute("k", counting_compute({"segments": [1]}, calls))
+        first["segments"].append(2)
+        second = await cache.get_or_compute("k", counting_compute({"segments": [1]}, calls))
+
+        assert second == {"segments": [1]}
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_coalesce(self):
+        """Test that identical concurrent requests run one computation."""
+        cache = ResultCache()
+        calls = []
+        compute = counting_compute({"segments": []}, calls, delay=0.01)
+
+        results = await asyncio.gather(*[cache.get_or_compute("k", compute) for _ in range(5)])
+
+        assert len(calls) == 1
+        assert all(result == {"segments": []} for result in results)
+
+    @pytest.mark.asyncio
+    async def test_failure_shared_and_not_cached(self):
+        """Test that a failed computation fails every waiter and is retried later."""
+        cache = ResultCache()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            cache.get_or_compute("k", failing),
+            cache.get_or_compute("k", failing),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_disk_write_failure_does_not_fail_requests(self, tmp_path):
+        """Test that a failing disk tier still delivers the result to every caller."""
+        cache = ResultCache(disk_dir=str(tmp_path))
+
+        def full_disk(key, data):
+            raise OSError("No space left on device")
+
+        cache._write_disk = full_disk
+        compute = counting_compute({"segments": [1]}, [], delay=0.01)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*[cache.get_or_compute("k", compute) for _ in range(3)]), 2.0
+        )
+
+        assert results == [{"segments": [1]}] * 3
+        # The memory tier still took the result
+        assert await cache.get("k") == {"segments": [1]}
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_handed_over(self):
+        """Test that a waiter runs the computation when the first caller is cancelled."""
+        cache = ResultCache()
+        calls = []
+        compute = counting_compute({"segments": [1]}, calls, delay=0.05)
+
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_compute("k", compute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        results = await asyncio.wait_for(asyncio.gather(*waiters), 2.0)
+
+        assert leader.cancelled()
+        assert results == [{"segments": [1]}] * 2
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_uncacheable_result_not_shared(self):
+        """Test that waiters compute their own result when the leader's is not cacheable."""
+        cache = ResultCache()
+        calls = []
+
+        def compute_for(level):
+            async def compute():
+                calls.append(level)
+                await asyncio.sleep(0.02)
+                return {"degradation_level": level}
+
+            return compute
+
+        def cacheable(result):
+            return not result["degradation_level"]
+
+        leader = asyncio.create_task(cache.get_or_compute("k", compute_for(1), cacheable))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute("k", compute_for(0), cacheable))
+
+        assert await asyncio.wait_for(leader, 2.0) == {"degradation_level": 1}
+        assert await asyncio.wait_for(waiter, 2.0) == {"degradation_level": 0}
+        assert calls == [1, 0]
+        assert await cache.get("k") == {"degradation_level": 0}
+
+    @pytest.mark.asyncio
+    async def test_size_based_eviction(self):
+        """Test that the least recently used entries are evicted beyond max_bytes."""
+        cache = ResultCache(max_bytes=60)
+
+        await cache.put("a", {"v": "x" * 20})
+        await cache.put("b", {"v": "x" * 20})
+        await cache.get("a")
+        await cache.put("c", {"v": "x" * 20})
+
+        assert await cache.get("b") is None
+        assert await cache.get("a") is not None
+        assert cache.size_bytes <= 60
+
+    @pytest.mark.asyncio
+    async def test_disk_tier(self, tmp_path):
+        """Test that results survive in the disk tier."""
+        await ResultCache(disk_dir=str(tmp_path)).put("k", {"segments": [1]})
+
+        # A new instance (e.g. after a restart) has an empty memory tier
+        cache = ResultCache(disk_dir=str(tmp_path))
+        assert await cache.get("k") == {"segments": [1]}
+        assert len(cache) == 1
+
+    @pytest.mark.asyncio
+    async def test_disk_eviction(self, tmp_path):
+        """Test that the disk tier is bounded by size."""
+        cache = ResultCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=50)
+
+        await cache.put("a", {"v": "x" * 20})
+        await cache.put("b", {"v": "x" * 20})
+
+        assert len(list(tmp_path.iterdir())) == 1
+
+    @pytest.mark.asyncio
+    async def test_disk_writes_scan_only_over_budget(self, tmp_path, monkeypatch):
+        """Test that the disk directory is only rescanned when the budget is exceeded."""
+        cache = ResultCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=70)
+        scans = []
+        scan = cache._scan_disk
+        monkeypatch.setattr(cache, "_scan_disk", lambda: scans.append(1) or scan())
+
+        await cache.put("a", {"v": "x" * 20})
+        await cache.put("b", {"v": "x" * 20})
+        assert scans == []
+
+        await cache.put("c", {"v": "x" * 20})
+        assert scans == [1]
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["b.json", "c.json"]
+
+    @pytest.mark.asyncio
+    async def test_disk_index_rebuilt_at_startup(self, tmp_path):
+        """Test that a new instance evicts files written before a restart."""
+        await ResultCache(max_bytes=0, disk_dir=str(tmp_path)).put("a", {"v": "x" * 20})
+        cache = ResultCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=50)
+
+        await cache.put("b", {"v": "x" * 20})
+
+        assert [p.name for p in tmp_path.iterdir()] == ["b.json"]
+
+
+class TestCachedRoute:
+    """Tests for result caching in the diarization route."""
+
+    @pytest.mark.asyncio
+    async def test_resent_chunk_served_from_cache(self, ready_service):
+        """Test that resending the same upload runs diarization once."""
+        from app.routes.diarization import run_diarization
+        from app.services.audio import UploadedAudio
+
+        buffer = io.BytesIO()
+        sf.write(buffer, np.zeros(16000, dtype=np.float32), 16000, format="WAV")
+        content = buffer.getvalue()
+
+        for _ in range(2):
+            uploaded = UploadedAudio.from_bytes(content, "chunk.wav", 1 << 20)
+            result = await run_diarization(ready_service, uploaded, "s1", False, False)
+
+        assert len(ready_service.pipeline.calls) == 1
+        assert len(result["segments"]) == 5
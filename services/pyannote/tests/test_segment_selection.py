@@ -0,0 +1,145 @@
+"""
+Tests for early-stopping segment selection
+"""
+import numpy as np
+import pytest
+import torch
+
+from app.services.segment_selection import (
+    cosine_change,
+    embed_until_converged,
+    rank_segments,
+)
+
+
+class RecordingEmbed:
+    """Embeds chunk i as vectors[i] (None for failing ones) and records the batch sizes."""
+
+    def __init__(self, vectors, failing=()):
+        self.vectors = vectors
+        self.failing = set(failing)
+        self.batches = []
+
+    async def __call__(self, chunks):
+        start = sum(self.batches)
+        self.batches.append(len(chunks))
+        return [
+            None if index in self.failing else np.asarray(self.vectors[index], dtype=np.float32)
+            for index in range(start, start + len(chunks))
+        ]
+
+
+def chunks(count):
+    return [torch.zeros(1, 16000) for _ in range(count)]
+
+
+class TestRankSegments:
+    """Tests for ranking a speaker's turns."""
+
+    def test_longest_first_short_dropped(self):
+        """Test that turns are sorted by duration and short or other turns dropped."""
+        segments = [
+            {"speaker": "A", "start": 0.0, "end": 1.0},
+            {"speaker": "B", "start": 1.0, "end": 5.0},
+            {"speaker": "A", "start": 5.0, "end": 8.0},
+            {"speaker": "A", "start": 8.0, "end": 8.3},
+        ]
+
+        ranked = rank_segments(segments, "A", min_duration=0.5)
+
+        assert [(seg["start"], seg["end"]) for seg in ranked] == [(5.0, 8.0), (0.0, 1.0)]
+
+
+class TestEmbedUntilConverged:
+    """Tests for stopping on convergence or budget."""
+
+    def test_cosine_change(self):
+        """Test that identical directions do not change and opposite ones do."""
+        assert cosine_change(np.array([1.0, 0.0]), np.array([2.0, 0.0])) == pytest.approx(0.0)
+        assert cosine_change(np.array([1.0, 0.0]), np.array([-1.0, 0.0])) == pytest.approx(2.0)
+
+    @pytest.mark.asyncio
+    async def test_stops_when_centroid_converges(self):
+        """Test that embedding stops once a step barely moves the centroid."""
+        embed = RecordingEmbed([[1.0, 0.0]] * 12)
+
+        selection = await embed_until_converged(
+            chunks(12), embed, min_segments=5, max_segments=0, step=2
+        )
+
+        assert selection.stopped == "converged"
+        assert (selection.used, selection.total) == (7, 12)
+        assert embed.batches == [5, 2]
+
+    @pytest.mark.asyncio
+    async def test_continues_while_centroid_moves(self):
+        """Test that a moving centroid is embedded up to the budget."""
+        rng = np.random.default_rng(0)
+        embed = RecordingEmbed(rng.standard_normal((20, 8)))
+
+        selection = await embed_until_converged(
+            chunks(20), embed, min_segments=3, max_segments=9, step=2, tolerance=1e-6
+        )
+
+        assert selection.stopped == "budget"
+        assert selection.used == 9
+        assert embed.batches == [3, 2, 2, 2]
+
+    @pytest.mark.asyncio
+    async def test_few_turns_all_embedded(self):
+        """Test that fewer turns than min_segments are embedded in one batch."""
+        embed = RecordingEmbed([[1.0, 0.0]] * 3)
+
+        selection = await embed_until_converged(chunks(3), embed, min_segments=5)
+
+        assert selection.stopped == "exhausted"
+        assert selection.used == 3
+        assert embed.batches == [3]
+
+    @pytest.mark.asyncio
+    async def test_failed_chunks_skipped(self):
+        """Test that chunks that fail to embed are skipped and the rest still used."""
+        rng = np.random.default_rng(0)
+        embed = RecordingEmbed(rng.standard_normal((6, 8)), failing={1, 4})
+
+        selection = await embed_until_converged(
+            chunks(6), embed, min_segments=4, max_segments=0, tolerance=0.0
+        )
+
+        assert selection.stopped == "exhausted"
+        assert selection.used == 6
+        assert len(selection.embeddings) == 4
+
+    @pytest.mark.asyncio
+    async def test_all_failed(self):
+        """Test that a speaker none of whose chunks embed is reported as failed."""
+        embed = RecordingEmbed([[1.0]] * 3, failing={0, 1, 2})
+
+        selection = await embed_until_converged(chunks(3), embed, min_segments=2)
+
+        assert selection.stopped == "failed"
+        assert selection.embeddings == []
+
+
+class TestServiceSelection:
+    """Tests for segment selection in PyannoteService.extract_embedding."""
+
+    @pytest.mark.asyncio
+    async def test_reports_segments_used(self, ready_service, waveform_input):
+        """Test that only the longest turns are embedded and the counts reported."""
+        ready_service.pipeline.tracks = [
+            (i * 0.5, i * 0.5 + 0.5, "SPEAKER_00") for i in range(16)
+        ] + [(8.0, 10.0, "SPEAKER_01")]
+        ready_service.settings = ready_service.settings.model_copy(
+            update={"embedding_min_segments": 5, "embedding_max_segments": 8}
+        )
+
+        result = await ready_service.extract_embedding(waveform_input, "stylist")
+
+        assert result["segments_total"] == 16
+        assert 5 <= result["segments_used"] <= 8
+        assert result["confidence"] == 1.0
+        assert result["time_saved_ms"] >= 0
+        assert sum(batch[0] for batch in ready_service.embedding_inference.batches) == (
+            result["segments_used"]
+        )
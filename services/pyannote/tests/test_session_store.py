@@ -0,0 +1,138 @@
+"""
+Tests for cross-chunk session speaker state
+"""
+import numpy as np
+import pytest
+
+from app.services.session_store import SessionSpeakerStore
+
+
+@pytest.fixture
+def voices():
+    """Two well-separated speaker embeddings."""
+    rng = np.random.default_rng(0)
+    stylist = rng.normal(size=64)
+    customer = rng.normal(size=64)
+    return stylist, customer
+
+
+def noisy(vector, scale=0.1, seed=1):
+    return vector + np.random.default_rng(seed).normal(scale=scale, size=vector.shape)
+
+
+class TestSessionSpeakerStore:
+    """Tests for SessionSpeakerStore class."""
+
+    def test_labels_stable_across_chunks(self, voices):
+        """Test that a speaker keeps its label when chunk labels swap."""
+        stylist, customer = voices
+        store = SessionSpeakerStore()
+
+        first = store.assign("s1", {"SPEAKER_00": stylist, "SPEAKER_01": customer},
+                             {"SPEAKER_00": 20.0, "SPEAKER_01": 5.0})
+        # In the next chunk the pipeline happens to swap the labels
+        second = store.assign("s1", {"SPEAKER_00": noisy(customer), "SPEAKER_01": noisy(stylist)})
+
+        assert first == {"SPEAKER_00": "SPEAKER_00", "SPEAKER_01": "SPEAKER_01"}
+        assert second == {"SPEAKER_00": "SPEAKER_01", "SPEAKER_01": "SPEAKER_00"}
+
+    def test_new_speaker_gets_new_label(self, voices):
+        """Test that an unseen voice becomes a new session speaker."""
+        stylist, customer = voices
+        store = SessionSpeakerStore()
+
+        store.assign("s1", {"SPEAKER_00": stylist})
+        mapping = store.assign("s1", {"SPEAKER_00": noisy(stylist), "SPEAKER_01": customer})
+
+        assert mapping == {"SPEAKER_00": "SPEAKER_00", "SPEAKER_01": "SPEAKER_01"}
+        assert len(store.get("s1").speakers) == 2
+
+    def test_zero_weight_matches_without_update(self, voices):
+        """Test that a speaker with no new speech is matched but its centroid kept."""
+        stylist, customer = voices
+        store = SessionSpeakerStore()
+        store.assign("s1", {"SPEAKER_00": stylist}, {"SPEAKER_00": 4.0})
+        before = store.get("s1").speakers[0].centroid.copy()
+
+        mapping = store.assign(
+            "s1", {"SPEAKER_00": noisy(stylist, scale=0.5)}, {"SPEAKER_00": 4.0},
+            weights={"SPEAKER_00": 0.0},
+        )
+
+        assert mapping == {"SPEAKER_00": "SPEAKER_00"}
+        np.testing.assert_array_equal(store.get("s1").speakers[0].centroid, before)
+        assert store.get("s1").speakers[0].weight == 4.0
+
+    def test_sessions_are_independent(self, voices):
+        """Test that sessions do not share speakers."""
+        stylist, customer = voices
+        store = SessionSpeakerStore()
+
+        store.assign("s1", {"SPEAKER_00": stylist})
+        mapping = store.assign("s2", {"SPEAKER_03": customer})
+
+        assert mapping == {"SPEAKER_03": "SPEAKER_00"}
+
+    def test_ttl_eviction(self, voices):
+        """Test that idle sessions expire."""
+        store = SessionSpeakerStore(ttl_seconds=60)
+
+        store.assign("old", {"A": voices[0]}, now=0.0)
+        store.assign("new", {"A": voices[0]}, now=50.0)
+        store.evict_expired(now=100.0)
+
+        assert "old" not in store
+        assert "new" in store
+
+    def test_lru_eviction(self, voices):
+        """Test that the least recently used session is evicted at capacity."""
+        store = SessionSpeakerStore(max_sessions=2)
+
+        store.assign("a", {"A": voices[0]}, now=0.0)
+        store.assign("b", {"A": voices[0]}, now=1.0)
+        store.assign("a", {"A": voices[0]}, now=2.0)
+        store.assign("c", {"A": voices[0]}, now=3.0)
+
+        assert "b" not in store
+        assert "a" in store and "c" in store
+
+    def test_close(self, voices):
+        """Test explicit session close."""
+        store = SessionSpeakerStore()
+        store.assign("s1", {"A": voices[0]})
+
+        assert store.close("s1") is True
+        assert store.close("s1") is False
+        assert len(store) == 0
+
+
+class TestServiceSessionLabels:
+    """Tests for stable labels in PyannoteService."""
+
+    @pytest.mark.asyncio
+    async def test_segments_relabelled_per_session(self, ready_service, waveform_input):
+        """Test that chunk labels are mapped to session labels."""
+        result = await ready_service.diarize_with_embeddings(waveform_input, session_id="s1")
+
+        labels = {seg["speaker"] for seg in result["segments"]}
+        assert labels <= {"SPEAKER_00", "SPEAKER_01"}
+        assert "s1" in ready_service.session_store
+
+        assert ready_service.close_session("s1") is True
+        assert "s1" not in ready_service.session_store
+
+    @pytest.mark.asyncio
+    async def test_seen_audio_does_not_update_centroids(self, ready_service, waveform_input):
+        """Test that audio covered by an earlier window only counts once."""
+        await ready_service.diarize_with_embeddings(waveform_input, session_id="s1")
+        weights = [s.weight for s in ready_service.session_store.get("s1").speakers]
+
+        await ready_service.diarize_with_embeddings(
+            waveform_input, session_id="s1", seen_seconds=8.0
+        )
+
+        speakers = ready_service.session_store.get("s1").speakers
+        # Only SPEAKER_01's 8-10 s turn is new audio
+        assert sorted(s.weight - w for s, w in zip(speakers, weights)) == pytest.approx(
+            [0.0, 2.0]
+        )
@@ -0,0 +1,226 @@
+"""
+Tests for streaming diarization
+"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.metrics import metrics
+from app.services.streaming import StreamingDiarizer
+from app.services.tenant_scheduler import FairScheduler
+
+
+def pcm(seconds, sample_rate=16000):
+    """Silence as 16-bit little-endian PCM."""
+    return np.zeros(int(seconds * sample_rate), dtype="<i2").tobytes()
+
+
+@pytest.fixture
+def window_service():
+    """Service whose every window has SPEAKER_00 then SPEAKER_01 halfway through."""
+    service = AsyncMock()
+    service.scheduler = None
+
+    async def diarize_with_embeddings(audio, session_id=None, seen_seconds=0.0):
+        duration = audio["waveform"].shape[-1] / audio["sample_rate"]
+        return {
+            "segments": [
+                {"speaker": "SPEAKER_00", "start": 0.0, "end": duration / 2},
+                {"speaker": "SPEAKER_01", "start": duration / 2, "end": duration},
+            ],
+            "speaker_embeddings": [],
+            "processing_time_ms": 1,
+        }
+
+    service.diarize_with_embeddings = AsyncMock(side_effect=diarize_with_embeddings)
+    return service
+
+
+class TestStreamingDiarizer:
+    """Tests for StreamingDiarizer class."""
+
+    @pytest.mark.asyncio
+    async def test_buffer_bounded_once_finalized(self, window_service):
+        """Test that finalized audio before the latest window is dropped."""
+        diarizer = StreamingDiarizer(
+            window_service, "s1", window_seconds=2.0, finalize_lag_seconds=0.5
+        )
+
+        diarizer.push(pcm(5.0))
+        await diarizer.process()
+        diarizer.push(pcm(1.0))
+
+        assert diarizer.received_seconds == 6.0
+        assert len(diarizer._buffer) == 32000
+
+    @pytest.mark.asyncio
+    async def test_lagging_window_covers_unfinalized_audio(self, window_service):
+        """Test that audio received while inference lags is still diarized."""
+        diarizer = StreamingDiarizer(
+            window_service, "s1", window_seconds=2.0, finalize_lag_seconds=0.5
+        )
+
+        diarizer.push(pcm(1.0))
+        await diarizer.process()
+        diarizer.push(pcm(4.0))
+        update = await diarizer.process()
+
+        waveform = window_service.diarize_with_embeddings.call_args.args[0]["waveform"]
+        assert waveform.shape[-1] == int(4.5 * 16000)
+        assert update.turns[0]["start"] == 0.5
+        assert update.finalized_until == 4.5
+        # The first 0.5 s of this window was already diarized
+        assert window_service.diarize_with_embeddings.call_args.kwargs["seen_seconds"] == 0.5
+
+    def test_push_handles_split_samples(self, window_service):
+        """Test that a sample split across frames is reassembled."""
+        diarizer = StreamingDiarizer(window_service, "s1", step_seconds=0.001)
+        frame = np.array([16384, -16384], dtype="<i2").tobytes()
+
+        diarizer.push(frame[:3])
+        diarizer.push(frame[3:])
+
+        np.testing.assert_allclose(diarizer._buffer, [0.5, -0.5])
+
+    def test_ready_after_step(self, window_service):
+        """Test that a window is due after each step of new audio."""
+        diarizer = StreamingDiarizer(window_service, "s1", step_seconds=0.5)
+
+        diarizer.push(pcm(0.25))
+        assert not diarizer.ready
+        diarizer.push(pcm(0.25))
+        assert diarizer.ready
+
+    @pytest.mark.asyncio
+    async def test_turns_finalized_behind_horizon(self, window_service):
+        """Test that only audio older than the lag is finalized, exactly once."""
+        diarizer = StreamingDiarizer(
+            window_service, "s1", window_seconds=4.0, finalize_lag_seconds=0.5
+        )
+
+        diarizer.push(pcm(2.0))
+        first = await diarizer.process()
+        diarizer.push(pcm(2.0))
+        second = await diarizer.process()
+
+        assert first.turns == [
+            {"speaker": "SPEAKER_00", "start": 0.0, "end": 1.0},
+            {"speaker": "SPEAKER_01", "start": 1.0, "end": 1.5},
+        ]
+        assert first.partial == [{"speaker": "SPEAKER_01", "start": 1.5, "end": 2.0}]
+        # The second window starts where the first finalization stopped
+        assert second.turns == [
+            {"speaker": "SPEAKER_00", "start": 1.5, "end": 2.0},
+            {"speaker": "SPEAKER_01", "start": 2.0, "end": 3.5},
+        ]
+        assert second.finalized_until == 3.5
+
+    @pytest.mark.asyncio
+    async def test_final_flush(self, window_service):
+        """Test that ending the stream finalizes up to its end."""
+        diarizer = StreamingDiarizer(window_service, "s1", finalize_lag_seconds=0.5)
+
+        diarizer.push(pcm(2.0))
+        update = await diarizer.process(final=True)
+
+        assert update.finalized_until == 2.0
+        assert update.partial == []
+        window_service.diarize_with_embeddings.assert_awaited_once()
+        assert window_service.diarize_with_embeddings.call_args.kwargs["session_id"] == "s1"
+
+    def test_unsupported_sample_rate(self, window_service):
+        """Test that sample rates that would break the window math are rejected."""
+        for sample_rate in (0, -16000, 12345):
+            with pytest.raises(ValueError):
+                StreamingDiarizer(window_service, "s1", sample_rate=sample_rate)
+
+    @pytest.mark.asyncio
+    async def test_window_takes_scheduler_slot(self, window_service):
+        """Test that windows wait for a slot of the stream's salon."""
+        window_service.scheduler = FairScheduler(capacity=1)
+        diarizer = StreamingDiarizer(window_service, "s1", tenant="salon-1")
+        await window_service.scheduler.acquire("other")
+
+        diarizer.push(pcm(1.0))
+        window = asyncio.create_task(diarizer.process())
+        await asyncio.sleep(0.01)
+        assert window_service.diarize_with_embeddings.await_count == 0
+        assert window_service.scheduler.waiting() == 1
+
+        window_service.scheduler.release("other")
+        await asyncio.wait_for(window, 2.0)
+        assert window_service.diarize_with_embeddings.await_count == 1
+        assert window_service.scheduler.active == 0
+
+    @pytest.mark.asyncio
+    async def test_steps_skipped_while_window_runs(self, window_service):
+        """Test that a stream has one window in flight and skips the steps it missed."""
+        metrics.reset()
+        release = asyncio.Event()
+        diarize = window_service.diarize_with_embeddings.side_effect
+
+        async def slow(*args, **kwargs):
+            await release.wait()
+            return await diarize(*args, **kwargs)
+
+        window_service.diarize_with_embeddings.side_effect = slow
+        diarizer = StreamingDiarizer(window_service, "s1", step_seconds=0.5)
+
+        diarizer.push(pcm(0.5))
+        window = asyncio.create_task(diarizer.process())
+        await asyncio.sleep(0)
+        diarizer.push(pcm(1.5))
+        assert not diarizer.ready
+
+        release.set()
+        await window
+        assert diarizer.ready
+        await diarizer.process()
+
+        assert window_service.diarize_with_embeddings.await_count == 2
+        assert metrics.counter("stream_steps_skipped").value == 2
+
+
+class TestStreamEndpoint:
+    """Tests for the /api/v1/stream WebSocket."""
+
+    def test_stream_round_trip(self, window_service):
+        """Test streaming frames and ending the stream."""
+        with patch("app.main.get_pyannote_service", return_value=window_service):
+            from app.main import app
+
+            client = TestClient(app)
+            with client.websocket_connect("/api/v1/stream?session_id=s1") as ws:
+                for _ in range(4):
+                    ws.send_bytes(pcm(0.5))
+                ws.send_json({"type": "end"})
+
+                messages = []
+                while True:
+                    message = ws.receive_json()
+                    messages.append(message)
+                    if message["type"] == "end":
+                        break
+
+        turns = [m for m in messages if m["type"] == "turn"]
+        assert messages[-1] == {"type": "end", "duration": 2.0}
+        assert turns[-1]["end"] == 2.0
+        # Finalized turns never overlap in time for a speaker
+        for earlier, later in zip(turns, turns[1:]):
+            assert later["start"] >= earlier["start"]
+
+    def test_unsupported_sample_rate_refused(self, window_service):
+        """Test that a stream with a sample rate of 0 is refused before accepting."""
+        with patch("app.main.get_pyannote_service", return_value=window_service):
+            from app.main import app
+
+            client = TestClient(app)
+            with pytest.raises(WebSocketDisconnect):
+                with client.websocket_connect("/api/v1/stream?session_id=s1&sample_rate=0"):
+                    pass
+
+        window_service.diarize_with_embeddings.assert_not_called()
@@ -0,0 +1,207 @@
+"""
+Tests for per-salon fair scheduling
+"""
+import asyncio
+
+import pytest
+
+from app.metrics import metrics
+from app.services.tenant_scheduler import (
+    DEFAULT_TENANT,
+    OTHER_TENANT,
+    FairScheduler,
+    TenantPolicy,
+    VirtualClock,
+    tenant_label,
+    tenant_of,
+)
+from app.workers.job_queue import PriorityJobQueue
+
+
+def test_tenant_of():
+    """Test tenant lookup in metadata."""
+    assert tenant_of({"salon_id": "salon-1"}) == "salon-1"
+    assert tenant_of({"tenant_id": "chain"}) == "chain"
+    assert tenant_of({"salon_id": None}) == DEFAULT_TENANT
+    assert tenant_of(None) == DEFAULT_TENANT
+
+
+def test_tenant_label():
+    """Test that only configured tenants get a metric label of their own."""
+    policy = TenantPolicy(weights={"chain": 3.0}, max_concurrency={"capped": 1})
+
+    assert tenant_label("chain", policy) == "chain"
+    assert tenant_label("capped", policy) == "capped"
+    assert tenant_label(DEFAULT_TENANT, policy) == DEFAULT_TENANT
+    assert tenant_label("salon-123", policy) == OTHER_TENANT
+    assert tenant_label("salon-123") == OTHER_TENANT
+
+
+class TestVirtualClock:
+    """Tests for VirtualClock class."""
+
+    def test_burst_spaced_by_weight(self):
+        """Test that a flow's consecutive tags are cost / weight apart."""
+        clock = VirtualClock()
+        tags = [clock.tag("a", now=0.0, cost=1.0, weight=2.0) for _ in range(3)]
+
+        assert tags == [0.5, 1.0, 1.5]
+
+    def test_idle_flow_gets_no_credit(self):
+        """Test that a flow idle for a while starts from the current time."""
+        clock = VirtualClock()
+        clock.tag("a", now=0.0)
+
+        assert clock.tag("a", now=100.0) == 101.0
+
+    def test_estimate_does_not_commit(self):
+        """Test that commit=False leaves the flow untouched."""
+        clock = VirtualClock()
+        clock.tag("a", now=0.0, commit=False)
+
+        assert clock.tag("a", now=0.0) == 1.0
+
+
+class TestFairScheduler:
+    """Tests for FairScheduler class."""
+
+    @pytest.mark.asyncio
+    async def test_small_tenant_not_starved_by_burst(self):
+        """Test that a single request overtakes another tenant's backlog."""
+        scheduler = FairScheduler(capacity=1)
+        order = []
+
+        async def request(tenant, name):
+            async with scheduler.slot(tenant):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        tasks = [asyncio.create_task(request("chain", f"chain-{i}")) for i in range(5)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("small", "small")))
+        await asyncio.gather(*tasks)
+
+        assert order.index("small") <= 2
+
+    @pytest.mark.asyncio
+    async def test_weights(self):
+        """Test that a tenant with twice the weight gets twice the turns."""
+        scheduler = FairScheduler(capacity=1, policy=TenantPolicy(weights={"big": 2.0}))
+        order = []
+
+        async def request(tenant):
+            async with scheduler.slot(tenant):
+                order.append(tenant)
+                await asyncio.sleep(0)
+
+        await scheduler.acquire("blocker")
+        tasks = [asyncio.create_task(request(t)) for t in ["big"] * 6 + ["small"] * 6]
+        await asyncio.sleep(0)
+        scheduler.release("blocker")
+        await asyncio.gather(*tasks)
+
+        assert order[:6].count("big") == 4
+
+    @pytest.mark.asyncio
+    async def test_concurrency_cap(self):
+        """Test that a tenant never exceeds its cap while others use the capacity."""
+        scheduler = FairScheduler(
+            capacity=3, policy=TenantPolicy(max_concurrency={"chain": 1})
+        )
+        running = {"chain": 0, "small": 0}
+        peak = {"chain": 0, "small": 0}
+
+        async def request(tenant):
+            async with scheduler.slot(tenant):
+                running[tenant] += 1
+                peak[tenant] = max(peak[tenant], running[tenant])
+                await asyncio.sleep(0.001)
+                running[tenant] -= 1
+
+        await asyncio.gather(*[request("chain") for _ in range(4)], request("small"),
+                             request("small"))
+
+        assert peak == {"chain": 1, "small": 2}
+        assert scheduler.active == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """Test that a cancelled request does not keep its place."""
+        scheduler = FairScheduler(capacity=1)
+        await scheduler.acquire("a")
+        waiter = asyncio.create_task(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        assert scheduler.waiting("b") == 1
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        scheduler.release("a")
+
+        assert scheduler.waiting() == 0
+        assert scheduler.active == 0
+
+    @pytest.mark.asyncio
+    async def test_wait_reported(self):
+        """Test that on_wait receives the time each admitted request waited."""
+        waits = []
+        scheduler = FairScheduler(capacity=1, on_wait=waits.append)
+        await scheduler.acquire("a")
+        waiter = asyncio.create_task(scheduler.acquire("b"))
+        await asyncio.sleep(0.02)
+
+        scheduler.release("a")
+        await waiter
+
+        assert len(waits) == 2
+        assert waits[1] >= 0.01
+
+    @pytest.mark.asyncio
+    async def test_unconfigured_tenants_share_label(self):
+        """Test that client-supplied salon ids do not each get a metric series."""
+        metrics.reset()
+        scheduler = FairScheduler(capacity=1, policy=TenantPolicy(weights={"chain": 2.0}))
+        await scheduler.acquire("chain")
+        waiters = [
+            asyncio.create_task(scheduler.acquire(tenant))
+            for tenant in ("salon-1", "salon-2", "chain")
+        ]
+        await asyncio.sleep(0)
+
+        assert metrics.gauge("tenant_queue_depth", tenant=OTHER_TENANT).value == 2
+        assert metrics.gauge("tenant_queue_depth", tenant="chain").value == 1
+        assert "salon-1" not in str(metrics.snapshot())
+
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        assert metrics.gauge("tenant_queue_depth", tenant=OTHER_TENANT).value == 0
+
+
+class TestFairJobQueue:
+    """Tests for tenant fairness in PriorityJobQueue."""
+
+    def test_tenants_interleaved(self):
+        """Test that a burst from one salon does not delay another salon's job."""
+        queue = PriorityJobQueue()
+        for index in range(5):
+            queue.put_nowait(f"chain-{index}", tenant="chain", cost=10.0, now=0.0)
+        queue.put_nowait("small", tenant="small", cost=10.0, now=1.0)
+
+        order = [queue.get_nowait() for _ in range(6)]
+
+        assert order.index("small") == 1
+
+    def test_concurrency_cap(self):
+        """Test that jobs of a capped tenant wait until one of its jobs is done."""
+        queue = PriorityJobQueue(policy=TenantPolicy(max_concurrency={"chain": 1}))
+        queue.put_nowait("chain-0", tenant="chain", now=0.0)
+        queue.put_nowait("chain-1", tenant="chain", now=0.0)
+        queue.put_nowait("small", tenant="small", now=5.0)
+
+        assert queue.get_nowait() == "chain-0"
+        assert queue.get_nowait() == "small"
+        with pytest.raises(asyncio.QueueEmpty):
+            queue.get_nowait()
+
+        queue.task_done("chain")
+        assert queue.get_nowait() == "chain-1"
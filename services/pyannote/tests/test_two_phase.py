@@ -0,0 +1,89 @@
+"""
+Tests for two-phase (coarse, then refined) diarization results
+"""
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from tests.conftest import post_diarize
+
+
+def result(quality, *segments):
+    return {
+        "segments": [
+            {"speaker": speaker, "start": start, "end": end} for speaker, start, end in segments
+        ],
+        "processing_time_ms": 5,
+        "quality": quality,
+        "degradation_level": 0,
+    }
+
+
+class TestTwoPhase:
+    """Tests for refine=true on /diarize."""
+
+    @pytest.fixture
+    def service(self, service):
+        service.diarize = AsyncMock(return_value=result("fast", ("SPEAKER_00", 0.0, 1.0)))
+        service.diarize_with_embeddings = AsyncMock(
+            return_value={
+                **result("accurate", ("SPEAKER_00", 0.0, 0.4), ("SPEAKER_01", 0.4, 1.0)),
+                "speaker_embeddings": [
+                    {"label": "SPEAKER_00", "embedding": [0.1, 0.2], "duration_ms": 400}
+                ],
+            }
+        )
+        return service
+
+    @pytest.fixture
+    def callbacks(self):
+        with patch("app.routes.diarization.enqueue_callback", AsyncMock()) as enqueue:
+            yield enqueue
+
+    def post(self, client, **data):
+        return post_diarize(client, chunk_index="3", **data)
+
+    def test_coarse_response_then_refined_callback(self, client, service, callbacks):
+        """Test that the coarse result is returned and the refined one is called back."""
+        response = self.post(
+            client,
+            callback_url="http://callback/",
+            refine="true",
+            quality="accurate",
+            extract_embeddings="true",
+            stable_speakers="true",
+        )
+
+        body = response.json()
+        assert response.status_code == 200
+        assert body["status"] == "processing"
+        assert body["revision"] == 0
+        assert body["quality"] == "fast"
+        assert len(body["segments"]) == 1
+        assert service.diarize.call_args.kwargs == {"quality": "fast", "priority": "realtime"}
+
+        (url, payload), _ = callbacks.call_args
+        assert url == "http://callback/"
+        assert payload["chunk_index"] == 3
+        assert payload["revision"] == 1
+        assert "revision" not in payload["result"]
+        assert payload["result"]["quality"] == "accurate"
+        assert len(payload["result"]["segments"]) == 2
+        assert payload["result"]["speaker_embeddings"][0]["label"] == "SPEAKER_00"
+        kwargs = service.diarize_with_embeddings.call_args.kwargs
+        assert kwargs == {"session_id": "s1", "quality": "accurate", "priority": "finalization"}
+
+    def test_plain_callback_is_revision_zero(self, client, service, callbacks):
+        """Test that callbacks without refine keep one result at revision 0."""
+        response = self.post(client, callback_url="http://callback/")
+
+        assert response.json()["segments"] == []
+        (_, payload), _ = callbacks.call_args
+        assert payload["revision"] == 0
+        assert service.diarize.await_count == 1
+        assert service.diarize.call_args.kwargs["priority"] == "realtime"
+
+    def test_refine_requires_callback(self, client, service):
+        """Test that refine without a callback_url is rejected."""
+        assert self.post(client, refine="true").status_code == 400
+        service.diarize.assert_not_called()
@@ -0,0 +1,140 @@
+"""
+Tests for the voice activity pre-filter
+"""
+import numpy as np
+import pytest
+import torch
+
+from app.metrics import metrics
+from app.services.vad import TrimMap, VadResult, VoiceActivityDetector
+
+SAMPLE_RATE = 16000
+
+
+def speech_like(seconds, seed=0):
+    """Voiced signal with gliding pitch and a syllable-rate envelope."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 140 * (1 + 0.1 * np.sin(2 * np.pi * 0.7 * t))
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    signal = sum(np.sin(k * phase) / k for k in range(1, 20))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+    return 0.2 * signal * envelope + 0.001 * rng.standard_normal(len(t))
+
+
+def dryer_noise(seconds, seed=0):
+    """Loud, spectrally stationary noise: filtered noise plus motor hum."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    noise = np.convolve(rng.standard_normal(len(t)), np.ones(8) / 8, mode="same")
+    hum = sum(np.sin(2 * np.pi * k * 120 * t) / k for k in range(1, 10))
+    return 0.2 * noise + 0.05 * hum
+
+
+def waveform(*pieces):
+    return torch.from_numpy(np.concatenate(pieces).astype(np.float32))[None]
+
+
+class TestVoiceActivityDetector:
+    """Tests for speech detection and trimming."""
+
+    def test_silence_and_stationary_noise_rejected(self):
+        """Test that silence and loud stationary noise contain no speech."""
+        vad = VoiceActivityDetector()
+
+        assert vad.detect(torch.zeros(1, 10 * SAMPLE_RATE)).regions == []
+        assert vad.detect(waveform(dryer_noise(10))).speech_ratio == 0.0
+
+    def test_speech_detected_over_noise(self):
+        """Test that speech is found between silences, also over dryer noise."""
+        vad = VoiceActivityDetector()
+        audio = waveform(np.zeros(5 * SAMPLE_RATE), speech_like(4), np.zeros(5 * SAMPLE_RATE))
+        padded = np.pad(speech_like(4), (3 * SAMPLE_RATE, 3 * SAMPLE_RATE))
+        noisy = waveform(dryer_noise(10) + 0.5 * padded)
+
+        (region,) = vad.detect(audio).regions
+        assert region[0] == pytest.approx(5.0, abs=0.5)
+        assert region[1] == pytest.approx(9.0, abs=0.5)
+        (region,) = vad.detect(noisy).regions
+        assert region[0] == pytest.approx(3.0, abs=0.5)
+        assert region[1] == pytest.approx(7.0, abs=0.5)
+
+    def test_trim_cuts_long_gaps_only(self):
+        """Test that only non-speech spans of at least min_cut_seconds are removed."""
+        vad = VoiceActivityDetector(sample_rate=SAMPLE_RATE)
+        result = VadResult(regions=[(0.5, 2.0), (3.0, 4.0), (10.0, 12.0)], duration=20.0)
+        audio = torch.arange(20 * SAMPLE_RATE, dtype=torch.float32)[None]
+
+        trimmed, trim_map = vad.trim(audio, result, min_cut_seconds=3.0)
+
+        assert trim_map.spans == [(0.0, 0.0, 4.0), (4.0, 10.0, 2.0)]
+        assert trimmed.shape == (1, 6 * SAMPLE_RATE)
+        assert trimmed[0, 4 * SAMPLE_RATE].item() == 10 * SAMPLE_RATE
+
+
+class TestTrimMap:
+    """Tests for mapping segments back to the original timeline."""
+
+    def test_remap_and_split_at_cuts(self):
+        """Test that times are shifted per span and segments across a cut are split."""
+        trim_map = TrimMap([(0.0, 0.0, 4.0), (4.0, 10.0, 2.0)])
+        segments = [
+            {"speaker": "SPEAKER_00", "start": 1.0, "end": 2.0},
+            {"speaker": "SPEAKER_01", "start": 3.5, "end": 5.0},
+        ]
+
+        assert trim_map.remap_segments(segments) == [
+            {"speaker": "SPEAKER_00", "start": 1.0, "end": 2.0},
+            {"speaker": "SPEAKER_01", "start": 3.5, "end": 4.0},
+            {"speaker": "SPEAKER_01", "start": 10.0, "end": 11.0},
+        ]
+
+
+class TestServicePrefilter:
+    """Tests for the pre-filter in PyannoteService."""
+
+    @pytest.fixture(autouse=True)
+    def reset_metrics(self):
+        metrics.reset()
+        yield
+        metrics.reset()
+
+    def test_disabled_by_default(self):
+        """Test that the pre-filter is opt-in until validated on real recordings."""
+        from app.config import Settings
+        from app.services.pyannote_service import PyannoteService
+
+        assert PyannoteService(Settings()).vad is None
+
+    @pytest.mark.asyncio
+    async def test_silent_chunk_skips_pipeline(self, ready_service):
+        """Test that a chunk without speech returns no segments without inference."""
+        ready_service.vad = VoiceActivityDetector()
+        audio = {"waveform": waveform(dryer_noise(10)), "sample_rate": SAMPLE_RATE}
+
+        result = await ready_service.diarize(audio)
+        with_embeddings = await ready_service.diarize_with_embeddings(audio)
+
+        assert result["segments"] == []
+        assert with_embeddings["segments"] == with_embeddings["speaker_embeddings"] == []
+        assert ready_service.pipeline.calls == []
+        assert metrics.counter("vad_skipped_chunks").value == 2
+        assert metrics.counter("vad_seconds_saved").value == pytest.approx(20.0)
+
+    @pytest.mark.asyncio
+    async def test_long_silence_trimmed_and_remapped(self, ready_service):
+        """Test that the pipeline sees trimmed audio and segments map back."""
+        ready_service.vad = VoiceActivityDetector()
+        ready_service.pipeline.tracks = [(0.5, 2.5, "SPEAKER_00"), (4.0, 7.0, "SPEAKER_01")]
+        audio = waveform(speech_like(3), np.zeros(10 * SAMPLE_RATE), speech_like(4, seed=1))
+
+        result = await ready_service.diarize({"waveform": audio, "sample_rate": SAMPLE_RATE})
+
+        (call, _), = ready_service.pipeline.calls
+        assert call["waveform"].shape[1] < 10 * SAMPLE_RATE
+        first, second = result["segments"][:2]
+        assert (first["start"], first["end"]) == (0.5, 2.5)
+        assert second["start"] >= 3.0 and second["end"] > 13.0
+        assert all(segment["end"] <= 17.0 for segment in result["segments"])
+        assert metrics.counter("vad_trimmed_chunks").value == 1
+        assert metrics.counter("vad_seconds_saved").value > 8.0